@@ -30,8 +30,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'reportes.metricas.MetricasMiddleware',  # Server-Timing e histogramas por vista
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Para servir archivos estáticos
+    'reportes.compresion.CompresionMiddleware',  # gzip/brotli según Accept-Encoding
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -41,6 +43,19 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Renderer y parser JSON de DRF con orjson si está instalado (ver reportes.codec_json)
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'reportes.codec_json.JSONRendererRapido',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'reportes.codec_json.JSONParserRapido',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
 ROOT_URLCONF = 'ReportesConsulta.urls'
 
 TEMPLATES = [
@@ -59,6 +74,12 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'ReportesConsulta.wsgi.application'
+ASGI_APPLICATION = 'ReportesConsulta.asgi.application'
+
+# Modo de despliegue: 'wsgi' (gunicorn con workers síncronos) o 'asgi'
+# (gunicorn con workers uvicorn). En modo ASGI las rutas usan las vistas async.
+SERVIDOR = os.environ.get('SERVIDOR', 'wsgi')
+REPORTES_VISTAS_ASYNC = os.environ.get('REPORTES_VISTAS_ASYNC', str(SERVIDOR == 'asgi')) == 'True'
 
 # Database - Conecta a la misma BD que tu backend principal
 DATABASE_URL = os.environ.get('DATABASE_URL')
@@ -136,4 +157,134 @@ API_PROFESIONALES = f'{API_BASE_URL}/Catalogos/Profesionales-Salud/'
 API_ATLETAS = f'{API_BASE_URL}/Catalogos/Atletas/'
 API_AREAS = f'{API_BASE_URL}/Catalogos/Areas/'
 API_REPORTES = f'{API_BASE_URL}/Reportes/'
-API_CONSULTAS = f'{API_BASE_URL}/Modulos/Consultas/'
\ No newline at end of file
+API_CONSULTAS = f'{API_BASE_URL}/Modulos/Consultas/'
+
+# Cliente HTTP hacia el backend principal (pool de conexiones keep-alive por proceso)
+UPSTREAM_POOL_CONNECTIONS = int(os.environ.get('UPSTREAM_POOL_CONNECTIONS', '4'))
+UPSTREAM_POOL_MAXSIZE = int(os.environ.get('UPSTREAM_POOL_MAXSIZE', '10'))
+UPSTREAM_TIMEOUT_CONEXION = float(os.environ.get('UPSTREAM_TIMEOUT_CONEXION', '3.05'))
+UPSTREAM_TIMEOUT_LECTURA = float(os.environ.get('UPSTREAM_TIMEOUT_LECTURA', '10'))
+UPSTREAM_REINTENTOS = int(os.environ.get('UPSTREAM_REINTENTOS', '2'))
+UPSTREAM_BACKOFF = float(os.environ.get('UPSTREAM_BACKOFF', '0.3'))
+UPSTREAM_REINTENTOS_ESTADOS = (502, 503, 504)
+# Hilos para lanzar en paralelo las peticiones independientes de una misma vista
+UPSTREAM_MAX_WORKERS = int(os.environ.get('UPSTREAM_MAX_WORKERS', '6'))
+# Revalidación condicional (ETag / If-Modified-Since): cuántas respuestas
+# parseadas se guardan por proceso para reutilizarlas ante un 304, y el tamaño
+# máximo en bytes de un cuerpo para guardarlo (los más grandes se piden enteros)
+UPSTREAM_REVALIDACION = os.environ.get('UPSTREAM_REVALIDACION', 'True') == 'True'
+UPSTREAM_VALIDADORES_MAX = int(os.environ.get('UPSTREAM_VALIDADORES_MAX', '32'))
+UPSTREAM_VALIDADORES_MAX_BYTES = int(os.environ.get('UPSTREAM_VALIDADORES_MAX_BYTES', str(1024 * 1024)))
+
+# Segundos que se recuerda qué filtros (fechas, atleta, profesional) aplica el
+# backend de consultas, detectados con peticiones sonda; 0 desactiva la
+# detección y los reportes siempre vuelven a filtrar localmente
+UPSTREAM_FILTROS_TTL = int(os.environ.get('UPSTREAM_FILTROS_TTL', '3600'))
+# Segundos que se recuerda la detección si alguna sonda falló (esos filtros
+# cuentan como no aplicados hasta el siguiente intento)
+UPSTREAM_FILTROS_TTL_FALLO = int(os.environ.get('UPSTREAM_FILTROS_TTL_FALLO', '60'))
+
+# Codificación JSON de los cuerpos del backend y de las respuestas: 'orjson'
+# (si está instalado; si no, se usa la biblioteca estándar) o 'stdlib'
+JSON_CODEC = os.environ.get('JSON_CODEC', 'orjson')
+
+# Compresión de respuestas (ver reportes.compresion): tamaño mínimo en bytes,
+# nivel de gzip (1-9), calidad de brotli (0-11, requiere el paquete brotli) y
+# tipos de contenido que se comprimen (PDF y XLSX ya vienen comprimidos). No se
+# incluye text/html por defecto: comprimir páginas que mezclan el token CSRF con
+# texto del usuario las expone a BREACH
+COMPRESION_MINIMO = int(os.environ.get('COMPRESION_MINIMO', '1024'))
+COMPRESION_NIVEL_GZIP = int(os.environ.get('COMPRESION_NIVEL_GZIP', '6'))
+COMPRESION_NIVEL_BROTLI = int(os.environ.get('COMPRESION_NIVEL_BROTLI', '5'))
+COMPRESION_TIPOS = [
+    tipo.strip() for tipo in
+    os.environ.get('COMPRESION_TIPOS', 'application/json,text/csv').split(',')
+    if tipo.strip()
+]
+
+# Métricas (ver reportes.metricas): activarlas, carpeta donde cada worker vuelca
+# sus histogramas para que /Consultas/metricas/ los sume (vacía: solo el worker
+# que atiende) y cada cuántos segundos como máximo se vuelcan
+METRICAS = os.environ.get('METRICAS', 'True') == 'True'
+METRICAS_DIR = os.environ.get('METRICAS_DIR', os.path.join(BASE_DIR, 'metricas'))
+METRICAS_INTERVALO = float(os.environ.get('METRICAS_INTERVALO', '5'))
+
+# Caché compartida (catálogos, respuestas). Con 'file' o 'db' la comparten los
+# workers de gunicorn; 'db' requiere `python manage.py createcachetable`.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+_CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+}
+_CACHE_LOCATIONS = {
+    'locmem': 'reportes',
+    'file': os.path.join(BASE_DIR, '.cache'),
+    'db': 'reportes_cache',
+}
+CACHES = {
+    'default': {
+        'BACKEND': _CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.environ.get('CACHE_LOCATION', _CACHE_LOCATIONS[CACHE_BACKEND]),
+    }
+}
+
+# Catálogos de atletas y profesionales: segundos de vigencia y ventana en la
+# que se sigue sirviendo la copia vencida mientras se refresca en segundo plano
+CATALOGOS_CACHE_TTL = int(os.environ.get('CATALOGOS_CACHE_TTL', '600'))
+CATALOGOS_CACHE_SWR = int(os.environ.get('CATALOGOS_CACHE_SWR', '3600'))
+
+# Respuestas de los endpoints que sondea el dashboard: segundos de vigencia por
+# endpoint (0 desactiva), ventana en la que se sirve la copia vencida mientras se
+# recalcula en segundo plano, y espera máxima (también vida del candado) de
+# quien encuentra a otro worker calculando la misma respuesta
+RESPUESTAS_ESTADISTICAS_TTL = int(os.environ.get('RESPUESTAS_ESTADISTICAS_TTL', '30'))
+RESPUESTAS_FILTROS_TTL = int(os.environ.get('RESPUESTAS_FILTROS_TTL', '300'))
+RESPUESTAS_SWR = int(os.environ.get('RESPUESTAS_SWR', '300'))
+RESPUESTAS_ESPERA = int(os.environ.get('RESPUESTAS_ESPERA', '15'))
+
+# Estadísticas: caché de consultas segmentada por mes. Los meses cerrados se
+# guardan una vez; solo el mes actual y los N anteriores se vuelven a pedir.
+ESTADISTICAS_SEGMENTOS = os.environ.get('ESTADISTICAS_SEGMENTOS', 'True') == 'True'
+ESTADISTICAS_MESES_EDITABLES = int(os.environ.get('ESTADISTICAS_MESES_EDITABLES', '1'))
+ESTADISTICAS_SEGMENTOS_TTL = int(os.environ.get('ESTADISTICAS_SEGMENTOS_TTL', str(7 * 24 * 3600)))
+# Motor para acumular lotes de consultas: 'python' (diccionarios) o 'numpy'
+# (columnar, requiere numpy instalado; si falta se usa 'python')
+ESTADISTICAS_MOTOR = os.environ.get('ESTADISTICAS_MOTOR', 'python')
+# Estadísticas por ventana (?desde=&hasta=&granularidad=): vigencia en caché de
+# las ventanas que aún incluyen meses editables y límite de cubetas por petición
+ESTADISTICAS_VENTANA_TTL = int(os.environ.get('ESTADISTICAS_VENTANA_TTL', '300'))
+ESTADISTICAS_VENTANA_MAX_CUBETAS = int(os.environ.get('ESTADISTICAS_VENTANA_MAX_CUBETAS', '400'))
+
+# Origen de los datos de los reportes: 'api' (backend principal) o 'espejo'
+# (copia local en PostgreSQL, ver `python manage.py sincronizar_espejo`)
+REPORTES_FUENTE_DATOS = os.environ.get('REPORTES_FUENTE_DATOS', 'api')
+# Con el backend como origen, leer las consultas de los reportes y la
+# exportación elemento por elemento mientras se descargan, en lugar de
+# parsear el cuerpo completo (sin revalidación ETag del cuerpo)
+REPORTES_CONSULTAS_EN_FLUJO = os.environ.get('REPORTES_CONSULTAS_EN_FLUJO', 'False') == 'True'
+# Días antes de la marca de agua que se vuelven a pedir en cada sincronización
+ESPEJO_DIAS_SOLAPAMIENTO = int(os.environ.get('ESPEJO_DIAS_SOLAPAMIENTO', '3'))
+
+# Reportes PDF en segundo plano (POST con modo='trabajo'): carpeta de los PDFs
+# generados, segundos tras los que un trabajo en proceso se considera
+# abandonado, intentos (fallas de red o workers caídos), espera en segundos
+# antes del primer reintento (se duplica en cada uno) y segundos que se conservan
+REPORTES_TRABAJOS_DIR = os.environ.get('REPORTES_TRABAJOS_DIR', os.path.join(BASE_DIR, 'trabajos_reportes'))
+REPORTES_TRABAJOS_TIMEOUT = int(os.environ.get('REPORTES_TRABAJOS_TIMEOUT', '600'))
+REPORTES_TRABAJOS_INTENTOS = int(os.environ.get('REPORTES_TRABAJOS_INTENTOS', '3'))
+REPORTES_TRABAJOS_ESPERA = int(os.environ.get('REPORTES_TRABAJOS_ESPERA', '30'))
+REPORTES_TRABAJOS_RETENCION = int(os.environ.get('REPORTES_TRABAJOS_RETENCION', str(24 * 3600)))
+
+# Caché en disco de PDFs ya generados (clave: filtros + huellas de los datos).
+# Tamaño máximo en MB; 0 la desactiva.
+REPORTES_PDF_CACHE_DIR = os.environ.get('REPORTES_PDF_CACHE_DIR', os.path.join(BASE_DIR, 'cache_pdf'))
+REPORTES_PDF_CACHE_MAX_MB = int(os.environ.get('REPORTES_PDF_CACHE_MAX_MB', '200'))
+# MB de un PDF en generación que se mantienen en memoria antes de pasar a un
+# archivo temporal en disco
+REPORTES_PDF_SPOOL_MAX_MB = int(os.environ.get('REPORTES_PDF_SPOOL_MAX_MB', '2'))
+# Filas de detalle a partir de las que el PDF usa el motor rápido (canvas)
+# si la petición no indica `motor_pdf`
+REPORTES_PDF_FILAS_MOTOR_RAPIDO = int(os.environ.get('REPORTES_PDF_FILAS_MOTOR_RAPIDO', '500'))
+# Comprimir (Flate) los flujos de contenido de cada página del PDF
+REPORTES_PDF_COMPRIMIR = os.environ.get('REPORTES_PDF_COMPRIMIR', 'True') == 'True'
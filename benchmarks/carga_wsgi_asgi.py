@@ -0,0 +1,126 @@
+"""
+Comparación de carga entre el modo WSGI (workers síncronos) y el modo ASGI
+(workers uvicorn con las vistas async).
+
+Levanta un backend simulado con latencia, arranca gunicorn en cada modo con
+la misma cantidad de workers y lanza peticiones concurrentes al dashboard y
+a los filtros.
+
+Uso:
+    python -m benchmarks.carga_wsgi_asgi --peticiones 200 --concurrencia 50 --latencia 0.2
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+from .datos_sinteticos import generar_datos
+from .stub_upstream import StubUpstream
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+RUTAS = [
+    '/Consultas/api/estadisticas-consultas/',
+    '/Consultas/api/filtros-consulta/',
+]
+
+COMANDOS = {
+    'wsgi': ['gunicorn', 'ReportesConsulta.wsgi:application'],
+    'asgi': ['gunicorn', 'ReportesConsulta.asgi:application', '-k', 'uvicorn_worker.UvicornWorker'],
+}
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _esperar(url, limite=30):
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        try:
+            requests.options(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"El servidor no respondió en {url}")
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def medir_modo(modo, stub, peticiones, concurrencia, workers):
+    puerto = _puerto_libre()
+    env = dict(
+        os.environ,
+        SERVIDOR=modo,
+        BACKEND_HOST='127.0.0.1',
+        BACKEND_PORT=str(stub.puerto),
+        DEBUG='False',
+    )
+    proceso = subprocess.Popen(
+        COMANDOS[modo] + ['--bind', f'127.0.0.1:{puerto}', '--workers', str(workers), '--timeout', '120'],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base = f'http://127.0.0.1:{puerto}'
+    try:
+        _esperar(base + RUTAS[1])
+
+        def una(i):
+            inicio = time.perf_counter()
+            response = requests.get(base + RUTAS[i % len(RUTAS)], timeout=120)
+            return time.perf_counter() - inicio, response.status_code
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            resultados = list(pool.map(una, range(peticiones)))
+        total = time.perf_counter() - inicio
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=30)
+
+    latencias = [r[0] for r in resultados]
+    errores = sum(1 for r in resultados if r[1] != 200)
+    return {
+        'modo': modo,
+        'peticiones': peticiones,
+        'errores': errores,
+        'rps': peticiones / total,
+        'p50_ms': statistics.median(latencias) * 1000,
+        'p95_ms': _percentil(latencias, 0.95) * 1000,
+        'max_ms': max(latencias) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--peticiones', type=int, default=200)
+    parser.add_argument('--concurrencia', type=int, default=50)
+    parser.add_argument('--latencia', type=float, default=0.2, help='latencia simulada del backend (s)')
+    parser.add_argument('--consultas', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    stub = StubUpstream(*generar_datos(args.consultas), latencia=args.latencia).iniciar()
+    try:
+        print(f"{'modo':<6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'errores':>9}")
+        for modo in ('wsgi', 'asgi'):
+            r = medir_modo(modo, stub, args.peticiones, args.concurrencia, args.workers)
+            print(f"{r['modo']:<6}{r['rps']:>9.1f}{r['p50_ms']:>10.0f}{r['p95_ms']:>10.0f}{r['max_ms']:>10.0f}{r['errores']:>9}")
+            sys.stdout.flush()
+    finally:
+        stub.detener()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Costo de JSON: biblioteca estándar vs. orjson (`JSON_CODEC`).
+
+Para cada escala mide, con el mejor de --repeticiones corridas:
+
+- decodificar: el cuerpo de consultas y el catálogo de atletas tal como los
+  entrega el backend (`codec_json.cargar`).
+- renderizar: la respuesta del dashboard de estadísticas y la de filtros con
+  el renderer de DRF configurado (`JSONRendererRapido`).
+
+También verifica que ambos codecs produzcan exactamente los mismos bytes.
+
+Uso:
+    python -m benchmarks.codec_json --consultas 10000 100000 --profesionales 60
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ReportesConsulta.settings')
+django.setup()
+
+from django.test import override_settings  # noqa: E402
+
+from reportes import codec_json  # noqa: E402
+from reportes.codec_json import JSONRendererRapido  # noqa: E402
+from reportes.estadisticas import calcular_estadisticas  # noqa: E402
+from reportes.views import opciones_filtros  # noqa: E402
+
+from .datos_sinteticos import generar_datos  # noqa: E402
+
+CODECS = ('stdlib', 'orjson')
+
+
+def mejor_tiempo(funcion, repeticiones):
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        segundos = time.perf_counter() - inicio
+        mejor = segundos if mejor is None else min(mejor, segundos)
+    return resultado, mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--consultas', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--profesionales', type=int, default=60)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    if codec_json.orjson is None:
+        sys.exit("orjson no está instalado")
+
+    renderer = JSONRendererRapido()
+    print(f"{'consultas':>10}  {'etapa':<24}{'stdlib ms':>11}{'orjson ms':>11}{'x':>7}")
+    for n_consultas in args.consultas:
+        consultas, atletas, profesionales = generar_datos(n_consultas, n_profesionales=args.profesionales)
+        estadisticas = calcular_estadisticas(consultas, profesionales, atletas, hoy=datetime.now())
+        filtros = opciones_filtros(atletas, profesionales)
+        etapas = {
+            'decodificar consultas': (codec_json.cargar, json.dumps(consultas).encode()),
+            'decodificar atletas': (codec_json.cargar, json.dumps(atletas).encode()),
+            'renderizar estadísticas': (renderer.render, estadisticas),
+            'renderizar filtros': (renderer.render, filtros),
+        }
+        for etapa, (funcion, entrada) in etapas.items():
+            resultados = {}
+            for codec in CODECS:
+                with override_settings(JSON_CODEC=codec):
+                    resultados[codec] = mejor_tiempo(lambda: funcion(entrada), args.repeticiones)
+            if resultados['stdlib'][0] != resultados['orjson'][0]:
+                sys.exit(f"Los codecs difieren en '{etapa}' con {n_consultas} consultas")
+            stdlib_s, orjson_s = resultados['stdlib'][1], resultados['orjson'][1]
+            print(
+                f"{n_consultas:>10}  {etapa:<24}{stdlib_s * 1000:>11.2f}{orjson_s * 1000:>11.2f}"
+                f"{stdlib_s / orjson_s:>7.1f}"
+            )
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
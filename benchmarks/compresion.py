@@ -0,0 +1,129 @@
+"""
+Tamaño y costo de CPU de la compresión de respuestas y de los PDF.
+
+Respuestas (`reportes.compresion`): para el JSON del dashboard de
+estadísticas, el de filtros y la exportación CSV mide el tamaño comprimido y
+el tiempo de gzip en varios niveles y de brotli en varias calidades. El CSV
+se comprime en flujo, bloque a bloque, como lo hace el middleware.
+
+PDF (`REPORTES_PDF_COMPRIMIR`): tamaño y tiempo de `_generar_pdf` con la
+compresión de los flujos de página activada y desactivada, con cada motor.
+
+Uso:
+    python -m benchmarks.compresion --consultas 10000 --filas-pdf 2000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ReportesConsulta.settings')
+django.setup()
+
+from django.test import override_settings  # noqa: E402
+
+from reportes import codec_json, compresion, exportacion  # noqa: E402
+from reportes.estadisticas import calcular_estadisticas  # noqa: E402
+from reportes.views import ProcesamientoConsultasMixin, opciones_filtros  # noqa: E402
+
+from .datos_sinteticos import generar_datos  # noqa: E402
+from .motores_pdf import MOTORES, consultas_enriquecidas  # noqa: E402
+
+NIVELES_GZIP = (1, 6, 9)
+CALIDADES_BROTLI = (1, 5, 9, 11)
+
+
+def mejor_tiempo(funcion, repeticiones):
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        segundos = time.perf_counter() - inicio
+        mejor = segundos if mejor is None else min(mejor, segundos)
+    return resultado, mejor
+
+
+def variantes():
+    for nivel in NIVELES_GZIP:
+        yield f'gzip-{nivel}', 'gzip', {'COMPRESION_NIVEL_GZIP': nivel}
+    if compresion.brotli is not None:
+        for calidad in CALIDADES_BROTLI:
+            yield f'br-{calidad}', 'br', {'COMPRESION_NIVEL_BROTLI': calidad}
+
+
+def medir_respuestas(n_consultas, profesionales_n, repeticiones):
+    consultas, atletas, profesionales = generar_datos(n_consultas, n_profesionales=profesionales_n)
+    generador = ProcesamientoConsultasMixin()
+    catalogos = {
+        'atletas': {str(a['id']): a for a in atletas},
+        'profesionales': {str(p['id']): p for p in profesionales},
+    }
+    bloques = list(exportacion.bloques_csv(generador._iterar_enriquecidas(consultas, catalogos)))
+    cuerpos = {
+        'estadísticas (json)': [codec_json.volcar(
+            calcular_estadisticas(consultas, profesionales, atletas, hoy=datetime.now())
+        )],
+        'filtros (json)': [codec_json.volcar(opciones_filtros(atletas, profesionales))],
+        'exportación (csv)': bloques,
+    }
+
+    print(f"\n{n_consultas} consultas")
+    print(f"{'respuesta':<22}{'variante':<10}{'KB':>10}{'ratio':>8}{'ms':>9}{'MB/s':>9}")
+    for nombre, partes in cuerpos.items():
+        original = sum(len(parte) for parte in partes)
+        print(f"{nombre:<22}{'-':<10}{original / 1024:>10.1f}{1:>8.2f}{0:>9.2f}{'-':>9}")
+        for variante, codificacion, ajustes in variantes():
+            with override_settings(**ajustes):
+                if len(partes) == 1:
+                    salida, segundos = mejor_tiempo(
+                        lambda: compresion.comprimir_contenido(partes[0], codificacion), repeticiones
+                    )
+                else:
+                    salida, segundos = mejor_tiempo(
+                        lambda: b''.join(compresion.comprimir_flujo(partes, codificacion)), repeticiones
+                    )
+            print(
+                f"{'':<22}{variante:<10}{len(salida) / 1024:>10.1f}{original / len(salida):>8.2f}"
+                f"{segundos * 1000:>9.2f}{original / segundos / 1e6:>9.1f}"
+            )
+            sys.stdout.flush()
+
+
+def medir_pdf(n_filas, repeticiones):
+    consultas = consultas_enriquecidas(n_filas)
+    generador = ProcesamientoConsultasMixin()
+    print(f"\nPDF con {n_filas} filas")
+    print(f"{'motor':<10}{'comprimir':<11}{'KB':>10}{'ms':>10}")
+    for motor in MOTORES:
+        filtros = {'fecha_inicio': '2020-01-01', 'fecha_fin': '2030-12-31', 'motor_pdf': motor}
+        for comprimir in (False, True):
+
+            def generar():
+                with generador._generar_pdf(consultas, filtros) as archivo:
+                    return archivo.read()
+
+            with override_settings(REPORTES_PDF_COMPRIMIR=comprimir):
+                contenido, segundos = mejor_tiempo(generar, repeticiones)
+            print(f"{motor:<10}{'sí' if comprimir else 'no':<11}{len(contenido) / 1024:>10.1f}{segundos * 1000:>10.1f}")
+            sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--consultas', type=int, nargs='+', default=[10000])
+    parser.add_argument('--profesionales', type=int, default=60)
+    parser.add_argument('--filas-pdf', type=int, nargs='+', default=[2000])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    for n_consultas in args.consultas:
+        medir_respuestas(n_consultas, args.profesionales, args.repeticiones)
+    for n_filas in args.filas_pdf:
+        medir_pdf(n_filas, args.repeticiones)
+
+
+if __name__ == '__main__':
+    main()
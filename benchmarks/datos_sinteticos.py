@@ -0,0 +1,54 @@
+"""
+Generador de datos sintéticos con la forma que entrega el backend principal.
+"""
+import random
+from datetime import date, timedelta
+
+DIAGNOSTICOS = [
+    'Esguince de tobillo', 'Contractura muscular', 'Tendinitis rotuliana', 'Lumbalgia',
+    'Fascitis plantar', 'Fatiga muscular', 'Sin diagnóstico', 'Fractura por estrés',
+]
+TRATAMIENTOS = ['Reposo', 'Fisioterapia', 'Crioterapia', 'Antiinflamatorios', 'Vendaje funcional']
+
+
+def generar_catalogos(n_atletas, n_profesionales, semilla=0):
+    rng = random.Random(semilla)
+    atletas = [
+        {'id': i, 'nombre': f'Atleta{i}', 'apPaterno': f'Paterno{i}', 'apMaterno': f'Materno{i}'}
+        for i in range(1, n_atletas + 1)
+    ]
+    profesionales = [
+        {
+            'id': i, 'nombre': f'Prof{i}', 'apPaterno': f'Ap{i}', 'apMaterno': f'Am{i}',
+            'especialidad': rng.choice(['Medicina del deporte', 'Nutrición', 'Fisioterapia', 'Psicología'])
+        }
+        for i in range(1, n_profesionales + 1)
+    ]
+    return atletas, profesionales
+
+
+def generar_consultas(n_consultas, n_atletas, n_profesionales, dias_historia=730, semilla=0, hoy=None):
+    rng = random.Random(semilla)
+    hoy = hoy or date.today()
+    consultas = []
+    for i in range(1, n_consultas + 1):
+        consultas.append({
+            'id': i,
+            'fecha': (hoy - timedelta(days=rng.randint(0, dias_historia))).strftime('%Y-%m-%d'),
+            'atleta': rng.randint(1, n_atletas),
+            'profesional_salud': rng.randint(1, n_profesionales),
+            'diagnostico': rng.choice(DIAGNOSTICOS),
+            'tratamiento': rng.choice(TRATAMIENTOS),
+        })
+    return consultas
+
+
+def generar_datos(n_consultas, n_atletas=None, n_profesionales=None, semilla=0):
+    """
+    Devuelve (consultas, atletas, profesionales) para la escala pedida.
+    """
+    n_atletas = n_atletas or max(10, n_consultas // 50)
+    n_profesionales = n_profesionales or max(5, min(60, n_consultas // 1000))
+    atletas, profesionales = generar_catalogos(n_atletas, n_profesionales, semilla=semilla)
+    consultas = generar_consultas(n_consultas, n_atletas, n_profesionales, semilla=semilla)
+    return consultas, atletas, profesionales
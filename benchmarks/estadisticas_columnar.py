@@ -0,0 +1,68 @@
+"""
+Tiempo de acumulación de estadísticas: motor en Python vs. motor columnar (NumPy).
+
+Para cada escala genera consultas sintéticas, calcula las estadísticas del
+dashboard con cada motor (`ESTADISTICAS_MOTOR`) y verifica que la respuesta
+sea idéntica. Se reporta el mejor de --repeticiones corridas.
+
+Uso:
+    python -m benchmarks.estadisticas_columnar --consultas 10000 100000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ReportesConsulta.settings')
+django.setup()
+
+from django.test import override_settings  # noqa: E402
+
+from reportes import estadisticas_columnar  # noqa: E402
+from reportes.estadisticas import calcular_estadisticas  # noqa: E402
+
+from .datos_sinteticos import generar_datos  # noqa: E402
+
+MOTORES = ('python', 'numpy')
+
+
+def medir(motor, consultas, profesionales, atletas, hoy, repeticiones):
+    mejor = None
+    with override_settings(ESTADISTICAS_MOTOR=motor):
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            respuesta = calcular_estadisticas(consultas, profesionales, atletas, hoy=hoy)
+            segundos = time.perf_counter() - inicio
+            mejor = segundos if mejor is None else min(mejor, segundos)
+    return respuesta, mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--consultas', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    if not estadisticas_columnar.disponible():
+        sys.exit("numpy no está instalado")
+
+    hoy = datetime.now()
+    print(f"{'consultas':>10}{'python s':>10}{'numpy s':>10}{'x':>7}")
+    for n_consultas in args.consultas:
+        consultas, atletas, profesionales = generar_datos(n_consultas)
+        resultados = {
+            motor: medir(motor, consultas, profesionales, atletas, hoy, args.repeticiones)
+            for motor in MOTORES
+        }
+        if resultados['python'][0] != resultados['numpy'][0]:
+            sys.exit(f"Las respuestas difieren con {n_consultas} consultas")
+        python_s, numpy_s = resultados['python'][1], resultados['numpy'][1]
+        print(f"{n_consultas:>10}{python_s:>10.3f}{numpy_s:>10.3f}{python_s / numpy_s:>7.1f}")
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Memoria pico de la ingesta de consultas: cuerpo completo vs. en flujo.
+
+Levanta el backend simulado con N consultas y, para cada modo, descarga las
+consultas y las pasa por filtrar → enriquecer igual que el reporte PDF,
+midiendo con `tracemalloc` la memoria pico de Python y el tiempo:
+
+- completo: `upstream.obtener_json` (lista completa) y luego el filtrado.
+- flujo: `upstream.abrir_json_en_flujo`, un elemento a la vez.
+
+El rango de fechas del reporte se controla con --dias (días hacia atrás
+desde hoy); con un rango corto la mayoría de las filas se descarta.
+
+Uso:
+    python -m benchmarks.memoria_ingesta --consultas 10000 50000 --dias 30 730
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ReportesConsulta.settings')
+django.setup()
+
+from reportes import upstream  # noqa: E402
+from reportes.views import ProcesamientoConsultasMixin  # noqa: E402
+
+from .datos_sinteticos import generar_datos  # noqa: E402
+from .stub_upstream import RUTA_CONSULTAS, StubUpstream  # noqa: E402
+
+MODOS = ('completo', 'flujo')
+
+
+def _catalogos(atletas, profesionales):
+    return {
+        'atletas': {str(a['id']): a for a in atletas},
+        'profesionales': {str(p['id']): p for p in profesionales},
+    }
+
+
+def medir(url, modo, filtros, catalogos):
+    mixin = ProcesamientoConsultasMixin()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    if modo == 'completo':
+        consultas = upstream.obtener_json(url)
+    else:
+        consultas = upstream.abrir_json_en_flujo(url)
+    filas = list(mixin._iterar_enriquecidas(mixin._iterar_filtradas(consultas, filtros), catalogos))
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'modo': modo, 'filas': len(filas), 'segundos': segundos, 'pico_mb': pico / 1024 / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--consultas', type=int, nargs='+', default=[10000, 50000])
+    parser.add_argument('--dias', type=int, nargs='+', default=[30, 730])
+    args = parser.parse_args()
+
+    hoy = date.today()
+    print(f"{'consultas':>10}{'días':>6}{'modo':>10}{'filas':>8}{'s':>8}{'pico MB':>10}")
+    for n_consultas in args.consultas:
+        consultas, atletas, profesionales = generar_datos(n_consultas)
+        stub = StubUpstream(consultas, atletas, profesionales).iniciar()
+        catalogos = _catalogos(atletas, profesionales)
+        del consultas
+        try:
+            url = stub.base_url + RUTA_CONSULTAS
+            for dias in args.dias:
+                filtros = {
+                    'fecha_inicio': (hoy - timedelta(days=dias)).isoformat(),
+                    'fecha_fin': hoy.isoformat(),
+                }
+                for modo in MODOS:
+                    r = medir(url, modo, filtros, catalogos)
+                    print(
+                        f"{n_consultas:>10}{dias:>6}{r['modo']:>10}{r['filas']:>8}"
+                        f"{r['segundos']:>8.2f}{r['pico_mb']:>10.1f}"
+                    )
+                    sys.stdout.flush()
+        finally:
+            stub.detener()
+
+
+if __name__ == '__main__':
+    main()
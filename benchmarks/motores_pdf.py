@@ -0,0 +1,79 @@
+"""
+Comparación de los motores de la tabla de detalle del reporte PDF: la tabla
+de Platypus original y el Flowable que dibuja directo en el canvas.
+
+Genera consultas sintéticas ya enriquecidas y mide el tiempo de
+`_generar_pdf` con cada motor, reportando páginas por segundo.
+
+Uso:
+    python -m benchmarks.motores_pdf --filas 500 2000 5000 --repeticiones 3
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ReportesConsulta.settings')
+django.setup()
+
+from reportes.views import ProcesamientoConsultasMixin  # noqa: E402
+
+from .datos_sinteticos import generar_datos  # noqa: E402
+
+PAGINA = re.compile(rb'/Type\s*/Page\b(?!s)')
+MOTORES = ('platypus', 'rapido')
+
+
+def consultas_enriquecidas(n_filas):
+    consultas, atletas, profesionales = generar_datos(n_filas)
+    catalogos = {
+        'atletas': {str(a['id']): a for a in atletas},
+        'profesionales': {str(p['id']): p for p in profesionales},
+    }
+    return ProcesamientoConsultasMixin()._enriquecer_consultas(consultas, catalogos)
+
+
+def medir(consultas, motor, repeticiones):
+    generador = ProcesamientoConsultasMixin()
+    filtros = {'fecha_inicio': '2020-01-01', 'fecha_fin': '2030-12-31', 'motor_pdf': motor}
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        with generador._generar_pdf(consultas, filtros) as archivo:
+            contenido = archivo.read()
+        tiempos.append(time.perf_counter() - inicio)
+    mejor = min(tiempos)
+    paginas = len(PAGINA.findall(contenido))
+    return {
+        'motor': motor,
+        'filas': len(consultas),
+        'paginas': paginas,
+        'segundos': mejor,
+        'paginas_por_segundo': paginas / mejor,
+        'kb': len(contenido) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, nargs='+', default=[500, 2000, 5000])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'filas':>7}{'motor':>10}{'páginas':>9}{'s':>9}{'pág/s':>9}{'KB':>9}")
+    for n_filas in args.filas:
+        consultas = consultas_enriquecidas(n_filas)
+        for motor in MOTORES:
+            r = medir(consultas, motor, args.repeticiones)
+            print(
+                f"{r['filas']:>7}{r['motor']:>10}{r['paginas']:>9}{r['segundos']:>9.2f}"
+                f"{r['paginas_por_segundo']:>9.1f}{r['kb']:>9.0f}"
+            )
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
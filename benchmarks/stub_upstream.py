@@ -0,0 +1,105 @@
+"""
+Backend principal simulado que sirve datos sintéticos en las rutas reales.
+
+Uso:
+    python -m benchmarks.stub_upstream --consultas 10000 --latencia 0.2 --puerto 8000
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .datos_sinteticos import generar_datos
+
+RUTA_CONSULTAS = '/Modulos/Consultas/'
+RUTA_ATLETAS = '/Catalogos/Atletas/'
+RUTA_PROFESIONALES = '/Catalogos/Profesionales-Salud/'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Encabezados y cuerpo van en escrituras separadas: con Nagle y el ACK
+    # diferido del cliente cada respuesta sumaría ~40 ms que no son del backend
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        stub = self.server.stub
+        ruta = self.path.split('?')[0]
+        cuerpo = stub.cuerpos.get(ruta)
+        if stub.latencia:
+            time.sleep(stub.latencia)
+        if cuerpo is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Los clientes cierran conexiones a medias (sondas, lectura en flujo)
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubUpstream:
+    """
+    Servidor HTTP en un hilo con latencia inyectable.
+    """
+
+    def __init__(self, consultas, atletas, profesionales, latencia=0.0, puerto=0):
+        self.latencia = latencia
+        self.cuerpos = {
+            RUTA_CONSULTAS: json.dumps(consultas).encode(),
+            RUTA_ATLETAS: json.dumps(atletas).encode(),
+            RUTA_PROFESIONALES: json.dumps(profesionales).encode(),
+        }
+        self.servidor = _Servidor(('127.0.0.1', puerto), _Handler)
+        self.servidor.stub = self
+
+    @property
+    def puerto(self):
+        return self.servidor.server_address[1]
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.puerto}'
+
+    def iniciar(self):
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        return self
+
+    def detener(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--consultas', type=int, default=10000)
+    parser.add_argument('--latencia', type=float, default=0.0, help='segundos de espera por petición')
+    parser.add_argument('--puerto', type=int, default=8000)
+    args = parser.parse_args()
+
+    stub = StubUpstream(*generar_datos(args.consultas), latencia=args.latencia, puerto=args.puerto)
+    print(f"Stub escuchando en {stub.base_url} ({args.consultas} consultas, latencia {args.latencia}s)")
+    try:
+        stub.servidor.serve_forever()
+    except KeyboardInterrupt:
+        stub.detener()
+
+
+if __name__ == '__main__':
+    main()
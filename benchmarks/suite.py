@@ -0,0 +1,359 @@
+"""
+Suite de extremo a extremo: vistas y etapas internas contra el backend simulado.
+
+Para cada escala genera datos sintéticos (`datos_sinteticos`), los sirve con
+`StubUpstream` (con la latencia de --latencia) y mide:
+
+- vistas: estadísticas, filtros, reporte PDF y exportación CSV, pedidas con
+  el cliente de pruebas de Django a través de todo el middleware. En frío se
+  vacían las cachés antes de cada petición; en caliente se reutilizan.
+- etapas: descarga de consultas, `calcular_estadisticas`,
+  `_filtrar_consultas`, `_enriquecer_consultas` y `_generar_pdf`.
+
+De cada medición se reporta latencia (p50, p95, media, máx.), operaciones y
+filas por segundo, y memoria pico de Python (`tracemalloc`, en una corrida
+aparte para no alterar los tiempos). El reporte y la exportación usan los
+últimos --dias-reporte días; `_generar_pdf` recibe a lo sumo --max-filas-pdf
+filas.
+
+Una medición que falla se registra con su error y la suite continúa. Con
+--salida los resultados se guardan en JSON; con --comparar se contrastan
+contra un JSON anterior y el proceso termina con código 1 si alguna latencia
+p50 o memoria pico empeoró más que --tolerancia, o si algo que antes
+funcionaba ahora falla.
+
+Uso:
+    python -m benchmarks.suite --escalas 1000 10000 100000 --salida base.json
+    python -m benchmarks.suite --escalas 1000 10000 100000 --comparar base.json
+    python -m benchmarks.suite --escalas 1000000 --solo etapas --repeticiones 1
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ReportesConsulta.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+
+from reportes import upstream  # noqa: E402
+from reportes.catalogos import invalidar_catalogos  # noqa: E402
+from reportes.estadisticas import calcular_estadisticas  # noqa: E402
+from reportes.views import ProcesamientoConsultasMixin  # noqa: E402
+
+from .datos_sinteticos import generar_datos  # noqa: E402
+from .stub_upstream import RUTA_ATLETAS, RUTA_CONSULTAS, RUTA_PROFESIONALES, StubUpstream  # noqa: E402
+
+RAIZ = Path(__file__).resolve().parent.parent
+GRUPOS = ('vistas', 'etapas')
+# Métricas que se comparan contra la línea base: más alto es peor
+METRICAS_REGRESION = ('p50_ms', 'pico_mb')
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def _version_codigo():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def medir(funcion, repeticiones, preparar=None, memoria=True):
+    """
+    Corre `funcion()` `repeticiones` veces y devuelve sus métricas.
+
+    `preparar()` se llama antes de cada corrida, fuera del tiempo medido.
+    `funcion` devuelve la cantidad de filas procesadas (o None).
+    """
+    tiempos = []
+    filas = None
+    for _ in range(repeticiones):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        filas = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+
+    pico_mb = None
+    if memoria:
+        if preparar is not None:
+            preparar()
+        tracemalloc.start()
+        try:
+            funcion()
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        pico_mb = pico / 1024 / 1024
+
+    media = statistics.mean(tiempos)
+    return {
+        'repeticiones': repeticiones,
+        'p50_ms': statistics.median(tiempos) * 1000,
+        'p95_ms': _percentil(tiempos, 0.95) * 1000,
+        'media_ms': media * 1000,
+        'max_ms': max(tiempos) * 1000,
+        'por_segundo': 1 / media if media else None,
+        'filas': filas,
+        'filas_por_segundo': filas / media if filas and media else None,
+        'pico_mb': pico_mb,
+    }
+
+
+def _vaciar_caches():
+    cache.clear()
+    invalidar_catalogos()
+    # El directorio es temporal (ver `correr_escala`)
+    shutil.rmtree(settings.REPORTES_PDF_CACHE_DIR, ignore_errors=True)
+
+
+def _filtros_reporte(dias):
+    hoy = date.today()
+    return {'fecha_inicio': (hoy - timedelta(days=dias)).isoformat(), 'fecha_fin': hoy.isoformat()}
+
+
+def _vista(pedir):
+    """
+    Función medible que hace la petición y lee la respuesta completa (también en streaming).
+    """
+    def funcion():
+        response = pedir()
+        if response.status_code != 200:
+            raise RuntimeError(f"La vista respondió {response.status_code}")
+        if response.streaming:
+            for _ in response:
+                pass
+        response.close()
+
+    return funcion
+
+
+def _una_vez(funcion):
+    """
+    Preparación que corre `funcion()` solo la primera vez (para calentar las cachés).
+    """
+    pendiente = [funcion]
+
+    def preparar():
+        if pendiente:
+            pendiente.pop()()
+
+    return preparar
+
+
+def benchmarks_vistas(args):
+    cliente = Client()
+    filtros = _filtros_reporte(args.dias_reporte)
+    peticiones = {
+        'estadísticas': lambda: cliente.get('/Consultas/api/estadisticas-consultas/'),
+        'filtros': lambda: cliente.get('/Consultas/api/filtros-consulta/'),
+        'reporte pdf': lambda: cliente.post(
+            '/Consultas/generar-reporte-consultas/', filtros, content_type='application/json'
+        ),
+        'exportación csv': lambda: cliente.post(
+            '/Consultas/exportar-consultas/', filtros, content_type='application/json'
+        ),
+    }
+    for nombre, pedir in peticiones.items():
+        funcion = _vista(pedir)
+        yield f'{nombre} (frío)', funcion, _vaciar_caches
+        yield f'{nombre} (caliente)', funcion, _una_vez(funcion)
+
+
+def benchmarks_etapas(args, consultas, atletas, profesionales):
+    mixin = ProcesamientoConsultasMixin()
+    catalogos = {
+        'atletas': {str(a['id']): a for a in atletas},
+        'profesionales': {str(p['id']): p for p in profesionales},
+    }
+    filtros = _filtros_reporte(args.dias_reporte)
+    filtradas = mixin._filtrar_consultas(consultas, filtros, catalogos)
+    enriquecidas = mixin._enriquecer_consultas(filtradas, catalogos)[:args.max_filas_pdf]
+    hoy = datetime.now()
+
+    def descargar():
+        return len(upstream.obtener_json(settings.API_CONSULTAS))
+
+    def estadisticas():
+        calcular_estadisticas(consultas, profesionales, atletas, hoy=hoy)
+        return len(consultas)
+
+    def filtrar():
+        mixin._filtrar_consultas(consultas, filtros, catalogos)
+        return len(consultas)
+
+    def enriquecer():
+        return len(mixin._enriquecer_consultas(filtradas, catalogos))
+
+    def generar_pdf():
+        with mixin._generar_pdf(enriquecidas, filtros) as archivo:
+            archivo.read()
+        return len(enriquecidas)
+
+    yield 'descarga consultas', descargar, None
+    yield 'calcular_estadisticas', estadisticas, None
+    yield '_filtrar_consultas', filtrar, None
+    yield '_enriquecer_consultas', enriquecer, None
+    yield '_generar_pdf', generar_pdf, None
+
+
+def correr_escala(n_consultas, args):
+    consultas, atletas, profesionales = generar_datos(
+        n_consultas, n_profesionales=args.profesionales, semilla=args.semilla
+    )
+    stub = StubUpstream(consultas, atletas, profesionales, latencia=args.latencia).iniciar()
+    directorio_pdf = tempfile.mkdtemp(prefix='cache_pdf_')
+    ajustes = override_settings(
+        ALLOWED_HOSTS=['*'],
+        REPORTES_PDF_CACHE_DIR=directorio_pdf,
+        API_BASE_URL=stub.base_url,
+        API_CONSULTAS=stub.base_url + RUTA_CONSULTAS,
+        API_ATLETAS=stub.base_url + RUTA_ATLETAS,
+        API_PROFESIONALES=stub.base_url + RUTA_PROFESIONALES,
+    )
+    resultados = []
+    ajustes.enable()
+    try:
+        grupos = {
+            'vistas': lambda: benchmarks_vistas(args),
+            'etapas': lambda: benchmarks_etapas(args, consultas, atletas, profesionales),
+        }
+        for grupo in args.solo or GRUPOS:
+            _vaciar_caches()
+            for nombre, funcion, preparar in grupos[grupo]():
+                resultado = {'escala': n_consultas, 'grupo': grupo, 'nombre': nombre}
+                try:
+                    resultado.update(medir(funcion, args.repeticiones, preparar, memoria=not args.sin_memoria))
+                except Exception as e:
+                    # Se registra y se sigue con el resto de la suite
+                    resultado['error'] = f'{type(e).__name__}: {e}'.splitlines()[0]
+                resultados.append(resultado)
+                imprimir(resultado)
+    finally:
+        _vaciar_caches()
+        ajustes.disable()
+        stub.detener()
+    return resultados
+
+
+def _numero(valor, formato):
+    return '-' if valor is None else format(valor, formato)
+
+
+def imprimir_encabezado():
+    print(
+        f"{'escala':>9}  {'grupo':<7}{'nombre':<28}{'p50 ms':>10}{'p95 ms':>10}{'máx ms':>10}"
+        f"{'op/s':>9}{'filas/s':>12}{'pico MB':>9}"
+    )
+
+
+def imprimir(r):
+    if 'error' in r:
+        print(f"{r['escala']:>9}  {r['grupo']:<7}{r['nombre']:<28}  ERROR {r['error']}")
+        sys.stdout.flush()
+        return
+    print(
+        f"{r['escala']:>9}  {r['grupo']:<7}{r['nombre']:<28}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+        f"{r['max_ms']:>10.1f}{_numero(r['por_segundo'], '.1f'):>9}{_numero(r['filas_por_segundo'], ',.0f'):>12}"
+        f"{_numero(r['pico_mb'], '.1f'):>9}"
+    )
+    sys.stdout.flush()
+
+
+def comparar(resultados, base, tolerancia):
+    """
+    Imprime la razón actual/base de cada métrica y devuelve las regresiones.
+    """
+    anteriores = {(r['escala'], r['grupo'], r['nombre']): r for r in base['resultados']}
+    regresiones = []
+    print(f"\nComparación con {base['meta'].get('commit') or 'la línea base'} ({base['meta']['fecha']})")
+    print(f"{'escala':>9}  {'nombre':<28}" + ''.join(f'{m:>12}' for m in METRICAS_REGRESION))
+    for r in resultados:
+        anterior = anteriores.get((r['escala'], r['grupo'], r['nombre']))
+        if anterior is None:
+            continue
+        if 'error' in r:
+            if 'error' not in anterior:
+                regresiones.append((r, 'error', None))
+            print(f"{r['escala']:>9}  {r['nombre']:<28}  ERROR")
+            continue
+        columnas = []
+        for metrica in METRICAS_REGRESION:
+            if not r[metrica] or not anterior.get(metrica):
+                columnas.append(f"{'-':>12}")
+                continue
+            razon = r[metrica] / anterior[metrica]
+            empeoro = razon > 1 + tolerancia
+            if empeoro:
+                regresiones.append((r, metrica, razon))
+            columnas.append(f"{razon:>10.2f}x{'!' if empeoro else ' '}")
+        print(f"{r['escala']:>9}  {r['nombre']:<28}" + ''.join(columnas))
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escalas', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--latencia', type=float, default=0.0, help='latencia simulada del backend (s)')
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--solo', choices=GRUPOS, nargs='+')
+    parser.add_argument('--dias-reporte', type=int, default=30)
+    parser.add_argument('--max-filas-pdf', type=int, default=2000)
+    parser.add_argument('--profesionales', type=int, help='por defecto, el de `generar_datos` para la escala')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--sin-memoria', action='store_true', help='omite la corrida con tracemalloc')
+    parser.add_argument('--salida', help='archivo JSON donde guardar los resultados')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior contra el que comparar')
+    parser.add_argument('--tolerancia', type=float, default=0.2, help='empeoramiento admitido (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    meta = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': _version_codigo(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'plataforma': platform.platform(),
+        'servidor': settings.SERVIDOR,
+        'argumentos': vars(args),
+    }
+    imprimir_encabezado()
+    resultados = []
+    for n_consultas in args.escalas:
+        resultados.extend(correr_escala(n_consultas, args))
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump({'meta': meta, 'resultados': resultados}, archivo, ensure_ascii=False, indent=2)
+        print(f"\nResultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            base = json.load(archivo)
+        regresiones = comparar(resultados, base, args.tolerancia)
+        if regresiones:
+            print(f"\n{len(regresiones)} regresiones por encima de {args.tolerancia:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
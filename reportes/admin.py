@@ -1,3 +1,61 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import (
+    AtletaEspejo,
+    ConsultaEspejo,
+    ConteoAtleta,
+    ConteoDiagnostico,
+    ConteoMensual,
+    EstadoSincronizacion,
+    ProfesionalEspejo,
+    TrabajoReporte,
+)
+
+
+@admin.register(ConsultaEspejo)
+class ConsultaEspejoAdmin(admin.ModelAdmin):
+    list_display = ('id_externo', 'fecha', 'atleta_id_externo', 'profesional_id_externo', 'diagnostico')
+    list_filter = ('fecha',)
+    search_fields = ('id_externo', 'atleta_id_externo', 'profesional_id_externo', 'diagnostico')
+
+
+@admin.register(AtletaEspejo)
+class AtletaEspejoAdmin(admin.ModelAdmin):
+    list_display = ('id_externo', 'nombre', 'ap_paterno', 'ap_materno')
+    search_fields = ('id_externo', 'nombre', 'ap_paterno')
+
+
+@admin.register(ProfesionalEspejo)
+class ProfesionalEspejoAdmin(admin.ModelAdmin):
+    list_display = ('id_externo', 'nombre', 'ap_paterno', 'especialidad')
+    search_fields = ('id_externo', 'nombre', 'ap_paterno')
+
+
+@admin.register(EstadoSincronizacion)
+class EstadoSincronizacionAdmin(admin.ModelAdmin):
+    list_display = ('recurso', 'marca_agua', 'ultima_ejecucion', 'registros')
+
+
+@admin.register(ConteoMensual)
+class ConteoMensualAdmin(admin.ModelAdmin):
+    list_display = ('anio', 'mes', 'profesional_id_externo', 'total')
+    list_filter = ('anio',)
+
+
+@admin.register(ConteoAtleta)
+class ConteoAtletaAdmin(admin.ModelAdmin):
+    list_display = ('atleta_id_externo', 'total')
+    search_fields = ('atleta_id_externo',)
+
+
+@admin.register(ConteoDiagnostico)
+class ConteoDiagnosticoAdmin(admin.ModelAdmin):
+    list_display = ('diagnostico', 'total')
+    search_fields = ('diagnostico',)
+
+
+@admin.register(TrabajoReporte)
+class TrabajoReporteAdmin(admin.ModelAdmin):
+    list_display = ('id', 'estado', 'progreso', 'intentos', 'creado_el', 'terminado_el')
+    list_filter = ('estado',)
+    readonly_fields = ('creado_el', 'iniciado_el', 'terminado_el')
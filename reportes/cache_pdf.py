@@ -0,0 +1,155 @@
+"""
+Caché en disco de los reportes PDF ya generados, direccionada por contenido.
+
+La clave combina los filtros normalizados del reporte, los ajustes que cambian
+el documento generado (compresión y umbral del motor rápido) y las huellas de
+las consultas y los catálogos usados, así que un PDF guardado solo se reutiliza
+mientras los datos de origen sigan siendo los mismos. El tamaño total se
+limita a `REPORTES_PDF_CACHE_MAX_MB`, desalojando los archivos usados hace
+más tiempo (la fecha de modificación se actualiza en cada acierto).
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+FILTROS_CLAVE = ['fecha_inicio', 'fecha_fin', 'atleta_id', 'profesional_id', 'motor_pdf']
+
+_lock = threading.Lock()
+_contadores = {'aciertos': 0, 'fallos': 0, 'guardados': 0, 'desalojados': 0}
+
+
+def _incrementar(contador, n=1):
+    with _lock:
+        _contadores[contador] += n
+
+
+def activa():
+    return settings.REPORTES_PDF_CACHE_MAX_MB > 0
+
+
+def _directorio():
+    directorio = Path(settings.REPORTES_PDF_CACHE_DIR)
+    directorio.mkdir(parents=True, exist_ok=True)
+    return directorio
+
+
+def normalizar_filtros(filtros):
+    """
+    Filtros que determinan el contenido del reporte, con "todos" y vacío unificados.
+    """
+    normalizados = {}
+    for campo in FILTROS_CLAVE:
+        valor = filtros.get(campo)
+        if valor in [None, "todos", ""]:
+            valor = ''
+        normalizados[campo] = str(valor).strip()
+    return normalizados
+
+
+def ajustes_pdf():
+    """
+    Ajustes que cambian los bytes del PDF con los mismos filtros y datos.
+    """
+    return {
+        'comprimir': bool(settings.REPORTES_PDF_COMPRIMIR),
+        'filas_motor_rapido': settings.REPORTES_PDF_FILAS_MOTOR_RAPIDO,
+    }
+
+
+def clave(filtros, *huellas):
+    """
+    Clave del PDF para unos filtros y las huellas de sus datos de origen.
+    """
+    contenido = json.dumps(
+        [normalizar_filtros(filtros), ajustes_pdf(), [str(h) for h in huellas]], sort_keys=True
+    )
+    return hashlib.sha256(contenido.encode()).hexdigest()
+
+
+def abrir(clave_pdf):
+    """
+    Devuelve el PDF guardado abierto en modo binario, o None si no está en caché.
+    """
+    if not activa():
+        return None
+    ruta = _directorio() / f'{clave_pdf}.pdf'
+    try:
+        archivo = open(ruta, 'rb')
+    except FileNotFoundError:
+        _incrementar('fallos')
+        return None
+    try:
+        os.utime(ruta)
+    except FileNotFoundError:
+        # Otro proceso lo desalojó después de abrirlo; el descriptor sigue válido
+        pass
+    _incrementar('aciertos')
+    return archivo
+
+
+def guardar(clave_pdf, archivo):
+    """
+    Copia un PDF abierto a la caché (y lo deja de nuevo al inicio) y desaloja
+    los menos usados si se supera el tamaño máximo.
+    """
+    if not activa():
+        return
+    directorio = _directorio()
+    temporal = directorio / f'{clave_pdf}.{uuid.uuid4().hex}.tmp'
+    with open(temporal, 'wb') as destino:
+        shutil.copyfileobj(archivo, destino)
+    archivo.seek(0)
+    os.replace(temporal, directorio / f'{clave_pdf}.pdf')
+    _incrementar('guardados')
+    _recortar(directorio)
+
+
+def _recortar(directorio):
+    limite = settings.REPORTES_PDF_CACHE_MAX_MB * 1024 * 1024
+    archivos = []
+    total = 0
+    for ruta in directorio.glob('*.pdf'):
+        try:
+            info = ruta.stat()
+        except FileNotFoundError:
+            continue
+        archivos.append((info.st_mtime, info.st_size, ruta))
+        total += info.st_size
+    if total <= limite:
+        return
+
+    archivos.sort()
+    desalojados = 0
+    for _, tamano, ruta in archivos:
+        if total <= limite:
+            break
+        try:
+            ruta.unlink()
+            desalojados += 1
+        except FileNotFoundError:
+            pass
+        total -= tamano
+    _incrementar('desalojados', desalojados)
+    logger.info("Caché de PDFs: %d archivos desalojados", desalojados)
+
+
+def estadisticas():
+    """
+    Devuelve los contadores de la caché de PDFs del proceso.
+
+    `/Consultas/metricas/` los expone sumados entre workers.
+    """
+    with _lock:
+        contadores = dict(_contadores)
+    total = contadores['aciertos'] + contadores['fallos']
+    contadores['tasa_acierto'] = contadores['aciertos'] / total if total else 0.0
+    return contadores
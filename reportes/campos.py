@@ -0,0 +1,218 @@
+"""
+Nombres de campo y formatos que el backend principal ha usado en las consultas.
+
+El backend ha cambiado de nombres a lo largo del tiempo, así que cada dato se
+busca en una lista de alias en orden de preferencia.
+
+Para recorrer lotes grandes, `LectorConsultas` detecta con la primera
+consulta qué alias y formato de fecha usa realmente el backend y arma
+accesores que leen directo esas claves. Las consultas con otro conjunto de
+claves, o cuyo valor no sirve, pasan por las funciones generales.
+"""
+import re
+from collections import namedtuple
+from datetime import datetime
+
+FECHA_CAMPOS = ['fecha', 'creado_el', 'fecha_consulta', 'created_at']
+FECHA_FORMATOS = ['%Y-%m-%dT%H:%M:%S.%fZ', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d']
+ATLETA_CAMPOS = ['atleta_id', 'atleta', 'id_atleta', 'paciente_id', 'paciente']
+PROFESIONAL_CAMPOS = [
+    'profesional_salud_id', 'profesional_salud', 'profesional_id', 'profesional',
+    'id_profesional', 'medico_id', 'medico'
+]
+DIAGNOSTICO_CAMPOS = ['diagnostico', 'diagnóstico', 'diagnostic']
+TRATAMIENTO_CAMPOS = ['tratamiento', 'treatment']
+
+# Expresiones equivalentes a cada formato de FECHA_FORMATOS, con los mismos
+# rangos de dígitos que acepta strptime
+_ANIO = r'(?P<anio>\d\d\d\d)'
+_MES = r'(?P<mes>1[0-2]|0[1-9]|[1-9])'
+_DIA = r'(?P<dia>3[01]|[12]\d|0[1-9]|[1-9]| [1-9])'
+_HORA = r'(?P<hora>2[0-3]|[0-1]\d|\d)'
+_MINUTO = r'(?P<minuto>[0-5]\d|\d)'
+_SEGUNDO = r'(?P<segundo>6[0-1]|[0-5]\d|\d)'
+_FECHA = f'{_ANIO}-{_MES}-{_DIA}'
+_PATRONES_FECHA = {
+    '%Y-%m-%dT%H:%M:%S.%fZ': re.compile(
+        rf'{_FECHA}T{_HORA}:{_MINUTO}:{_SEGUNDO}\.(?P<fraccion>\d{{1,6}})Z', re.IGNORECASE
+    ),
+    '%Y-%m-%d %H:%M:%S': re.compile(rf'{_FECHA}\s+{_HORA}:{_MINUTO}:{_SEGUNDO}', re.IGNORECASE),
+    '%Y-%m-%d': re.compile(_FECHA),
+}
+
+
+def _fecha_de_coincidencia(coincidencia):
+    partes = coincidencia.groupdict()
+    try:
+        return datetime(
+            int(partes['anio']), int(partes['mes']), int(partes['dia']),
+            int(partes.get('hora') or 0), int(partes.get('minuto') or 0), int(partes.get('segundo') or 0),
+            int((partes.get('fraccion') or '0').ljust(6, '0')),
+        )
+    except ValueError:
+        # Fecha fuera de calendario (31 de febrero, segundo 60)
+        return None
+
+
+def parsear_fecha(texto, formatos=FECHA_FORMATOS):
+    """
+    Interpreta un texto con el primer formato de `formatos` que le corresponda,
+    igual que `datetime.strptime`; devuelve None si ninguno aplica.
+    """
+    if not isinstance(texto, str):
+        return None
+    for formato in formatos:
+        coincidencia = _PATRONES_FECHA[formato].fullmatch(texto)
+        if coincidencia:
+            fecha = _fecha_de_coincidencia(coincidencia)
+            if fecha is not None:
+                return fecha
+    return None
+
+
+def obtener_id_de_campo(objeto, posibles_campos):
+    """
+    Obtiene el ID de un campo que puede estar en diferentes formatos.
+    """
+    for campo in posibles_campos:
+        if campo in objeto:
+            valor = objeto[campo]
+            if isinstance(valor, dict) and 'id' in valor:
+                return str(valor['id'])
+            elif valor is not None:
+                return str(valor)
+    return None
+
+
+def parsear_fecha_consulta(consulta):
+    """
+    Devuelve la fecha de la consulta como datetime, o None si no se puede determinar.
+    """
+    for campo in FECHA_CAMPOS:
+        if campo in consulta and consulta[campo]:
+            fecha = parsear_fecha(consulta[campo])
+            if fecha is not None:
+                return fecha
+    return None
+
+
+def obtener_texto(consulta, posibles_campos, por_defecto="No especificado"):
+    """
+    Devuelve el primer valor no vacío entre los alias dados.
+    """
+    for campo in posibles_campos:
+        if campo in consulta and consulta[campo]:
+            return consulta[campo]
+    return por_defecto
+
+
+Accesores = namedtuple(
+    'Accesores', ['fecha', 'fecha_texto', 'atleta_id', 'profesional_id', 'diagnostico', 'tratamiento']
+)
+
+ACCESORES_GENERALES = Accesores(
+    fecha=parsear_fecha_consulta,
+    fecha_texto=lambda consulta: obtener_texto(consulta, FECHA_CAMPOS, ""),
+    atleta_id=lambda consulta: obtener_id_de_campo(consulta, ATLETA_CAMPOS),
+    profesional_id=lambda consulta: obtener_id_de_campo(consulta, PROFESIONAL_CAMPOS),
+    diagnostico=lambda consulta: obtener_texto(consulta, DIAGNOSTICO_CAMPOS),
+    tratamiento=lambda consulta: obtener_texto(consulta, TRATAMIENTO_CAMPOS),
+)
+
+
+def _primer_alias(claves, posibles_campos):
+    return next((campo for campo in posibles_campos if campo in claves), None)
+
+
+def _accesor_id(campo, posibles_campos, general):
+    if campo is None:
+        return general
+
+    def accesor(consulta):
+        valor = consulta[campo]
+        if isinstance(valor, dict):
+            if 'id' in valor:
+                return str(valor['id'])
+        elif valor is not None:
+            return str(valor)
+        return general(consulta)
+    return accesor
+
+
+def _accesor_texto(campo, general):
+    if campo is None:
+        return general
+
+    def accesor(consulta):
+        return consulta[campo] or general(consulta)
+    return accesor
+
+
+def _accesor_fecha(campo, formato, general):
+    if campo is None or formato is None:
+        return general
+    patron = _PATRONES_FECHA[formato]
+
+    def accesor(consulta):
+        valor = consulta[campo]
+        if valor and isinstance(valor, str):
+            coincidencia = patron.fullmatch(valor)
+            if coincidencia:
+                fecha = _fecha_de_coincidencia(coincidencia)
+                if fecha is not None:
+                    return fecha
+        return general(consulta)
+    return accesor
+
+
+def compilar_accesores(muestra):
+    """
+    Accesores especializados para las consultas con las mismas claves que `muestra`.
+
+    Con las mismas claves el alias que gana es siempre el mismo, así que cada
+    accesor lee esa clave directamente y solo recurre al general cuando el
+    valor no sirve (vacío, None, o una fecha con otro formato).
+    """
+    claves = muestra.keys()
+    campo_fecha = _primer_alias(claves, FECHA_CAMPOS)
+    formato_fecha = None
+    if campo_fecha is not None and isinstance(muestra[campo_fecha], str):
+        formato_fecha = next(
+            (f for f in FECHA_FORMATOS if _PATRONES_FECHA[f].fullmatch(muestra[campo_fecha])), None
+        )
+    generales = ACCESORES_GENERALES
+    return Accesores(
+        fecha=_accesor_fecha(campo_fecha, formato_fecha, generales.fecha),
+        fecha_texto=_accesor_texto(campo_fecha, generales.fecha_texto),
+        atleta_id=_accesor_id(_primer_alias(claves, ATLETA_CAMPOS), ATLETA_CAMPOS, generales.atleta_id),
+        profesional_id=_accesor_id(
+            _primer_alias(claves, PROFESIONAL_CAMPOS), PROFESIONAL_CAMPOS, generales.profesional_id
+        ),
+        diagnostico=_accesor_texto(_primer_alias(claves, DIAGNOSTICO_CAMPOS), generales.diagnostico),
+        tratamiento=_accesor_texto(_primer_alias(claves, TRATAMIENTO_CAMPOS), generales.tratamiento),
+    )
+
+
+class LectorConsultas:
+    """
+    Elige los accesores de cada consulta de un lote.
+
+    El esquema se detecta con la primera consulta; las siguientes con el
+    mismo conjunto de claves usan los accesores compilados y el resto los
+    generales (`lentas` cuenta cuántas fueron).
+    """
+
+    def __init__(self):
+        self.claves = None
+        self.compilados = None
+        self.lentas = 0
+
+    def accesores(self, consulta):
+        if self.claves is None:
+            self.claves = frozenset(consulta)
+            self.compilados = compilar_accesores(consulta)
+            return self.compilados
+        if consulta.keys() == self.claves:
+            return self.compilados
+        self.lentas += 1
+        return ACCESORES_GENERALES
@@ -0,0 +1,109 @@
+"""
+Detección de los filtros que el backend principal aplica de verdad.
+
+Los reportes envían sus filtros como parámetros de la petición, pero el
+backend no siempre los respeta. Para cada filtro se hace una petición sonda
+con un valor imposible (una fecha de inicio en el año 9999, un id -1): si la
+respuesta llega vacía el backend lo aplica. La sonda solo lee el primer
+elemento de la respuesta, así que cuesta poco incluso si el filtro se ignora.
+
+Una sonda que falla (error de red, 4xx/5xx, JSON inválido) cuenta ese filtro
+como no aplicado. El resultado se guarda en el caché de Django por
+`UPSTREAM_FILTROS_TTL` segundos, o por `UPSTREAM_FILTROS_TTL_FALLO` si
+alguna sonda falló, para reintentar pronto sin sondear en cada reporte.
+Quien confía en él debe revisar una muestra de lo recibido y
+llamar a `olvidar()` si encuentra filas fuera de los filtros.
+"""
+import logging
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from . import upstream
+
+logger = logging.getLogger(__name__)
+
+SONDAS = {
+    'fecha_inicio': '9999-12-31',
+    'fecha_fin': '0001-01-01',
+    'atleta_id': '-1',
+    'profesional_id': '-1',
+}
+# Filas de cada respuesta que se revisan antes de confiar en el filtrado del backend
+MUESTRA_VERIFICACION = 200
+
+_VACIO = object()
+
+
+def _clave(url):
+    return f'reportes:filtros-backend:{url}'
+
+
+def activa():
+    return settings.UPSTREAM_FILTROS_TTL > 0
+
+
+def _sondear(url, filtro, timeout):
+    """
+    True si el backend aplica `filtro`, False si no, None si la sonda falló.
+    """
+    try:
+        with upstream.abrir_json_en_flujo(url, params={filtro: SONDAS[filtro]}, timeout=timeout) as respuesta:
+            return next(iter(respuesta), _VACIO) is _VACIO
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.warning("Falló la sonda del filtro %s en %s: %s", filtro, url, str(e))
+        return None
+
+
+def detectar(url, timeout=None):
+    """
+    Sondea el backend y devuelve (filtros que aplica, filtros cuya sonda falló).
+    """
+    futuros = {
+        filtro: upstream.enviar_funcion(_sondear, url, filtro, timeout)
+        for filtro in SONDAS
+    }
+    aplicados, fallidos = set(), set()
+    for filtro, futuro in futuros.items():
+        resultado = futuro.result()
+        if resultado is None:
+            fallidos.add(filtro)
+        elif resultado:
+            aplicados.add(filtro)
+    return frozenset(aplicados), frozenset(fallidos)
+
+
+def filtros_aplicados(url, timeout=None):
+    """
+    Filtros que el backend aplica en `url`, desde el caché o sondeando.
+
+    Los filtros cuya sonda falla no se consideran aplicados; en ese caso el
+    resultado se recuerda solo por `UPSTREAM_FILTROS_TTL_FALLO` segundos.
+    """
+    if not activa():
+        return frozenset()
+    aplicados = cache.get(_clave(url))
+    if aplicados is not None:
+        return aplicados
+    aplicados, fallidos = detectar(url, timeout=timeout)
+    logger.info("Filtros aplicados por el backend en %s: %s", url, sorted(aplicados) or 'ninguno')
+    ttl = settings.UPSTREAM_FILTROS_TTL
+    if fallidos:
+        ttl = min(ttl, settings.UPSTREAM_FILTROS_TTL_FALLO)
+    cache.set(_clave(url), aplicados, ttl)
+    return aplicados
+
+
+def cubre(url, params, timeout=None):
+    """
+    True si el backend aplica todos los filtros de `params`.
+    """
+    return set(params) <= filtros_aplicados(url, timeout=timeout)
+
+
+def olvidar(url):
+    """
+    Descarta lo detectado para `url`; la siguiente consulta vuelve a sondear.
+    """
+    cache.delete(_clave(url))
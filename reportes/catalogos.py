@@ -0,0 +1,168 @@
+"""
+Caché de los catálogos de atletas y profesionales.
+
+Guarda en el caché de Django los diccionarios indexados por id que usan las
+vistas, con TTL configurable y una ventana stale-while-revalidate: pasado el
+TTL se sigue sirviendo la copia anterior mientras un hilo en segundo plano la
+refresca. Cada proceso conserva además la última copia deserializada y solo
+vuelve a leerla del caché cuando cambia su versión.
+
+Cada copia lleva además una huella del contenido (derivada de las huellas de
+las respuestas del backend) que no cambia si un refresco trae los mismos datos.
+"""
+import hashlib
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import upstream
+
+logger = logging.getLogger(__name__)
+
+CLAVE_DATOS = 'reportes:catalogos:datos'
+CLAVE_VERSION = 'reportes:catalogos:version'
+CLAVE_REFRESCO = 'reportes:catalogos:refrescando'
+
+_local = {'version': None, 'entrada': None}
+_local_lock = threading.Lock()
+
+
+def _indexar(registros):
+    return {str(registro['id']): registro for registro in registros}
+
+
+def _guardar(catalogos, huella):
+    entrada = {
+        'version': uuid.uuid4().hex,
+        'huella': huella,
+        'generado': time.time(),
+        'catalogos': catalogos,
+    }
+    duracion = settings.CATALOGOS_CACHE_TTL + settings.CATALOGOS_CACHE_SWR
+    cache.set(CLAVE_DATOS, entrada, duracion)
+    cache.set(CLAVE_VERSION, entrada['version'], duracion)
+    with _local_lock:
+        _local['version'] = entrada['version']
+        _local['entrada'] = entrada
+    return entrada
+
+
+def _leer():
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        return None
+    with _local_lock:
+        if _local['version'] == version:
+            return _local['entrada']
+    entrada = cache.get(CLAVE_DATOS)
+    if entrada is None or entrada['version'] != version:
+        return None
+    with _local_lock:
+        _local['version'] = version
+        _local['entrada'] = entrada
+    return entrada
+
+
+def _descargar(timeout=None):
+    futuro_atletas = upstream.enviar_versionado(settings.API_ATLETAS, timeout=timeout)
+    futuro_profesionales = upstream.enviar_versionado(settings.API_PROFESIONALES, timeout=timeout)
+    return futuro_atletas, futuro_profesionales
+
+
+def _guardar_descarga(futuros):
+    futuro_atletas, futuro_profesionales = futuros
+    atletas, huella_atletas = futuro_atletas.result()
+    profesionales, huella_profesionales = futuro_profesionales.result()
+    huella = hashlib.sha1(f'{huella_atletas}|{huella_profesionales}'.encode()).hexdigest()
+    return _guardar({
+        'atletas': _indexar(atletas),
+        'profesionales': _indexar(profesionales),
+    }, huella)
+
+
+def refrescar_catalogos(timeout=None):
+    """
+    Descarga ambos catálogos y reemplaza la copia en caché.
+    """
+    return _guardar_descarga(_descargar(timeout))['catalogos']
+
+
+def _refrescar_en_segundo_plano():
+    # cache.add es atómico: solo un proceso/hilo refresca a la vez
+    if not cache.add(CLAVE_REFRESCO, 1, settings.UPSTREAM_TIMEOUT_LECTURA * 2):
+        return
+
+    def refrescar():
+        try:
+            refrescar_catalogos()
+            logger.info("Catálogos refrescados en segundo plano")
+        except Exception as e:
+            logger.warning("No se pudieron refrescar los catálogos: %s", str(e))
+        finally:
+            cache.delete(CLAVE_REFRESCO)
+
+    threading.Thread(target=refrescar, name='refresco-catalogos', daemon=True).start()
+
+
+def invalidar_catalogos():
+    """
+    Descarta los catálogos en caché; la siguiente lectura los descarga de nuevo.
+    """
+    cache.delete_many([CLAVE_DATOS, CLAVE_VERSION])
+    with _local_lock:
+        _local['version'] = None
+        _local['entrada'] = None
+
+
+class SolicitudCatalogos:
+    """
+    Catálogos pedidos por una vista.
+
+    Si están en caché quedan resueltos de inmediato; si no, las descargas
+    arrancan en paralelo al crear la solicitud y `resultado()` espera por
+    ellas. Así la vista puede lanzar sus otras peticiones mientras tanto.
+    """
+
+    def __init__(self, timeout=None):
+        self._entrada = None
+        self._futuros = None
+        entrada = _leer()
+        if entrada is not None:
+            self._entrada = entrada
+            if time.time() - entrada['generado'] > settings.CATALOGOS_CACHE_TTL:
+                _refrescar_en_segundo_plano()
+        else:
+            self._futuros = _descargar(timeout)
+
+    def resultado_versionado(self):
+        """
+        Devuelve (catálogos indexados, huella del contenido) o relanza la falla de la descarga.
+        """
+        if self._entrada is None:
+            self._entrada = _guardar_descarga(self._futuros)
+        # Las copias guardadas antes de existir la huella usan su versión
+        return self._entrada['catalogos'], self._entrada.get('huella', self._entrada['version'])
+
+    def resultado(self):
+        """
+        Devuelve los catálogos indexados o relanza la falla de la descarga.
+        """
+        return self.resultado_versionado()[0]
+
+
+def obtener_catalogos(timeout=None):
+    """
+    Devuelve {'atletas': {...}, 'profesionales': {...}} indexados por id.
+    """
+    return SolicitudCatalogos(timeout).resultado()
+
+
+def obtener_catalogos_versionados(timeout=None):
+    """
+    Como `obtener_catalogos`, pero devuelve (catálogos, huella del contenido).
+    """
+    return SolicitudCatalogos(timeout).resultado_versionado()
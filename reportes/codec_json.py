@@ -0,0 +1,101 @@
+"""
+Codificación y decodificación de JSON con orjson cuando está instalado.
+
+Lo usan el cliente del backend (cuerpos de consultas y catálogos), las vistas
+asíncronas, y el renderer y parser de DRF configurados en `REST_FRAMEWORK`.
+Con `JSON_CODEC = 'stdlib'` o sin orjson todo pasa por la biblioteca estándar
+como antes.
+
+La salida es la misma, byte a byte, que la del `JSONRenderer` de DRF con su
+configuración por defecto (compacta y en UTF-8, con U+2028/U+2029 escapados,
+fechas en el formato de DRF). Lo que orjson no sabe serializar (enteros de más
+de 64 bits, tipos sin soporte) se resuelve con el renderer estándar.
+"""
+import json
+
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+_codificador_drf = JSONEncoder()
+# Las fechas las formatea el encoder de DRF, no orjson
+_OPCIONES = orjson.OPT_PASSTHROUGH_DATETIME if orjson is not None else 0
+
+
+def rapido():
+    return orjson is not None and settings.JSON_CODEC == 'orjson'
+
+
+def cargar(contenido):
+    """
+    Parsea un cuerpo JSON (bytes o str).
+    """
+    if rapido():
+        try:
+            return orjson.loads(contenido)
+        except orjson.JSONDecodeError:
+            # BOM, UTF-16/32 o JSON inválido: la biblioteca estándar decide
+            pass
+    return json.loads(contenido)
+
+
+def _escapar_separadores(contenido):
+    # Igual que DRF: U+2028 y U+2029 escapados para que sea JavaScript válido
+    if b'\xe2\x80' in contenido:
+        contenido = contenido.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return contenido
+
+
+def volcar(datos, ordenar=False):
+    """
+    Serializa `datos` en JSON compacto UTF-8 (bytes), con el formato del JSONRenderer de DRF.
+    """
+    if rapido():
+        opciones = _OPCIONES | orjson.OPT_SORT_KEYS if ordenar else _OPCIONES
+        try:
+            return _escapar_separadores(orjson.dumps(datos, default=_codificador_drf.default, option=opciones))
+        except (orjson.JSONEncodeError, TypeError):
+            pass
+    if ordenar:
+        contenido = json.dumps(
+            datos, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'), sort_keys=True
+        )
+        return _escapar_separadores(contenido.encode())
+    return JSONRenderer().render(datos)
+
+
+class JSONRendererRapido(JSONRenderer):
+    """
+    JSONRenderer que usa `volcar` salvo que se pida indentación o se cambie
+    la configuración de salida de DRF (UNICODE_JSON, COMPACT_JSON).
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.ensure_ascii or not self.compact or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return volcar(data)
+
+
+class JSONParserRapido(JSONParser):
+    """
+    JSONParser que decodifica con `cargar` los cuerpos en UTF-8.
+    """
+    renderer_class = JSONRendererRapido
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        codificacion = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if not rapido() or codificacion.lower() not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return cargar(stream.read())
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
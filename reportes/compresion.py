@@ -0,0 +1,169 @@
+"""
+Compresión de respuestas según el Accept-Encoding del cliente.
+
+`CompresionMiddleware` comprime con brotli (si está instalado) o gzip las
+respuestas cuyo Content-Type está en `COMPRESION_TIPOS` (JSON de la API,
+exportaciones CSV). Los PDF y XLSX ya van comprimidos y se envían tal cual.
+
+- Las respuestas normales se comprimen si miden al menos `COMPRESION_MINIMO`
+  bytes y solo se reemplazan si el resultado es más chico.
+- Las respuestas en flujo se comprimen bloque a bloque con un solo compresor
+  (un único miembro gzip, no uno por bloque como el GZipMiddleware de
+  Django), vaciándolo tras cada bloque para que el cliente lo reciba sin
+  esperar al final. Bajo ASGI el iterador asíncrono sigue siendo asíncrono.
+
+El nivel de gzip (`COMPRESION_NIVEL_GZIP`) y la calidad de brotli
+(`COMPRESION_NIVEL_BROTLI`) son configurables. Un ETag fuerte pasa a débil
+(`W/`), porque los bytes enviados ya no son los de la entidad original; la
+comparación de `If-None-Match` de Django ignora el `W/`, así que los 304 de
+`reportes.respuestas` siguen funcionando.
+"""
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+# En empate de preferencia gana la primera
+CODIFICACIONES = ('br', 'gzip')
+
+
+def disponibles():
+    return tuple(c for c in CODIFICACIONES if c != 'br' or brotli is not None)
+
+
+def _calidad(parametros):
+    for parametro in parametros:
+        nombre, _, valor = parametro.partition('=')
+        if nombre.strip().lower() == 'q':
+            try:
+                return float(valor)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def elegir_codificacion(accept_encoding):
+    """
+    Codificación a usar para un Accept-Encoding (con valores q y `*`), o None.
+    """
+    calidades = {}
+    for elemento in accept_encoding.split(','):
+        nombre, *parametros = elemento.split(';')
+        nombre = nombre.strip().lower()
+        if nombre:
+            calidades[nombre] = _calidad(parametros)
+    comodin = calidades.get('*', 0.0)
+    elegida, mejor = None, 0.0
+    for codificacion in disponibles():
+        calidad = calidades.get(codificacion, comodin)
+        if calidad > mejor:
+            elegida, mejor = codificacion, calidad
+    return elegida
+
+
+class Compresor:
+    """
+    Compresor incremental gzip o brotli con la configuración de settings.
+    """
+
+    def __init__(self, codificacion):
+        self.codificacion = codificacion
+        if codificacion == 'br':
+            self._compresor = brotli.Compressor(quality=settings.COMPRESION_NIVEL_BROTLI)
+        else:
+            # wbits 16 + MAX_WBITS: formato gzip (cabecera y CRC)
+            self._compresor = zlib.compressobj(settings.COMPRESION_NIVEL_GZIP, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def comprimir(self, bloque, vaciar=False):
+        """
+        Comprime `bloque`; con `vaciar` devuelve también lo pendiente del compresor.
+        """
+        if self.codificacion == 'br':
+            salida = self._compresor.process(bloque)
+            return salida + self._compresor.flush() if vaciar else salida
+        salida = self._compresor.compress(bloque)
+        return salida + self._compresor.flush(zlib.Z_SYNC_FLUSH) if vaciar else salida
+
+    def terminar(self):
+        if self.codificacion == 'br':
+            return self._compresor.finish()
+        return self._compresor.flush()
+
+
+def comprimir_contenido(contenido, codificacion):
+    compresor = Compresor(codificacion)
+    return compresor.comprimir(contenido) + compresor.terminar()
+
+
+def comprimir_flujo(bloques, codificacion):
+    compresor = Compresor(codificacion)
+    for bloque in bloques:
+        salida = compresor.comprimir(bloque, vaciar=True)
+        if salida:
+            yield salida
+    yield compresor.terminar()
+
+
+async def comprimir_flujo_async(bloques, codificacion):
+    compresor = Compresor(codificacion)
+    async for bloque in bloques:
+        salida = compresor.comprimir(bloque, vaciar=True)
+        if salida:
+            yield salida
+    yield compresor.terminar()
+
+
+def comprimible(response):
+    if response.has_header('Content-Encoding'):
+        return False
+    tipo = response.get('Content-Type', '').split(';')[0].strip().lower()
+    if tipo not in settings.COMPRESION_TIPOS:
+        return False
+    if response.streaming:
+        # Solo se descarta un flujo si anuncia que es chico
+        tamano = response.get('Content-Length')
+        return tamano is None or int(tamano) >= settings.COMPRESION_MINIMO
+    return len(response.content) >= settings.COMPRESION_MINIMO
+
+
+class CompresionMiddleware(MiddlewareMixin):
+    """
+    Comprime con brotli o gzip las respuestas de los tipos configurados.
+    """
+
+    def process_response(self, request, response):
+        if not comprimible(response):
+            return response
+
+        # La respuesta depende del Accept-Encoding aunque esta vez no se comprima
+        patch_vary_headers(response, ('Accept-Encoding',))
+        codificacion = elegir_codificacion(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if codificacion is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = comprimir_flujo_async(response.streaming_content, codificacion)
+            else:
+                response.streaming_content = comprimir_flujo(response.streaming_content, codificacion)
+            # El tamaño final no se conoce hasta terminar
+            if response.has_header('Content-Length'):
+                del response['Content-Length']
+        else:
+            contenido = comprimir_contenido(response.content, codificacion)
+            if len(contenido) >= len(response.content):
+                return response
+            response.content = contenido
+            response['Content-Length'] = str(len(contenido))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = codificacion
+        return response
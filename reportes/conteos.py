@@ -0,0 +1,227 @@
+"""
+Conteos materializados del dashboard de estadísticas sobre el espejo local.
+
+Las tablas `ConteoMensual`, `ConteoAtleta` y `ConteoDiagnostico` se mantienen
+al sincronizar: se toma el perfil (fecha, atleta, profesional, diagnóstico)
+de las filas del lote antes y después de escribirlas y se aplica solo la
+diferencia. El dashboard lee de aquí, con un costo que depende del número de
+meses, profesionales, atletas y diagnósticos, no del tamaño de la historia.
+"""
+import logging
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from .estadisticas import AcumuladorConsultas
+from .models import ConsultaEspejo, ConteoAtleta, ConteoDiagnostico, ConteoMensual
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE = 1000
+DIAGNOSTICOS_EXCLUIDOS = ('', 'Sin diagnóstico')
+
+
+class Conteos:
+    """
+    Conteos por (año, mes, profesional), por atleta y por diagnóstico.
+
+    Sirve tanto para el contenido completo de las tablas como para la
+    diferencia que deja un lote de la sincronización.
+    """
+
+    def __init__(self):
+        self.por_mes_profesional = Counter()
+        self.por_atleta = Counter()
+        self.diagnosticos = Counter()
+
+    def sumar(self, filas, signo=1):
+        """
+        Suma (o resta, con signo=-1) filas de `perfil()` a los conteos.
+        """
+        for fecha, atleta, profesional, diagnostico in filas:
+            if fecha is not None:
+                self.por_mes_profesional[(fecha.year, fecha.month, profesional or '')] += signo
+            self.por_atleta[atleta or ''] += signo
+            if diagnostico not in DIAGNOSTICOS_EXCLUIDOS:
+                self.diagnosticos[diagnostico] += signo
+        return self
+
+    def acumulador(self):
+        """
+        Convierte los conteos en el acumulador que consume `construir_respuesta`.
+        """
+        acumulador = AcumuladorConsultas()
+        acumulador.total = sum(self.por_atleta.values())
+        for (anio, mes, profesional), total in self.por_mes_profesional.items():
+            acumulador.por_mes[(anio, mes)] += total
+            acumulador.por_mes_profesional[(anio, mes, profesional)] += total
+        acumulador.por_atleta.update(self.por_atleta)
+        acumulador.diagnosticos.update(self.diagnosticos)
+        return acumulador
+
+    def diferencias(self, otro):
+        """
+        Nombres de los conteos que no coinciden con los de `otro`.
+        """
+        secciones = ('por_mes_profesional', 'por_atleta', 'diagnosticos')
+        return [
+            seccion for seccion in secciones
+            if +getattr(self, seccion) != +getattr(otro, seccion)
+        ]
+
+
+def perfil(ids_externos):
+    """
+    Columnas del espejo que intervienen en los conteos, para las filas dadas.
+    """
+    ids_externos = list(ids_externos)
+    filas = []
+    for i in range(0, len(ids_externos), TAMANO_LOTE):
+        filas.extend(
+            ConsultaEspejo.objects
+            .filter(id_externo__in=ids_externos[i:i + TAMANO_LOTE])
+            .values_list('fecha', 'atleta_id_externo', 'profesional_id_externo', 'diagnostico')
+        )
+    return filas
+
+
+def calcular():
+    """
+    Calcula los conteos desde cero con agregaciones SQL sobre el espejo.
+    """
+    conteos = Conteos()
+    consultas = ConsultaEspejo.objects.all()
+
+    por_mes = (
+        consultas.filter(fecha__isnull=False)
+        .annotate(anio=ExtractYear('fecha'), mes=ExtractMonth('fecha'))
+        .values_list('anio', 'mes', 'profesional_id_externo')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    for anio, mes, profesional, total in por_mes:
+        conteos.por_mes_profesional[(anio, mes, profesional or '')] += total
+
+    por_atleta = consultas.values_list('atleta_id_externo').annotate(total=Count('id')).order_by()
+    for atleta, total in por_atleta:
+        conteos.por_atleta[atleta or ''] += total
+
+    diagnosticos = (
+        consultas.exclude(diagnostico__in=DIAGNOSTICOS_EXCLUIDOS)
+        .values_list('diagnostico')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    for diagnostico, total in diagnosticos:
+        conteos.diagnosticos[diagnostico] = total
+
+    return conteos
+
+
+def leer():
+    """
+    Lee los conteos materializados.
+    """
+    conteos = Conteos()
+    for anio, mes, profesional, total in ConteoMensual.objects.values_list(
+        'anio', 'mes', 'profesional_id_externo', 'total'
+    ):
+        conteos.por_mes_profesional[(anio, mes, profesional)] = total
+    conteos.por_atleta.update(dict(ConteoAtleta.objects.values_list('atleta_id_externo', 'total')))
+    conteos.diagnosticos.update(dict(ConteoDiagnostico.objects.values_list('diagnostico', 'total')))
+    return conteos
+
+
+def _aplicar(registros, clave, cambios, crear):
+    """
+    Suma `cambios` ({clave: delta}) a los `registros` existentes; crea los que
+    faltan y elimina los que quedan en cero.
+    """
+    existentes = {clave(registro): registro for registro in registros}
+    modificados, eliminados, nuevos = [], [], []
+    for llave, delta in cambios.items():
+        if not delta:
+            continue
+        registro = existentes.get(llave)
+        if registro is None:
+            if delta < 0:
+                logger.warning(
+                    "Conteo %s inexistente al restar; ejecute reconstruir_estadisticas", llave
+                )
+                continue
+            nuevos.append(crear(llave, delta))
+            continue
+        registro.total += delta
+        if registro.total <= 0:
+            eliminados.append(registro.pk)
+        else:
+            modificados.append(registro)
+    return modificados, eliminados, nuevos
+
+
+def aplicar(cambios):
+    """
+    Aplica la diferencia de un lote a las tablas materializadas.
+
+    Debe llamarse dentro de la misma transacción que escribe el espejo.
+    """
+    anios = {anio for anio, _, _ in cambios.por_mes_profesional}
+    modificados, eliminados, nuevos = _aplicar(
+        ConteoMensual.objects.select_for_update().filter(anio__in=anios),
+        lambda r: (r.anio, r.mes, r.profesional_id_externo),
+        cambios.por_mes_profesional,
+        lambda llave, total: ConteoMensual(
+            anio=llave[0], mes=llave[1], profesional_id_externo=llave[2], total=total
+        ),
+    )
+    ConteoMensual.objects.bulk_update(modificados, ['total'], batch_size=TAMANO_LOTE)
+    ConteoMensual.objects.filter(pk__in=eliminados).delete()
+    ConteoMensual.objects.bulk_create(nuevos, batch_size=TAMANO_LOTE)
+
+    modificados, eliminados, nuevos = _aplicar(
+        ConteoAtleta.objects.select_for_update().filter(
+            atleta_id_externo__in=[a for a, delta in cambios.por_atleta.items() if delta]
+        ),
+        lambda r: r.atleta_id_externo,
+        cambios.por_atleta,
+        lambda llave, total: ConteoAtleta(atleta_id_externo=llave, total=total),
+    )
+    ConteoAtleta.objects.bulk_update(modificados, ['total'], batch_size=TAMANO_LOTE)
+    ConteoAtleta.objects.filter(pk__in=eliminados).delete()
+    ConteoAtleta.objects.bulk_create(nuevos, batch_size=TAMANO_LOTE)
+
+    modificados, eliminados, nuevos = _aplicar(
+        ConteoDiagnostico.objects.select_for_update().filter(
+            diagnostico__in=[d for d, delta in cambios.diagnosticos.items() if delta]
+        ),
+        lambda r: r.diagnostico,
+        cambios.diagnosticos,
+        lambda llave, total: ConteoDiagnostico(diagnostico=llave, total=total),
+    )
+    ConteoDiagnostico.objects.bulk_update(modificados, ['total'], batch_size=TAMANO_LOTE)
+    ConteoDiagnostico.objects.filter(pk__in=eliminados).delete()
+    ConteoDiagnostico.objects.bulk_create(nuevos, batch_size=TAMANO_LOTE)
+
+
+def reconstruir():
+    """
+    Vuelve a calcular las tablas materializadas a partir de todo el espejo.
+    """
+    with transaction.atomic():
+        conteos = calcular()
+        ConteoMensual.objects.all().delete()
+        ConteoAtleta.objects.all().delete()
+        ConteoDiagnostico.objects.all().delete()
+        aplicar(conteos)
+    return conteos
+
+
+def verificar():
+    """
+    Compara las tablas materializadas con un cálculo desde cero.
+
+    Devuelve los nombres de los conteos que no coinciden (lista vacía si todo cuadra).
+    """
+    return leer().diferencias(calcular())
@@ -0,0 +1,248 @@
+"""
+Espejo local en PostgreSQL de las consultas, atletas y profesionales.
+
+`sincronizar()` trae los datos del backend principal de forma incremental
+usando una marca de agua por fecha. Con `REPORTES_FUENTE_DATOS = 'espejo'`
+las vistas leen de aquí y el filtrado y la agregación se resuelven con SQL
+sobre columnas indexadas.
+"""
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import conteos, upstream
+from .campos import ACCESORES_GENERALES, LectorConsultas
+from .models import AtletaEspejo, ConsultaEspejo, EstadoSincronizacion, ProfesionalEspejo
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE = 1000
+
+
+def usar_espejo():
+    return settings.REPORTES_FUENTE_DATOS == 'espejo'
+
+
+def _filtro_activo(filtros, campo):
+    return campo in filtros and filtros[campo] not in [None, "todos", ""]
+
+
+# --- Sincronización -------------------------------------------------------
+
+def _sincronizar_catalogo(url, modelo, campos):
+    registros = upstream.obtener_json(url)
+    objetos = [
+        modelo(
+            id_externo=str(registro['id']),
+            datos=registro,
+            **{campo: registro.get(origen) or '' for campo, origen in campos.items()}
+        )
+        for registro in registros
+    ]
+    with transaction.atomic():
+        modelo.objects.bulk_create(
+            objetos,
+            batch_size=TAMANO_LOTE,
+            update_conflicts=True,
+            unique_fields=['id_externo'],
+            update_fields=['datos', 'sincronizado_el'] + list(campos),
+        )
+    return len(objetos)
+
+
+def sincronizar_catalogos():
+    """
+    Copia completa de los catálogos de atletas y profesionales.
+    """
+    atletas = _sincronizar_catalogo(settings.API_ATLETAS, AtletaEspejo, {
+        'nombre': 'nombre', 'ap_paterno': 'apPaterno', 'ap_materno': 'apMaterno',
+    })
+    profesionales = _sincronizar_catalogo(settings.API_PROFESIONALES, ProfesionalEspejo, {
+        'nombre': 'nombre', 'ap_paterno': 'apPaterno', 'ap_materno': 'apMaterno',
+        'especialidad': 'especialidad',
+    })
+    return {'atletas': atletas, 'profesionales': profesionales}
+
+
+def consulta_a_espejo(consulta, acceso=ACCESORES_GENERALES):
+    """
+    Convierte un registro del backend en una fila del espejo (sin guardarla).
+    """
+    fecha = acceso.fecha(consulta)
+    diagnostico = consulta.get('diagnostico')
+    return ConsultaEspejo(
+        id_externo=str(consulta['id']),
+        fecha=fecha.date() if fecha else None,
+        atleta_id_externo=acceso.atleta_id(consulta),
+        profesional_id_externo=acceso.profesional_id(consulta),
+        diagnostico=diagnostico.strip() if isinstance(diagnostico, str) else '',
+        datos=consulta,
+    )
+
+
+def guardar_consultas(filas):
+    """
+    Inserta o actualiza filas del espejo por su id externo.
+    """
+    ConsultaEspejo.objects.bulk_create(
+        filas,
+        batch_size=TAMANO_LOTE,
+        update_conflicts=True,
+        unique_fields=['id_externo'],
+        update_fields=[
+            'fecha', 'atleta_id_externo', 'profesional_id_externo',
+            'diagnostico', 'datos', 'sincronizado_el'
+        ],
+    )
+
+
+def sincronizar_consultas(completo=False):
+    """
+    Trae las consultas nuevas o modificadas desde la marca de agua.
+
+    Se vuelve a pedir una ventana de `ESPEJO_DIAS_SOLAPAMIENTO` días antes de
+    la marca para recoger ediciones tardías. La marca nunca pasa de hoy: una
+    consulta con fecha futura (un error de captura) no debe dejar fuera de
+    las siguientes sincronizaciones a las filas nuevas. Con `completo=True` se trae toda
+    la historia y se eliminan del espejo las consultas que ya no existen.
+
+    Los conteos materializados se actualizan en la misma transacción con la
+    diferencia del lote; en la primera carga y con `completo=True` se
+    reconstruyen desde cero.
+    """
+    estado, _ = EstadoSincronizacion.objects.get_or_create(recurso='consultas')
+    hoy = timezone.localdate()
+    desde = None
+    params = None
+    if estado.marca_agua and not completo:
+        desde = min(estado.marca_agua, hoy) - timedelta(days=settings.ESPEJO_DIAS_SOLAPAMIENTO)
+        params = {'fecha_inicio': desde.isoformat()}
+
+    consultas = upstream.obtener_json(settings.API_CONSULTAS, params=params)
+
+    filas = []
+    marca = min(estado.marca_agua, hoy) if estado.marca_agua else None
+    lector = LectorConsultas()
+    for consulta in consultas:
+        if consulta.get('id') is None:
+            logger.warning("Consulta sin id, no se puede reflejar: %s", consulta)
+            continue
+        fila = consulta_a_espejo(consulta, lector.accesores(consulta))
+        # El backend puede ignorar fecha_inicio: lo anterior ya está reflejado
+        if desde and fila.fecha and fila.fecha < desde:
+            continue
+        if fila.fecha and (marca is None or fila.fecha > marca):
+            marca = min(fila.fecha, hoy)
+        filas.append(fila)
+
+    recalcular = completo or estado.marca_agua is None
+    with transaction.atomic():
+        # Serializa sincronizaciones concurrentes sobre los mismos conteos
+        EstadoSincronizacion.objects.select_for_update().get(pk=estado.pk)
+        ids_externos = [fila.id_externo for fila in filas]
+        if not recalcular:
+            cambios = conteos.Conteos().sumar(conteos.perfil(ids_externos), -1)
+        guardar_consultas(filas)
+        eliminadas = 0
+        if completo:
+            vigentes = {fila.id_externo for fila in filas}
+            obsoletas = [
+                id_externo for id_externo in ConsultaEspejo.objects.values_list('id_externo', flat=True)
+                if id_externo not in vigentes
+            ]
+            for i in range(0, len(obsoletas), TAMANO_LOTE):
+                eliminadas += ConsultaEspejo.objects.filter(
+                    id_externo__in=obsoletas[i:i + TAMANO_LOTE]
+                ).delete()[0]
+        if recalcular:
+            conteos.reconstruir()
+        else:
+            conteos.aplicar(cambios.sumar(conteos.perfil(ids_externos), 1))
+        estado.marca_agua = marca
+        estado.ultima_ejecucion = timezone.now()
+        estado.registros = len(filas)
+        estado.save()
+
+    return {'consultas': len(filas), 'eliminadas': eliminadas, 'marca_agua': marca}
+
+
+def sincronizar(completo=False):
+    """
+    Sincroniza catálogos y consultas.
+    """
+    resultado = sincronizar_catalogos()
+    resultado.update(sincronizar_consultas(completo=completo))
+    return resultado
+
+
+# --- Lectura ---------------------------------------------------------------
+
+def huella():
+    """
+    Identifica el contenido actual del espejo: cambia con cada sincronización.
+    """
+    estado = EstadoSincronizacion.objects.filter(recurso='consultas').first()
+    if estado is None or estado.ultima_ejecucion is None:
+        return 'vacio'
+    return f"espejo-{estado.ultima_ejecucion.isoformat()}"
+
+
+def catalogos():
+    """
+    Catálogos del espejo con la misma forma que la caché de catálogos.
+    """
+    return {
+        'atletas': dict(AtletaEspejo.objects.order_by('id').values_list('id_externo', 'datos')),
+        'profesionales': dict(ProfesionalEspejo.objects.order_by('id').values_list('id_externo', 'datos')),
+    }
+
+
+def _consultas_filtradas(filtros):
+    condicion = Q()
+    try:
+        fecha_inicio = datetime.strptime(filtros['fecha_inicio'], '%Y-%m-%d').date()
+        fecha_fin = datetime.strptime(filtros['fecha_fin'], '%Y-%m-%d').date()
+        condicion &= Q(fecha__range=(fecha_inicio, fecha_fin))
+    except ValueError as e:
+        logger.error("Error al parsear fechas: %s", str(e))
+        return ConsultaEspejo.objects.order_by('id').values_list('datos', flat=True)
+
+    if _filtro_activo(filtros, 'atleta_id'):
+        condicion &= Q(atleta_id_externo=str(filtros['atleta_id']))
+    if _filtro_activo(filtros, 'profesional_id'):
+        condicion &= Q(profesional_id_externo=str(filtros['profesional_id']))
+
+    return (
+        ConsultaEspejo.objects
+        .filter(condicion | Q(fecha__isnull=True))
+        .order_by('id')
+        .values_list('datos', flat=True)
+    )
+
+
+def consultas_filtradas(filtros):
+    """
+    Consultas del espejo que cumplen los filtros del reporte, resueltas en SQL.
+
+    Igual que `_filtrar_consultas`, las consultas sin fecha se conservan.
+    """
+    return list(_consultas_filtradas(filtros))
+
+
+def iterar_consultas_filtradas(filtros):
+    """
+    Como `consultas_filtradas`, pero leyendo del cursor por lotes sin
+    cargar todas las filas en memoria.
+    """
+    return _consultas_filtradas(filtros).iterator(chunk_size=TAMANO_LOTE)
+
+
+def acumulador():
+    """
+    Acumulador del dashboard leído de los conteos materializados.
+    """
+    return conteos.leer().acumulador()
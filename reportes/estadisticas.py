@@ -0,0 +1,235 @@
+"""
+Motor de agregación de estadísticas de consultas.
+
+Recorre las consultas una sola vez, parsea cada fecha una sola vez y acumula
+los contadores por mes, profesional, atleta y diagnóstico en diccionarios.
+Con `ESTADISTICAS_MOTOR = 'numpy'` los lotes se acumulan con el motor
+columnar de `estadisticas_columnar`, que produce el mismo acumulador.
+"""
+import logging
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+MESES_MOSTRAR = 12
+
+
+def clave_profesional(consulta):
+    """
+    Obtiene la clave del profesional tal como la compara el dashboard.
+    """
+    return str(consulta.get('profesional_salud', consulta.get('profesional_salud_id', '')))
+
+
+def clave_atleta(consulta):
+    """
+    Obtiene la clave del atleta tal como la compara el dashboard.
+    """
+    return str(consulta.get('atleta', consulta.get('atleta_id', '')))
+
+
+@lru_cache(maxsize=8192)
+def mes_de_fecha(fecha):
+    """
+    Devuelve (año, mes) de una fecha 'YYYY-MM-DD'; cada cadena se parsea una sola vez.
+    """
+    parsed = datetime.strptime(fecha, '%Y-%m-%d')
+    return (parsed.year, parsed.month)
+
+
+def meses_ventana(hoy, meses_mostrar=MESES_MOSTRAR):
+    """
+    Devuelve los pares (año, mes) de la ventana del dashboard, del más antiguo al actual.
+    """
+    mes_actual = hoy.month
+    año_actual = hoy.year
+    meses = []
+    for i in range(meses_mostrar):
+        mes_offset = meses_mostrar - i - 1
+        month = (mes_actual - mes_offset - 1) % 12 + 1
+        year = año_actual - (1 if mes_actual - mes_offset - 1 < 0 else 0)
+        meses.append((year, month))
+    return meses
+
+
+class AcumuladorConsultas:
+    """
+    Contadores de consultas alimentados en una sola pasada.
+
+    Los acumuladores se pueden combinar entre sí, lo que permite construirlos
+    por segmentos (por ejemplo, por mes) y unirlos después.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.por_mes = Counter()
+        self.por_mes_profesional = Counter()
+        self.por_atleta = Counter()
+        self.diagnosticos = {}
+
+    def agregar(self, consulta):
+        """
+        Agrega una consulta a todos los contadores.
+        """
+        mes = mes_de_fecha(consulta['fecha'])
+        self.por_mes[mes] += 1
+        self.por_mes_profesional[mes + (clave_profesional(consulta),)] += 1
+        self._contar(consulta, clave_atleta(consulta))
+
+    def _contar(self, consulta, atleta):
+        """
+        Cuenta el total, el atleta y el diagnóstico de la consulta.
+        """
+        self.total += 1
+        self.por_atleta[atleta] += 1
+        diagnostico = consulta.get('diagnostico', 'Sin diagnóstico').strip()
+        if diagnostico and diagnostico != 'Sin diagnóstico':
+            self.diagnosticos[diagnostico] = self.diagnosticos.get(diagnostico, 0) + 1
+
+    def agregar_todas(self, consultas):
+        for consulta in consultas:
+            self.agregar(consulta)
+        return self
+
+    def combinar(self, otro):
+        """
+        Suma los contadores de otro acumulador a este.
+        """
+        self.total += otro.total
+        self.por_mes.update(otro.por_mes)
+        self.por_mes_profesional.update(otro.por_mes_profesional)
+        self.por_atleta.update(otro.por_atleta)
+        for diagnostico, total in otro.diagnosticos.items():
+            self.diagnosticos[diagnostico] = self.diagnosticos.get(diagnostico, 0) + total
+        return self
+
+
+def acumular(consultas):
+    """
+    Acumula un lote de consultas con el motor configurado en `ESTADISTICAS_MOTOR`.
+    """
+    if settings.ESTADISTICAS_MOTOR == 'numpy':
+        # Importación diferida: el motor columnar depende de este módulo
+        from . import estadisticas_columnar
+        if estadisticas_columnar.disponible():
+            return estadisticas_columnar.acumular(consultas)
+        logger.warning("ESTADISTICAS_MOTOR='numpy' pero numpy no está instalado; se usa el motor en Python")
+    return AcumuladorConsultas().agregar_todas(consultas)
+
+
+def info_profesionales(profesionales, profesional_id=None):
+    """
+    Devuelve (profesional, id, nombre completo) de cada profesional, o solo del pedido.
+    """
+    profesionales_info = []
+    for profesional in profesionales:
+        clave = str(profesional['id'])
+        if profesional_id is not None and clave != profesional_id:
+            continue
+        profesionales_info.append((
+            profesional,
+            clave,
+            f"{profesional.get('nombre', '')} {profesional.get('apPaterno', '')}".strip(),
+        ))
+    return profesionales_info
+
+
+def datos_profesionales(profesionales_info, total):
+    """
+    Arma `profesionales_data`; `total(profesional_id)` da las consultas de cada uno.
+    """
+    return [
+        {
+            'nombre': nombre_completo,
+            'id': profesional_id,
+            'total': total(profesional_id),
+            'especialidad': profesional.get('especialidad', 'Sin especialidad')
+        }
+        for profesional, profesional_id, nombre_completo in profesionales_info
+    ]
+
+
+def top_atletas(por_atleta, atletas, n=10):
+    """
+    Los `n` atletas con más consultas; los empates quedan en el orden del catálogo.
+    """
+    atletas_data = []
+    for atleta in atletas:
+        atleta_id = str(atleta['id'])
+        total_consultas_atleta = por_atleta.get(atleta_id, 0)
+        if total_consultas_atleta > 0:
+            atletas_data.append({
+                'nombre': f"{atleta.get('nombre', '')} {atleta.get('apPaterno', '')}".strip(),
+                'id': atleta_id,
+                'total': total_consultas_atleta
+            })
+    return sorted(atletas_data, key=lambda x: x['total'], reverse=True)[:n]
+
+
+def top_diagnosticos(diagnosticos, n=5):
+    """
+    Los `n` diagnósticos más frecuentes.
+
+    Los empates se ordenan por nombre: el resultado no depende del orden en
+    que se acumularon las consultas (segmentos, espejo, motor numpy).
+    """
+    return sorted(
+        [{'nombre': k, 'total': v} for k, v in diagnosticos.items()],
+        key=lambda x: (-x['total'], x['nombre'])
+    )[:n]
+
+
+def construir_respuesta(acumulador, profesionales, atletas, hoy):
+    """
+    Arma el JSON del dashboard a partir de un acumulador ya lleno.
+    """
+    mes_actual = (hoy.year, hoy.month)
+    consultas_mes_actual = acumulador.por_mes.get(mes_actual, 0)
+    profesionales_info = info_profesionales(profesionales)
+
+    por_mes_profesional = acumulador.por_mes_profesional
+    monthly_data_by_profesional = []
+    for year, month in meses_ventana(hoy):
+        monthly_data_by_profesional.append({
+            'mes': datetime(year, month, 1).strftime('%b'),
+            'mes_numero': month,
+            'ano': year,
+            'profesionales': [
+                {
+                    'profesional_id': profesional['id'],
+                    'profesional_name': nombre_completo,
+                    'count': por_mes_profesional.get((year, month, profesional_id), 0)
+                }
+                for profesional, profesional_id, nombre_completo in profesionales_info
+            ],
+            'total': acumulador.por_mes.get((year, month), 0)
+        })
+
+    profesionales_data = datos_profesionales(
+        profesionales_info, lambda profesional_id: por_mes_profesional.get(mes_actual + (profesional_id,), 0)
+    )
+
+    return {
+        'total_consultas': acumulador.total,
+        'consultas_mes_actual': consultas_mes_actual,
+        'profesionales_data': profesionales_data,
+        'monthly_data_by_profesional': monthly_data_by_profesional,
+        'monthly_data': [{'mes': m['mes'], 'total': m['total']} for m in monthly_data_by_profesional],
+        'top_atletas': top_atletas(acumulador.por_atleta, atletas),
+        'top_diagnosticos': top_diagnosticos(acumulador.diagnosticos)
+    }
+
+
+def calcular_estadisticas(consultas, profesionales, atletas, hoy=None):
+    """
+    Calcula las estadísticas del dashboard recorriendo las consultas una sola vez.
+    """
+    if hoy is None:
+        hoy = datetime.now()
+    acumulador = acumular(consultas)
+    return construir_respuesta(acumulador, profesionales, atletas, hoy)
@@ -0,0 +1,124 @@
+"""
+Motor columnar (NumPy) para acumular las estadísticas de consultas.
+
+Convierte el lote en columnas: índice de mes y códigos enteros de
+profesional, atleta y diagnóstico. Los conteos salen de `np.bincount` sobre
+esos códigos (los de mes × profesional, de `np.unique` sobre
+`mes * n_profesionales + profesional`, que solo cuenta los pares presentes),
+y cada fecha distinta se parsea una sola vez. El resultado es el mismo `AcumuladorConsultas` del motor en Python,
+así que `construir_respuesta` y la caché por segmentos no cambian.
+
+NumPy es opcional: sin él `disponible()` es False y se usa el motor en Python.
+"""
+from .estadisticas import AcumuladorConsultas, clave_atleta, clave_profesional, mes_de_fecha
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depende del entorno
+    np = None
+
+DIAGNOSTICOS_EXCLUIDOS = ('', 'Sin diagnóstico')
+
+_FALTA = object()
+
+
+def disponible():
+    return np is not None
+
+
+def _codificar(valores, convertir):
+    """
+    Devuelve (categorías, códigos) de `convertir(valor)` para cada valor.
+
+    Cada valor distinto se convierte una sola vez; las categorías quedan en
+    orden de primera aparición. Los valores se distinguen también por tipo
+    para que 1 y True no compartan categoría antes de convertirse.
+    """
+    indice = {}
+    crudos = [indice.setdefault((valor.__class__, valor), len(indice)) for valor in valores]
+    categorias = {}
+    remapa = np.array(
+        [categorias.setdefault(convertir(valor), len(categorias)) for _, valor in indice],
+        dtype=np.intp
+    )
+    return list(categorias), remapa[np.array(crudos, dtype=np.intp)]
+
+
+def _reordenar(categorias, codigos):
+    """
+    Deja solo las categorías usadas en `codigos`, en orden de primera aparición.
+    """
+    usadas, primera = np.unique(codigos, return_index=True)
+    usadas = usadas[np.argsort(primera, kind='stable')]
+    rango = np.empty(len(categorias), dtype=np.intp)
+    rango[usadas] = np.arange(len(usadas))
+    return [categorias[i] for i in usadas.tolist()], rango[codigos]
+
+
+def _a_clave(valor):
+    return valor if valor is _FALTA else str(valor)
+
+
+def _codificar_clave(consultas, campo, clave):
+    """
+    Codifica `clave(consulta)` leyendo directamente `campo`; solo las filas
+    sin ese campo pasan por `clave` (que resuelve el alias alterno).
+    """
+    try:
+        categorias, codigos = _codificar((c.get(campo, _FALTA) for c in consultas), _a_clave)
+    except TypeError:
+        # Valores no hashables (objetos anidados): se convierte fila por fila
+        return _codificar(map(clave, consultas), str)
+    if _FALTA not in categorias:
+        return categorias, codigos
+    indice = {categoria: i for i, categoria in enumerate(categorias)}
+    filas = np.flatnonzero(codigos == indice[_FALTA])
+    codigos[filas] = [indice.setdefault(clave(consultas[fila]), len(indice)) for fila in filas.tolist()]
+    return _reordenar(list(indice), codigos)
+
+
+def _indice_mes(fecha):
+    anio, mes = mes_de_fecha(fecha)
+    return anio * 12 + mes - 1
+
+
+def acumular(consultas):
+    """
+    Acumula un lote de consultas con operaciones vectorizadas.
+    """
+    if not isinstance(consultas, list):
+        consultas = list(consultas)
+    acumulador = AcumuladorConsultas()
+    if not consultas:
+        return acumulador
+
+    # Cada fecha distinta se parsea una sola vez
+    indices_mes, codigos_fecha = _codificar((c['fecha'] for c in consultas), _indice_mes)
+    meses = np.array(indices_mes, dtype=np.int64)[codigos_fecha]
+    profesionales, codigos_profesional = _codificar_clave(consultas, 'profesional_salud', clave_profesional)
+    atletas, codigos_atleta = _codificar_clave(consultas, 'atleta', clave_atleta)
+    diagnosticos, codigos_diagnostico = _codificar(
+        (c.get('diagnostico', 'Sin diagnóstico') for c in consultas), str.strip
+    )
+
+    acumulador.total = len(consultas)
+
+    # Solo los pares (mes, profesional) presentes: una matriz densa iría del
+    # primer al último mes y una sola fecha atípica la haría enorme
+    n_profesionales = len(profesionales)
+    pares, totales = np.unique(meses * n_profesionales + codigos_profesional, return_counts=True)
+    meses_pares, columnas = np.divmod(pares, n_profesionales)
+    for indice_mes, columna, total in zip(meses_pares.tolist(), columnas.tolist(), totales.tolist()):
+        mes = (indice_mes // 12, indice_mes % 12 + 1)
+        acumulador.por_mes_profesional[mes + (profesionales[columna],)] = total
+        acumulador.por_mes[mes] += total
+
+    for atleta, total in zip(atletas, np.bincount(codigos_atleta, minlength=len(atletas)).tolist()):
+        acumulador.por_atleta[atleta] = total
+
+    for diagnostico, total in zip(
+        diagnosticos, np.bincount(codigos_diagnostico, minlength=len(diagnosticos)).tolist()
+    ):
+        if diagnostico not in DIAGNOSTICOS_EXCLUIDOS:
+            acumulador.diagnosticos[diagnostico] = total
+    return acumulador
@@ -0,0 +1,206 @@
+"""
+Exportación de las consultas enriquecidas a CSV y XLSX por bloques.
+
+Los generadores reciben las filas de forma perezosa (el mismo recorrido
+filtrar → enriquecer del reporte PDF) y entregan bytes a medida que avanzan,
+para usarse con un `StreamingHttpResponse`: el encabezado sale de inmediato
+y la memoria no crece con el número de filas.
+
+El XLSX se arma a mano sobre `zipfile` escribiendo a un flujo no posicionable
+(el zip usa descriptores de datos), así que tampoco necesita cargarse
+completo ni depende de librerías externas.
+"""
+import csv
+import io
+import zipfile
+from xml.sax.saxutils import escape
+
+COLUMNAS = [
+    ('id', 'ID'),
+    ('fecha', 'Fecha'),
+    ('atleta_id', 'ID atleta'),
+    ('atleta_nombre', 'Atleta'),
+    ('profesional_id', 'ID profesional'),
+    ('profesional_nombre', 'Profesional'),
+    ('diagnostico', 'Diagnóstico'),
+    ('tratamiento', 'Tratamiento'),
+]
+
+# Bytes acumulados antes de entregar un bloque
+TAMANO_BLOQUE = 64 * 1024
+
+
+def _valores(consulta):
+    return ['' if consulta.get(campo) is None else consulta.get(campo) for campo, _ in COLUMNAS]
+
+
+def bloques_csv(consultas):
+    """
+    Genera el CSV (UTF-8 con BOM, para que Excel respete los acentos) por bloques.
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write('\ufeff')
+    escritor.writerow([titulo for _, titulo in COLUMNAS])
+    yield buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+
+    for consulta in consultas:
+        escritor.writerow(_valores(consulta))
+        if buffer.tell() >= TAMANO_BLOQUE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _Tubo(io.RawIOBase):
+    """
+    Destino no posicionable del zip: acumula lo escrito hasta que se retira.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._partes = []
+        self._posicion = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        # zipfile lo consulta para los desplazamientos del directorio central
+        return self._posicion
+
+    def retirar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+_TIPOS_CONTENIDO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_RELACIONES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_LIBRO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Consultas" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_RELACIONES_LIBRO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Estilo 0: normal; estilo 1: encabezado en negritas
+_ESTILOS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '</styleSheet>'
+)
+
+_INICIO_HOJA = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetData>'
+)
+
+_FIN_HOJA = '</sheetData></worksheet>'
+
+
+def _celda(valor, estilo=0):
+    atributo_estilo = f' s="{estilo}"' if estilo else ''
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return f'<c{atributo_estilo}><v>{valor}</v></c>'
+    # Fuera los caracteres de control que XML no admite
+    texto = ''.join(c for c in str(valor) if c >= ' ' or c in '\t\n\r')
+    return f'<c t="inlineStr"{atributo_estilo}><is><t xml:space="preserve">{escape(texto)}</t></is></c>'
+
+
+def _fila(valores, estilo=0):
+    return '<row>' + ''.join(_celda(valor, estilo) for valor in valores) + '</row>'
+
+
+def bloques_xlsx(consultas):
+    """
+    Genera un libro XLSX de una hoja ("Consultas") por bloques.
+    """
+    tubo = _Tubo()
+    with zipfile.ZipFile(tubo, 'w', compression=zipfile.ZIP_DEFLATED) as libro:
+        libro.writestr('[Content_Types].xml', _TIPOS_CONTENIDO)
+        libro.writestr('_rels/.rels', _RELACIONES)
+        libro.writestr('xl/workbook.xml', _LIBRO)
+        libro.writestr('xl/_rels/workbook.xml.rels', _RELACIONES_LIBRO)
+        libro.writestr('xl/styles.xml', _ESTILOS)
+
+        with libro.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja:
+            hoja.write((_INICIO_HOJA + _fila([titulo for _, titulo in COLUMNAS], estilo=1)).encode('utf-8'))
+            yield tubo.retirar()
+
+            pendiente = []
+            tamano = 0
+            for consulta in consultas:
+                fila = _fila(_valores(consulta)).encode('utf-8')
+                pendiente.append(fila)
+                tamano += len(fila)
+                if tamano >= TAMANO_BLOQUE:
+                    hoja.write(b''.join(pendiente))
+                    pendiente = []
+                    tamano = 0
+                    datos = tubo.retirar()
+                    if datos:
+                        yield datos
+            pendiente.append(_FIN_HOJA.encode('utf-8'))
+            hoja.write(b''.join(pendiente))
+
+    yield tubo.retirar()
+
+
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', bloques_csv),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', bloques_xlsx),
+}
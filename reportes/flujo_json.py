@@ -0,0 +1,98 @@
+"""
+Lectura incremental de un arreglo JSON que llega por fragmentos.
+
+`iterar_arreglo` entrega los elementos del arreglo de nivel superior a medida
+que se completan en el flujo, decodificando cada uno con
+`JSONDecoder.raw_decode` sobre un búfer que solo guarda el elemento en curso.
+Así el cuerpo completo nunca se materializa como lista.
+"""
+import codecs
+import json
+
+_decodificador = json.JSONDecoder()
+_ESPACIOS = ' \t\n\r'
+
+
+def _saltar_espacios(texto, posicion):
+    while posicion < len(texto) and texto[posicion] in _ESPACIOS:
+        posicion += 1
+    return posicion
+
+
+def iterar_arreglo(fragmentos):
+    """
+    Recorre un arreglo JSON recibido como fragmentos de bytes (UTF-8).
+
+    Si el cuerpo no es un arreglo se parsea completo al final y se entregan
+    sus elementos si resulta ser una lista; en otro caso lanza ValueError.
+    """
+    decodificador_utf8 = codecs.getincrementaldecoder('utf-8')()
+    fragmentos = iter(fragmentos)
+    buffer = ''
+    posicion = 0
+    terminado = False
+
+    def leer():
+        nonlocal buffer, posicion, terminado
+        fragmento = next(fragmentos, None)
+        if fragmento is None:
+            terminado = True
+            buffer = buffer[posicion:] + decodificador_utf8.decode(b'', final=True)
+        else:
+            buffer = buffer[posicion:] + decodificador_utf8.decode(fragmento)
+        posicion = 0
+
+    # Apertura del arreglo
+    while True:
+        posicion = _saltar_espacios(buffer, posicion)
+        if posicion < len(buffer) or terminado:
+            break
+        leer()
+    if buffer.startswith('\ufeff', posicion):
+        posicion += 1
+    if not buffer.startswith('[', posicion):
+        while not terminado:
+            leer()
+        datos = json.loads(buffer[posicion:])
+        if not isinstance(datos, list):
+            raise ValueError("El cuerpo JSON no es un arreglo")
+        yield from datos
+        return
+    posicion += 1
+
+    # 'inicio': elemento o ']'; 'elemento': tras una coma; 'separador': ',' o ']'
+    estado = 'inicio'
+    while True:
+        posicion = _saltar_espacios(buffer, posicion)
+        if posicion >= len(buffer):
+            if terminado:
+                raise json.JSONDecodeError("Arreglo JSON incompleto", buffer, posicion)
+            leer()
+            continue
+
+        caracter = buffer[posicion]
+        if estado == 'separador':
+            if caracter == ']':
+                return
+            if caracter != ',':
+                raise json.JSONDecodeError("Se esperaba ',' o ']'", buffer, posicion)
+            posicion += 1
+            estado = 'elemento'
+            continue
+        if estado == 'inicio' and caracter == ']':
+            return
+
+        try:
+            elemento, fin = _decodificador.raw_decode(buffer, posicion)
+        except json.JSONDecodeError:
+            if terminado:
+                raise
+            leer()
+            continue
+        # Un escalar al final del búfer podría seguir en el próximo fragmento
+        if fin == len(buffer) and not terminado:
+            leer()
+            continue
+        posicion = fin
+        estado = 'separador'
+        yield elemento
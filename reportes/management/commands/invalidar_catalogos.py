@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from reportes.catalogos import invalidar_catalogos, refrescar_catalogos
+
+# Backends cuyo contenido vive en la memoria de cada proceso
+CACHES_LOCALES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Descarta los catálogos de atletas y profesionales guardados en caché. "
+        "Requiere una caché compartida con los workers (CACHE_BACKEND 'file' o 'db'): "
+        "con 'locmem' el comando solo vería la caché de su propio proceso."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--refrescar',
+            action='store_true',
+            help='Descarga los catálogos de inmediato en lugar de esperar a la siguiente petición.'
+        )
+
+    def handle(self, *args, **options):
+        backend = settings.CACHES['default']['BACKEND']
+        if backend in CACHES_LOCALES:
+            raise CommandError(
+                f"La caché configurada ({backend}) es local a cada proceso: invalidarla desde este "
+                "comando no afecta a los workers. Configure CACHE_BACKEND='file' o 'db'."
+            )
+        invalidar_catalogos()
+        self.stdout.write("Catálogos invalidados")
+        if options['refrescar']:
+            catalogos = refrescar_catalogos()
+            self.stdout.write(self.style.SUCCESS(
+                f"Catálogos refrescados: {len(catalogos['atletas'])} atletas, "
+                f"{len(catalogos['profesionales'])} profesionales"
+            ))
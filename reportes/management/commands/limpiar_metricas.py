@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from reportes import metricas
+
+
+class Command(BaseCommand):
+    help = (
+        "Elimina los volcados de métricas de METRICAS_DIR. Se corre al arrancar el "
+        "servidor, antes de levantar los workers de gunicorn."
+    )
+
+    def handle(self, *args, **options):
+        eliminados = metricas.limpiar()
+        self.stdout.write(f"Volcados de métricas eliminados: {eliminados}")
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from reportes import trabajos
+from reportes.views import GeneradorReporteConsultas
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker que genera los reportes PDF encolados con modo='trabajo'. "
+        "Se pueden levantar varios en paralelo."
+    )
+
+    LIMPIEZA_CADA = 3600  # segundos
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Procesa los trabajos pendientes y termina.'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=2.0,
+            help='Segundos de espera cuando la cola está vacía (por defecto 2).'
+        )
+
+    def handle(self, *args, **options):
+        generar = GeneradorReporteConsultas().generar
+        ultima_limpieza = None
+        procesados = 0
+        try:
+            while True:
+                close_old_connections()
+                trabajo = trabajos.procesar_siguiente(generar)
+                if trabajo is not None:
+                    procesados += 1
+                    self.stdout.write(f"Reporte {trabajo.pk}: {trabajo.estado}")
+                    continue
+
+                if ultima_limpieza is None or time.monotonic() - ultima_limpieza > self.LIMPIEZA_CADA:
+                    eliminados = trabajos.limpiar()
+                    if eliminados:
+                        self.stdout.write(f"Trabajos vencidos eliminados: {eliminados}")
+                    ultima_limpieza = time.monotonic()
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"Reportes procesados: {procesados}"))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reportes.conteos import reconstruir, verificar
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula desde el espejo local los conteos materializados del dashboard "
+        "de estadísticas (por mes y profesional, por atleta y por diagnóstico)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Solo compara los conteos guardados con un cálculo desde cero, sin modificarlos.'
+        )
+
+    def handle(self, *args, **options):
+        if options['verificar']:
+            diferencias = verificar()
+            if diferencias:
+                raise CommandError(
+                    "Los conteos materializados no coinciden con el espejo: " + ", ".join(diferencias)
+                )
+            self.stdout.write(self.style.SUCCESS("Los conteos materializados coinciden con el espejo"))
+            return
+
+        conteos = reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f"Conteos reconstruidos: {len(conteos.por_mes_profesional)} por mes y profesional, "
+            f"{len(conteos.por_atleta)} por atleta, {len(conteos.diagnosticos)} por diagnóstico"
+        ))
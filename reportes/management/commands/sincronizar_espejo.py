@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+import requests
+
+from reportes.espejo import sincronizar
+
+
+class Command(BaseCommand):
+    help = (
+        "Sincroniza el espejo local de consultas, atletas y profesionales con el "
+        "backend principal, trayendo solo lo nuevo desde la última marca de agua."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help='Trae toda la historia y elimina del espejo las consultas que ya no existen.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            resultado = sincronizar(completo=options['completo'])
+        except requests.exceptions.RequestException as e:
+            raise CommandError(f"No se pudo conectar con el backend principal: {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Espejo sincronizado: {resultado['consultas']} consultas, "
+            f"{resultado['eliminadas']} eliminadas, {resultado['atletas']} atletas, "
+            f"{resultado['profesionales']} profesionales (marca de agua: {resultado['marca_agua']})"
+        ))
@@ -0,0 +1,410 @@
+"""
+Métricas de las vistas: tiempos por etapa, llamadas al backend y tamaños.
+
+- `etapa(nombre)` mide un bloque de código (filtrar, enriquecer, armar el
+  PDF...) y `registrar_upstream` cada petición al backend principal. Ambos
+  alimentan histogramas del proceso y, si hay una petición en curso, la lista
+  de tiempos con la que `MetricasMiddleware` arma el encabezado
+  `Server-Timing`.
+- Los contadores que ya llevan `upstream` (conexiones reutilizadas,
+  revalidación con 304) y `cache_pdf` (aciertos, fallos, desalojos) se
+  exponen como counters de Prometheus.
+- Cada proceso vuelca sus histogramas, a lo sumo cada `METRICAS_INTERVALO`
+  segundos, a `METRICAS_DIR/<pid>-<inicio>.json`. `exportar()` suma los
+  archivos de todos los workers (más el estado vigente del proceso que
+  atiende) en el formato de texto de Prometheus que sirve `/Consultas/metricas/`.
+
+Los archivos de workers que ya terminaron se conservan para que los
+contadores no retrocedan; el instante de inicio en el nombre evita que un
+worker nuevo que recibe el pid de uno muerto pise sus totales. `limpiar()`
+(comando `limpiar_metricas`, que el Dockerfile corre antes de levantar
+gunicorn) vacía la carpeta al arrancar el servidor. Lo observado por un
+worker después de su último volcado se pierde al terminar.
+
+El tiempo de una respuesta en streaming (exportaciones, PDF bajo ASGI) llega
+hasta que se entregan los encabezados, no hasta el último bloque.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2, 100 * 1024 ** 2)
+FILAS = (10, 100, 1000, 10000, 100000, 1000000)
+
+# nombre -> (ayuda, etiquetas, límites de las cubetas)
+HISTOGRAMAS = {
+    'reportes_peticion_segundos': (
+        'Duración de las peticiones por vista, método y estado HTTP', ('vista', 'metodo', 'estado'), SEGUNDOS
+    ),
+    'reportes_respuesta_bytes': ('Bytes enviados en el cuerpo de las respuestas sin streaming', ('vista',), BYTES),
+    'reportes_etapa_segundos': ('Duración de cada etapa de las vistas', ('etapa',), SEGUNDOS),
+    'reportes_etapa_filas': ('Filas que procesa cada etapa', ('etapa',), FILAS),
+    'reportes_upstream_segundos': (
+        'Duración de las peticiones al backend principal por ruta y estado HTTP', ('ruta', 'estado'), SEGUNDOS
+    ),
+    'reportes_upstream_bytes': ('Tamaño de los cuerpos recibidos del backend principal', ('ruta',), BYTES),
+}
+
+# nombre -> (ayuda, etiqueta); los valores salen de `_contadores_vivos()`
+CONTADORES = {
+    'reportes_upstream_conexiones_total': (
+        'Peticiones al backend principal según abran una conexión nueva o reutilicen una', 'conexion'
+    ),
+    'reportes_upstream_revalidacion_total': (
+        'Lecturas versionadas del backend según su revalidación condicional (revalidadas_304 = acierto)',
+        'resultado'
+    ),
+    'reportes_cache_pdf_total': ('Eventos de la caché en disco de reportes PDF', 'evento'),
+}
+
+_lock = threading.Lock()
+# nombre -> {etiquetas: [conteo por cubeta..., conteo sobre el último límite, suma]}
+_series = {nombre: {} for nombre in HISTOGRAMAS}
+_ultimo_volcado = 0.0
+# (pid, instante de inicio) del proceso que escribe; se renueva tras un fork
+_proceso = None
+# Tiempos de la petición en curso: [(nombre, segundos, descripción)]
+_tiempos = contextvars.ContextVar('reportes_metricas_tiempos', default=None)
+
+
+def activas():
+    return settings.METRICAS
+
+
+def observar(nombre, valor, *etiquetas):
+    """
+    Agrega `valor` al histograma `nombre` con los valores de etiqueta dados.
+    """
+    if not activas():
+        return
+    limites = HISTOGRAMAS[nombre][2]
+    indice = bisect_left(limites, valor)
+    with _lock:
+        serie = _series[nombre].get(etiquetas)
+        if serie is None:
+            serie = _series[nombre][etiquetas] = [0] * (len(limites) + 2)
+        serie[indice] += 1
+        serie[-1] += valor
+
+
+def _anotar(nombre, segundos, descripcion=None):
+    tiempos = _tiempos.get()
+    if tiempos is not None:
+        tiempos.append((nombre, segundos, descripcion))
+
+
+def registrar_etapa(nombre, segundos, filas=None):
+    observar('reportes_etapa_segundos', segundos, nombre)
+    if filas is not None:
+        observar('reportes_etapa_filas', filas, nombre)
+    _anotar(nombre, segundos)
+    volcar_si_corresponde()
+
+
+class _Etapa:
+    __slots__ = ('nombre', 'filas', '_inicio')
+
+    def __init__(self, nombre, filas=None):
+        self.nombre = nombre
+        self.filas = filas
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        registrar_etapa(self.nombre, time.perf_counter() - self._inicio, self.filas)
+
+
+def etapa(nombre, filas=None):
+    """
+    Mide el bloque `with` como la etapa `nombre`; `filas` se puede fijar dentro.
+    """
+    return _Etapa(nombre, filas)
+
+
+class IteradorMedido:
+    """
+    Recorre `iterable` acumulando en `segundos` solo el tiempo pasado dentro
+    de él; al agotarse (o con `cerrar()`) registra la etapa `nombre` con los
+    elementos entregados como filas.
+
+    Permite separar etapas encadenadas en una sola pasada (filtrar dentro de
+    filtrar → enriquecer) sin materializar listas intermedias.
+    """
+
+    def __init__(self, iterable, nombre):
+        self._iterador = iter(iterable)
+        self.nombre = nombre
+        self.segundos = 0.0
+        self.filas = 0
+        self._registrada = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        inicio = time.perf_counter()
+        try:
+            elemento = next(self._iterador)
+        except StopIteration:
+            self.segundos += time.perf_counter() - inicio
+            self.cerrar()
+            raise
+        self.segundos += time.perf_counter() - inicio
+        self.filas += 1
+        return elemento
+
+    def cerrar(self):
+        if not self._registrada:
+            self._registrada = True
+            registrar_etapa(self.nombre, self.segundos, self.filas)
+
+
+def registrar_upstream(url, estado, segundos, tamano=None):
+    """
+    Registra una petición al backend principal (`estado` es el código HTTP o 'error').
+    """
+    ruta = urlsplit(url).path
+    observar('reportes_upstream_segundos', segundos, ruta, str(estado))
+    if tamano is not None:
+        observar('reportes_upstream_bytes', tamano, ruta)
+    _anotar('upstream', segundos, ruta)
+
+
+def server_timing(tiempos, total):
+    """
+    Valor del encabezado Server-Timing para los tiempos de una petición (en ms).
+    """
+    partes = []
+    for nombre, segundos, descripcion in tiempos:
+        if descripcion:
+            partes.append('%s;desc="%s";dur=%.1f' % (nombre, descripcion.replace('"', "'"), segundos * 1000))
+        else:
+            partes.append('%s;dur=%.1f' % (nombre, segundos * 1000))
+    partes.append('total;dur=%.1f' % (total * 1000))
+    return ', '.join(partes)
+
+
+def _contadores_vivos():
+    # Importación diferida: upstream importa este módulo
+    from . import cache_pdf, upstream
+    conexiones = upstream.estadisticas_conexiones()
+    revalidacion = upstream.estadisticas_revalidacion()
+    pdf = cache_pdf.estadisticas()
+    return {
+        'reportes_upstream_conexiones_total': {
+            ('nueva',): conexiones['conexiones_nuevas'],
+            ('reutilizada',): conexiones['conexiones_reutilizadas'],
+        },
+        'reportes_upstream_revalidacion_total': {
+            (resultado,): revalidacion[resultado] for resultado in ('sin_validadores', 'revalidadas_304', 'modificadas')
+        },
+        'reportes_cache_pdf_total': {
+            (evento,): pdf[evento] for evento in ('aciertos', 'fallos', 'guardados', 'desalojados')
+        },
+    }
+
+
+def _copia():
+    with _lock:
+        copia = {nombre: {etiquetas: list(serie) for etiquetas, serie in series.items()}
+                 for nombre, series in _series.items()}
+    for nombre, valores in _contadores_vivos().items():
+        copia[nombre] = {etiquetas: [valor] for etiquetas, valor in valores.items()}
+    return copia
+
+
+def _archivo():
+    global _proceso
+    pid = os.getpid()
+    if _proceso is None or _proceso[0] != pid:
+        _proceso = (pid, time.time_ns())
+    return Path(settings.METRICAS_DIR) / ('%d-%d.json' % _proceso)
+
+
+def volcar():
+    """
+    Escribe los histogramas del proceso en su archivo de `METRICAS_DIR`.
+    """
+    global _ultimo_volcado
+    _ultimo_volcado = time.monotonic()
+    if not settings.METRICAS_DIR:
+        return
+    contenido = {nombre: [[list(etiquetas), serie] for etiquetas, serie in series.items()]
+                 for nombre, series in _copia().items()}
+    destino = _archivo()
+    try:
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        temporal = destino.with_name(f'{destino.stem}.{threading.get_ident()}.tmp')
+        temporal.write_text(json.dumps(contenido))
+        # Reemplazo atómico: quien exporta nunca lee un archivo a medias
+        os.replace(temporal, destino)
+    except OSError as e:
+        logger.warning("No se pudieron volcar las métricas en %s: %s", destino, str(e))
+
+
+def limpiar():
+    """
+    Elimina los volcados de `METRICAS_DIR`; se llama al arrancar el servidor,
+    antes de que haya workers. Devuelve cuántos archivos se eliminaron.
+    """
+    if not settings.METRICAS_DIR:
+        return 0
+    directorio = Path(settings.METRICAS_DIR)
+    eliminados = 0
+    for patron in ('*.json', '*.tmp'):
+        for archivo in directorio.glob(patron) if directorio.is_dir() else ():
+            try:
+                archivo.unlink()
+                eliminados += 1
+            except FileNotFoundError:
+                pass
+    return eliminados
+
+
+def volcar_si_corresponde():
+    if time.monotonic() - _ultimo_volcado >= settings.METRICAS_INTERVALO:
+        volcar()
+
+
+def _largo(nombre):
+    return len(HISTOGRAMAS[nombre][2]) + 2 if nombre in HISTOGRAMAS else 1
+
+
+def _sumar(total, nombre, etiquetas, serie):
+    if len(serie) != _largo(nombre):
+        # Volcado con otras cubetas (versión anterior del código)
+        return
+    actual = total[nombre].get(etiquetas)
+    total[nombre][etiquetas] = list(serie) if actual is None else [a + b for a, b in zip(actual, serie)]
+
+
+def combinar():
+    """
+    Histogramas sumados de todos los workers: los archivos de los demás
+    procesos y el estado vigente de este.
+    """
+    total = _copia()
+    if not settings.METRICAS_DIR:
+        return total
+    propio = _archivo().name
+    directorio = Path(settings.METRICAS_DIR)
+    for archivo in directorio.glob('*.json') if directorio.is_dir() else ():
+        if archivo.name == propio:
+            continue
+        try:
+            contenido = json.loads(archivo.read_text())
+        except (OSError, ValueError):
+            continue
+        for nombre, series in contenido.items():
+            if nombre in total:
+                for etiquetas, serie in series:
+                    _sumar(total, nombre, tuple(etiquetas), serie)
+    return total
+
+
+def _etiquetas(nombres, valores, extra=None):
+    pares = [(n, v) for n, v in zip(nombres, valores)]
+    if extra is not None:
+        pares.append(extra)
+    texto = ','.join('%s="%s"' % (n, str(v).replace('\\', '\\\\').replace('"', '\\"')) for n, v in pares)
+    return '{%s}' % texto if texto else ''
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exportar():
+    """
+    Texto en el formato de exposición de Prometheus con los histogramas de todos los workers.
+    """
+    lineas = []
+    for nombre, series in combinar().items():
+        if nombre in CONTADORES:
+            ayuda, etiqueta = CONTADORES[nombre]
+            lineas.append(f'# HELP {nombre} {ayuda}')
+            lineas.append(f'# TYPE {nombre} counter')
+            for etiquetas, serie in sorted(series.items()):
+                lineas.append(f'{nombre}{_etiquetas((etiqueta,), etiquetas)} {_numero(serie[0])}')
+            continue
+        ayuda, nombres, limites = HISTOGRAMAS[nombre]
+        lineas.append(f'# HELP {nombre} {ayuda}')
+        lineas.append(f'# TYPE {nombre} histogram')
+        for etiquetas, serie in sorted(series.items()):
+            acumulado = 0
+            for limite, conteo in zip(limites, serie):
+                acumulado += conteo
+                lineas.append(f'{nombre}_bucket{_etiquetas(nombres, etiquetas, ("le", _numero(limite)))} {acumulado}')
+            acumulado += serie[len(limites)]
+            lineas.append(f'{nombre}_bucket{_etiquetas(nombres, etiquetas, ("le", "+Inf"))} {acumulado}')
+            lineas.append(f'{nombre}_sum{_etiquetas(nombres, etiquetas)} {_numero(serie[-1])}')
+            lineas.append(f'{nombre}_count{_etiquetas(nombres, etiquetas)} {acumulado}')
+    return '\n'.join(lineas) + '\n'
+
+
+def _vista(request):
+    coincidencia = getattr(request, 'resolver_match', None)
+    return (coincidencia.url_name or coincidencia.view_name) if coincidencia is not None else 'sin_ruta'
+
+
+class MetricasMiddleware:
+    """
+    Mide cada petición, agrega `Server-Timing` con sus etapas y registra los histogramas.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not activas():
+            return self.get_response(request)
+        tiempos = []
+        inicio, token = time.perf_counter(), _tiempos.set(tiempos)
+        try:
+            response = self.get_response(request)
+        finally:
+            _tiempos.reset(token)
+        return self._terminar(request, response, tiempos, time.perf_counter() - inicio)
+
+    async def __acall__(self, request):
+        if not activas():
+            return await self.get_response(request)
+        tiempos = []
+        inicio, token = time.perf_counter(), _tiempos.set(tiempos)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _tiempos.reset(token)
+        return self._terminar(request, response, tiempos, time.perf_counter() - inicio)
+
+    def _terminar(self, request, response, tiempos, total):
+        vista = _vista(request)
+        observar('reportes_peticion_segundos', total, vista, request.method, str(response.status_code))
+        if not response.streaming:
+            observar('reportes_respuesta_bytes', len(response.content), vista)
+        response['Server-Timing'] = server_timing(tiempos, total)
+        volcar_si_corresponde()
+        return response
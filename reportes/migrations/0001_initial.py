@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AtletaEspejo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_externo', models.CharField(max_length=64, unique=True)),
+                ('nombre', models.CharField(blank=True, max_length=150)),
+                ('ap_paterno', models.CharField(blank=True, max_length=150)),
+                ('ap_materno', models.CharField(blank=True, max_length=150)),
+                ('datos', models.JSONField()),
+                ('sincronizado_el', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'atleta (espejo)',
+                'verbose_name_plural': 'atletas (espejo)',
+            },
+        ),
+        migrations.CreateModel(
+            name='EstadoSincronizacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recurso', models.CharField(max_length=50, unique=True)),
+                ('marca_agua', models.DateField(null=True)),
+                ('ultima_ejecucion', models.DateTimeField(null=True)),
+                ('registros', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'estado de sincronización',
+                'verbose_name_plural': 'estados de sincronización',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProfesionalEspejo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_externo', models.CharField(max_length=64, unique=True)),
+                ('nombre', models.CharField(blank=True, max_length=150)),
+                ('ap_paterno', models.CharField(blank=True, max_length=150)),
+                ('ap_materno', models.CharField(blank=True, max_length=150)),
+                ('especialidad', models.CharField(blank=True, max_length=150)),
+                ('datos', models.JSONField()),
+                ('sincronizado_el', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'profesional (espejo)',
+                'verbose_name_plural': 'profesionales (espejo)',
+            },
+        ),
+        migrations.CreateModel(
+            name='ConsultaEspejo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_externo', models.CharField(max_length=64, unique=True)),
+                ('fecha', models.DateField(null=True)),
+                ('atleta_id_externo', models.CharField(max_length=64, null=True)),
+                ('profesional_id_externo', models.CharField(max_length=64, null=True)),
+                ('diagnostico', models.TextField(blank=True)),
+                ('datos', models.JSONField()),
+                ('sincronizado_el', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'consulta (espejo)',
+                'verbose_name_plural': 'consultas (espejo)',
+                'indexes': [models.Index(fields=['fecha'], name='consulta_espejo_fecha_idx'), models.Index(fields=['atleta_id_externo', 'fecha'], name='consulta_espejo_atleta_idx'), models.Index(fields=['profesional_id_externo', 'fecha'], name='consulta_espejo_prof_idx')],
+            },
+        ),
+    ]
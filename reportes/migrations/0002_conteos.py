@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConteoAtleta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('atleta_id_externo', models.CharField(blank=True, max_length=64, unique=True)),
+                ('total', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'conteo por atleta',
+                'verbose_name_plural': 'conteos por atleta',
+            },
+        ),
+        migrations.CreateModel(
+            name='ConteoDiagnostico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('diagnostico', models.TextField(unique=True)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('primera_consulta', models.BigIntegerField()),
+            ],
+            options={
+                'verbose_name': 'conteo por diagnóstico',
+                'verbose_name_plural': 'conteos por diagnóstico',
+            },
+        ),
+        migrations.CreateModel(
+            name='ConteoMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio', models.PositiveSmallIntegerField()),
+                ('mes', models.PositiveSmallIntegerField()),
+                ('profesional_id_externo', models.CharField(blank=True, max_length=64)),
+                ('total', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'conteo mensual',
+                'verbose_name_plural': 'conteos mensuales',
+                'constraints': [models.UniqueConstraint(fields=('anio', 'mes', 'profesional_id_externo'), name='conteo_mensual_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:01
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0002_conteos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoReporte',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filtros', models.JSONField()),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('terminado', 'Terminado'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('progreso', models.PositiveSmallIntegerField(default=0)),
+                ('mensaje', models.TextField(blank=True)),
+                ('archivo', models.CharField(blank=True, max_length=500)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('creado_el', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_el', models.DateTimeField(null=True)),
+                ('terminado_el', models.DateTimeField(null=True)),
+            ],
+            options={
+                'verbose_name': 'trabajo de reporte',
+                'verbose_name_plural': 'trabajos de reporte',
+                'indexes': [models.Index(fields=['estado', 'creado_el'], name='trabajo_reporte_cola_idx')],
+            },
+        ),
+    ]
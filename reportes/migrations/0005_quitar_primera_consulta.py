@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:13
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0004_trabajo_disponible_desde'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='conteodiagnostico',
+            name='primera_consulta',
+        ),
+    ]
@@ -1,3 +1,187 @@
+import uuid
+
 from django.db import models
 
-# Create your models here.
+
+class AtletaEspejo(models.Model):
+    """
+    Copia local de un atleta del catálogo del backend principal.
+    """
+    id_externo = models.CharField(max_length=64, unique=True)
+    nombre = models.CharField(max_length=150, blank=True)
+    ap_paterno = models.CharField(max_length=150, blank=True)
+    ap_materno = models.CharField(max_length=150, blank=True)
+    datos = models.JSONField()
+    sincronizado_el = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'atleta (espejo)'
+        verbose_name_plural = 'atletas (espejo)'
+
+    def __str__(self):
+        return f"{self.nombre} {self.ap_paterno}".strip()
+
+
+class ProfesionalEspejo(models.Model):
+    """
+    Copia local de un profesional de la salud del catálogo del backend principal.
+    """
+    id_externo = models.CharField(max_length=64, unique=True)
+    nombre = models.CharField(max_length=150, blank=True)
+    ap_paterno = models.CharField(max_length=150, blank=True)
+    ap_materno = models.CharField(max_length=150, blank=True)
+    especialidad = models.CharField(max_length=150, blank=True)
+    datos = models.JSONField()
+    sincronizado_el = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'profesional (espejo)'
+        verbose_name_plural = 'profesionales (espejo)'
+
+    def __str__(self):
+        return f"{self.nombre} {self.ap_paterno}".strip()
+
+
+class ConsultaEspejo(models.Model):
+    """
+    Copia local de una consulta del backend principal.
+
+    `datos` guarda el registro tal como lo entrega el backend, para que el
+    reporte PDF lo procese igual que si viniera de la API; las demás columnas
+    son las que se filtran y agregan en SQL.
+    """
+    id_externo = models.CharField(max_length=64, unique=True)
+    fecha = models.DateField(null=True)
+    atleta_id_externo = models.CharField(max_length=64, null=True)
+    profesional_id_externo = models.CharField(max_length=64, null=True)
+    diagnostico = models.TextField(blank=True)
+    datos = models.JSONField()
+    sincronizado_el = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'consulta (espejo)'
+        verbose_name_plural = 'consultas (espejo)'
+        indexes = [
+            models.Index(fields=['fecha'], name='consulta_espejo_fecha_idx'),
+            models.Index(fields=['atleta_id_externo', 'fecha'], name='consulta_espejo_atleta_idx'),
+            models.Index(fields=['profesional_id_externo', 'fecha'], name='consulta_espejo_prof_idx'),
+        ]
+
+    def __str__(self):
+        return f"Consulta {self.id_externo} ({self.fecha})"
+
+
+class EstadoSincronizacion(models.Model):
+    """
+    Marca de agua de la última sincronización de cada recurso del espejo.
+    """
+    recurso = models.CharField(max_length=50, unique=True)
+    marca_agua = models.DateField(null=True)
+    ultima_ejecucion = models.DateTimeField(null=True)
+    registros = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'estado de sincronización'
+        verbose_name_plural = 'estados de sincronización'
+
+    def __str__(self):
+        return f"{self.recurso}: {self.marca_agua}"
+
+
+class ConteoMensual(models.Model):
+    """
+    Consultas del espejo por mes y profesional, mantenidas al sincronizar.
+    """
+    anio = models.PositiveSmallIntegerField()
+    mes = models.PositiveSmallIntegerField()
+    profesional_id_externo = models.CharField(max_length=64, blank=True)
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'conteo mensual'
+        verbose_name_plural = 'conteos mensuales'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['anio', 'mes', 'profesional_id_externo'], name='conteo_mensual_unico'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.anio}-{self.mes:02d} {self.profesional_id_externo}: {self.total}"
+
+
+class ConteoAtleta(models.Model):
+    """
+    Consultas del espejo por atleta (incluye las que no tienen fecha).
+    """
+    atleta_id_externo = models.CharField(max_length=64, blank=True, unique=True)
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'conteo por atleta'
+        verbose_name_plural = 'conteos por atleta'
+
+    def __str__(self):
+        return f"{self.atleta_id_externo}: {self.total}"
+
+
+class ConteoDiagnostico(models.Model):
+    """
+    Consultas del espejo por diagnóstico.
+    """
+    diagnostico = models.TextField(unique=True)
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'conteo por diagnóstico'
+        verbose_name_plural = 'conteos por diagnóstico'
+
+    def __str__(self):
+        return f"{self.diagnostico}: {self.total}"
+
+
+class TrabajoReporte(models.Model):
+    """
+    Reporte PDF encolado para generarse fuera de la petición HTTP.
+
+    La tabla es la cola: `python manage.py procesar_reportes` toma los
+    trabajos pendientes con SELECT ... FOR UPDATE SKIP LOCKED, así que se
+    pueden levantar varios workers sin un broker externo.
+    """
+    PENDIENTE = 'pendiente'
+    PROCESANDO = 'procesando'
+    TERMINADO = 'terminado'
+    ERROR = 'error'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (PROCESANDO, 'Procesando'),
+        (TERMINADO, 'Terminado'),
+        (ERROR, 'Error'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filtros = models.JSONField()
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    progreso = models.PositiveSmallIntegerField(default=0)
+    mensaje = models.TextField(blank=True)
+    archivo = models.CharField(max_length=500, blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    # Un trabajo que se reintenta no se vuelve a tomar antes de esta fecha
+    disponible_desde = models.DateTimeField(null=True)
+    creado_el = models.DateTimeField(auto_now_add=True)
+    iniciado_el = models.DateTimeField(null=True)
+    terminado_el = models.DateTimeField(null=True)
+
+    class Meta:
+        verbose_name = 'trabajo de reporte'
+        verbose_name_plural = 'trabajos de reporte'
+        indexes = [
+            models.Index(fields=['estado', 'creado_el'], name='trabajo_reporte_cola_idx'),
+        ]
+
+    def __str__(self):
+        return f"Reporte {self.id} ({self.estado})"
+
+    @property
+    def nombre_archivo(self):
+        return f"reporte_consultas_{self.filtros.get('fecha_inicio')}_{self.filtros.get('fecha_fin')}.pdf"
@@ -0,0 +1,158 @@
+"""
+Motor rápido para la tabla "Detalle de Consultas" del reporte PDF.
+
+`TablaDetalleRapida` es un Flowable que dibuja las filas directamente en el
+canvas, con anchos de columna fijos y alturas de fila calculadas una sola vez
+con `simpleSplit`. Se parte en páginas recorriendo esas alturas, repitiendo
+el encabezado, sin el costo de maquetación de un `Table` de Platypus con un
+`Paragraph` por celda. El aspecto imita la tabla original (encabezado azul,
+cuadrícula gris claro, celdas centradas verticalmente).
+"""
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.lib.utils import simpleSplit
+from reportlab.platypus import Flowable
+
+ENCABEZADOS = ["Fecha", "Atleta", "Profesional", "Diagnóstico", "Tratamiento"]
+ANCHOS = [1.2 * inch, 1.5 * inch, 1.5 * inch, 2.0 * inch, 2.0 * inch]
+
+# Mismas métricas que la tabla de Platypus: texto simple a 9 pt y
+# diagnóstico/tratamiento con el estilo Normal (10 pt, interlineado 12)
+FUENTES = [
+    ('Helvetica', 9, 10.8),
+    ('Helvetica', 9, 10.8),
+    ('Helvetica', 9, 10.8),
+    ('Helvetica', 10, 12),
+    ('Helvetica', 10, 12),
+]
+FUENTE_ENCABEZADO = ('Helvetica-Bold', 9, 10.8)
+RELLENO_X = 6
+RELLENO_ARRIBA = 3
+RELLENO_ABAJO = 3
+RELLENO_ABAJO_ENCABEZADO = 12
+# Evita que una celda enorme no quepa en ninguna página
+MAX_LINEAS_CELDA = 45
+
+COLOR_ENCABEZADO = colors.HexColor('#3B82F6')
+COLOR_CUADRICULA = colors.HexColor('#E5E7EB')
+
+
+def _lineas(texto, columna):
+    fuente, tamano, _ = FUENTES[columna]
+    lineas = simpleSplit(str(texto), fuente, tamano, ANCHOS[columna] - 2 * RELLENO_X) or ['']
+    if len(lineas) > MAX_LINEAS_CELDA:
+        lineas = lineas[:MAX_LINEAS_CELDA - 1] + [lineas[MAX_LINEAS_CELDA - 1] + ' …']
+    return lineas
+
+
+def preparar_filas(consultas):
+    """
+    Parte el texto de cada celda en líneas y calcula la altura de cada fila.
+
+    Devuelve (filas, alturas); cada fila es una lista de listas de líneas.
+    """
+    filas = []
+    alturas = []
+    for consulta in consultas:
+        valores = [
+            consulta.get('fecha', 'No especificada'),
+            consulta.get('atleta_nombre', 'No especificado'),
+            consulta.get('profesional_nombre', 'No especificado'),
+            consulta.get('diagnostico', 'No especificado'),
+            consulta.get('tratamiento', 'No especificado'),
+        ]
+        fila = [_lineas(valor, columna) for columna, valor in enumerate(valores)]
+        contenido = max(len(lineas) * FUENTES[columna][2] for columna, lineas in enumerate(fila))
+        filas.append(fila)
+        alturas.append(contenido + RELLENO_ARRIBA + RELLENO_ABAJO)
+    return filas, alturas
+
+
+class TablaDetalleRapida(Flowable):
+    """
+    Tabla de detalle dibujada directamente en el canvas; representa las filas
+    [inicio, fin) de las filas preparadas.
+    """
+
+    ALTO_ENCABEZADO = FUENTE_ENCABEZADO[2] + RELLENO_ARRIBA + RELLENO_ABAJO_ENCABEZADO
+
+    def __init__(self, filas, alturas, inicio=0, fin=None):
+        super().__init__()
+        self.filas = filas
+        self.alturas = alturas
+        self.inicio = inicio
+        self.fin = len(filas) if fin is None else fin
+        self.width = sum(ANCHOS)
+        self.height = self.ALTO_ENCABEZADO + sum(alturas[self.inicio:self.fin])
+
+    @classmethod
+    def desde_consultas(cls, consultas):
+        return cls(*preparar_filas(consultas))
+
+    def wrap(self, ancho_disponible, alto_disponible):
+        return self.width, self.height
+
+    def split(self, ancho_disponible, alto_disponible):
+        disponible = alto_disponible - self.ALTO_ENCABEZADO
+        fin = self.inicio
+        while fin < self.fin and self.alturas[fin] <= disponible:
+            disponible -= self.alturas[fin]
+            fin += 1
+        if fin == self.inicio:
+            return []
+        return [
+            TablaDetalleRapida(self.filas, self.alturas, self.inicio, fin),
+            TablaDetalleRapida(self.filas, self.alturas, fin, self.fin),
+        ]
+
+    def draw(self):
+        canv = self.canv
+        y = self.height
+
+        # Encabezado
+        canv.setFillColor(COLOR_ENCABEZADO)
+        canv.rect(0, y - self.ALTO_ENCABEZADO, self.width, self.ALTO_ENCABEZADO, stroke=0, fill=1)
+        canv.setFillColor(colors.whitesmoke)
+        fuente, tamano, interlineado = FUENTE_ENCABEZADO
+        canv.setFont(fuente, tamano)
+        base = y - RELLENO_ARRIBA - tamano
+        x = 0
+        for titulo, ancho in zip(ENCABEZADOS, ANCHOS):
+            canv.drawCentredString(x + ancho / 2, base, titulo)
+            x += ancho
+        y -= self.ALTO_ENCABEZADO
+
+        # Filas: el texto de todas las celdas en un solo objeto de texto
+        canv.setFillColor(colors.black)
+        texto = canv.beginText()
+        bordes = [y]
+        for indice in range(self.inicio, self.fin):
+            alto = self.alturas[indice]
+            x = 0
+            for columna, lineas in enumerate(self.filas[indice]):
+                fuente, tamano, interlineado = FUENTES[columna]
+                # Centrado vertical dentro del espacio útil de la celda
+                libre = alto - RELLENO_ARRIBA - RELLENO_ABAJO - len(lineas) * interlineado
+                base = y - RELLENO_ARRIBA - libre / 2 - tamano
+                texto.setFont(fuente, tamano, interlineado)
+                texto.setTextOrigin(x + RELLENO_X, base)
+                for linea in lineas:
+                    texto.textLine(linea)
+                x += ANCHOS[columna]
+            y -= alto
+            bordes.append(y)
+        canv.drawText(texto)
+
+        # Cuadrícula
+        canv.setStrokeColor(COLOR_CUADRICULA)
+        canv.setLineWidth(1)
+        trazo = canv.beginPath()
+        for borde in [self.height] + bordes:
+            trazo.moveTo(0, borde)
+            trazo.lineTo(self.width, borde)
+        x = 0
+        for ancho in [0] + ANCHOS:
+            x += ancho
+            trazo.moveTo(x, self.height)
+            trazo.lineTo(x, y)
+        canv.drawPath(trazo, stroke=1, fill=0)
@@ -0,0 +1,283 @@
+"""
+Caché de respuestas de los endpoints que el dashboard sondea.
+
+Cada pestaña abierta consulta periódicamente las estadísticas y los filtros;
+sin esta caché cada sondeo vuelve a pedir y recalcular todo. Las respuestas ya
+calculadas se guardan en el caché de Django (compartido entre workers con el
+backend 'file' o 'db') por endpoint, query string y fuente de datos:
+
+- Durante `RESPUESTAS_<ENDPOINT>_TTL` segundos se sirven tal cual.
+- Durante los `RESPUESTAS_SWR` segundos siguientes se sirve la copia vencida
+  y un hilo en segundo plano la recalcula.
+- En un fallo de caché solo quien toma el candado (`cache.add`) calcula; los
+  demás esperan hasta `RESPUESTAS_ESPERA` segundos a que aparezca la copia y
+  solo si no llega (o el candado se suelta sin ella porque el cálculo falló)
+  la calculan ellos mismos.
+
+Junto a cada respuesta se guarda, en una clave aparte y pequeña, su versión:
+un ETag derivado del contenido (recalcular los mismos datos da el mismo ETag)
+y la fecha en que el contenido cambió por última vez. Con ella se contestan
+`If-None-Match` / `If-Modified-Since` con un 304 sin leer ni serializar la
+respuesta completa.
+
+Solo se guardan respuestas exitosas: si el cálculo falla la excepción llega a
+la vista como antes.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from . import codec_json, espejo
+
+logger = logging.getLogger(__name__)
+
+# Cada cuánto revisa la caché quien espera a otro que calcula la misma respuesta
+INTERVALO_ESPERA = 0.05
+
+
+def ttl(endpoint):
+    return getattr(settings, f'RESPUESTAS_{endpoint.upper()}_TTL')
+
+
+def activa(endpoint):
+    return ttl(endpoint) > 0
+
+
+def clave(endpoint, query):
+    """
+    Clave de la respuesta: endpoint, fuente de datos y query string normalizada.
+    """
+    fuente = 'espejo' if espejo.usar_espejo() else 'backend'
+    consulta = hashlib.sha1(urlencode(sorted(query.lists()), doseq=True).encode()).hexdigest()
+    return f'reportes:respuesta:{endpoint}:{fuente}:{consulta}'
+
+
+def _clave_version(clave_respuesta):
+    return clave_respuesta + ':version'
+
+
+def _clave_candado(clave_respuesta):
+    return clave_respuesta + ':calculando'
+
+
+def _version(datos, anterior=None):
+    """
+    Versión de unos datos: ETag del contenido, fecha del último cambio y de generación.
+    """
+    etag = '"%s"' % hashlib.sha1(codec_json.volcar(datos, ordenar=True)).hexdigest()
+    ahora = time.time()
+    # Si el contenido no cambió se conserva su Last-Modified
+    modificado = anterior['modificado'] if anterior is not None and anterior['etag'] == etag else ahora
+    return {'etag': etag, 'modificado': modificado, 'generado': ahora}
+
+
+def vencida(version, endpoint):
+    return time.time() - version['generado'] > ttl(endpoint)
+
+
+def leer(clave_respuesta):
+    """
+    Devuelve la entrada en caché ({'datos', 'version'}) o None si no hay.
+    """
+    return cache.get(clave_respuesta)
+
+
+def guardar(clave_respuesta, endpoint, datos):
+    entrada = {'datos': datos, 'version': _version(datos, cache.get(_clave_version(clave_respuesta)))}
+    cache.set_many({
+        clave_respuesta: entrada,
+        _clave_version(clave_respuesta): entrada['version'],
+    }, ttl(endpoint) + settings.RESPUESTAS_SWR)
+    return entrada
+
+
+def tomar_candado(clave_respuesta):
+    # cache.add es atómico: solo un proceso/hilo recalcula a la vez
+    return cache.add(_clave_candado(clave_respuesta), 1, settings.RESPUESTAS_ESPERA)
+
+
+def soltar_candado(clave_respuesta):
+    cache.delete(_clave_candado(clave_respuesta))
+
+
+def revisar_espera(clave_respuesta):
+    """
+    Devuelve (entrada, seguir_esperando) para quien espera el cálculo de otro.
+    Si el candado ya no está y la copia no apareció, el cálculo falló.
+    """
+    entrada = leer(clave_respuesta)
+    if entrada is not None:
+        return entrada, False
+    return None, cache.get(_clave_candado(clave_respuesta)) is not None
+
+
+def refrescar_en_segundo_plano(clave_respuesta, endpoint, calcular):
+    """
+    Recalcula la respuesta en un hilo si nadie más lo está haciendo.
+    """
+    if not tomar_candado(clave_respuesta):
+        return
+
+    def refrescar():
+        try:
+            guardar(clave_respuesta, endpoint, calcular())
+            logger.info("Respuesta de %s refrescada en segundo plano", endpoint)
+        except Exception as e:
+            logger.warning("No se pudo refrescar la respuesta de %s: %s", endpoint, str(e))
+        finally:
+            soltar_candado(clave_respuesta)
+            # En modo espejo el hilo abrió su propia conexión a la base
+            connections.close_all()
+
+    threading.Thread(target=refrescar, name=f'refresco-{endpoint}', daemon=True).start()
+
+
+def poner_validadores(response, version):
+    """
+    Agrega ETag y Last-Modified; `no-cache` hace que el navegador revalide en
+    cada sondeo en vez de reusar la copia por heurística.
+    """
+    response['ETag'] = version['etag']
+    response['Last-Modified'] = http_date(version['modificado'])
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def no_modificada(request, version):
+    """
+    Respuesta 304 (o 412) si los validadores de la petición lo piden para `version`, o None.
+    """
+    respuesta = get_conditional_response(request, etag=version['etag'], last_modified=int(version['modificado']))
+    if respuesta is not None:
+        poner_validadores(respuesta, version)
+    return respuesta
+
+
+def revisar_version(request, clave_respuesta, endpoint, calcular):
+    """
+    Lee solo la versión vigente: dispara el refresco si está vencida y
+    devuelve la respuesta 304 si el cliente ya la tiene, o None.
+    """
+    version = cache.get(_clave_version(clave_respuesta))
+    if version is None:
+        return None
+    if vencida(version, endpoint):
+        refrescar_en_segundo_plano(clave_respuesta, endpoint, calcular)
+    return no_modificada(request, version)
+
+
+def obtener(endpoint, query, calcular):
+    """
+    Devuelve la entrada ({'datos', 'version'}) de `endpoint` para `query`,
+    calculándola con `calcular()` solo cuando hace falta.
+    """
+    if not activa(endpoint):
+        datos = calcular()
+        return {'datos': datos, 'version': _version(datos)}
+    clave_respuesta = clave(endpoint, query)
+    entrada = leer(clave_respuesta)
+    if entrada is not None:
+        if vencida(entrada['version'], endpoint):
+            refrescar_en_segundo_plano(clave_respuesta, endpoint, calcular)
+        return entrada
+
+    if tomar_candado(clave_respuesta):
+        try:
+            return guardar(clave_respuesta, endpoint, calcular())
+        finally:
+            soltar_candado(clave_respuesta)
+
+    # Otro worker ya la está calculando: esperar su resultado
+    limite = time.monotonic() + settings.RESPUESTAS_ESPERA
+    while time.monotonic() < limite:
+        time.sleep(INTERVALO_ESPERA)
+        entrada, seguir = revisar_espera(clave_respuesta)
+        if entrada is not None:
+            return entrada
+        if not seguir:
+            logger.info("El cálculo de %s terminó sin respuesta; se calcula de nuevo", endpoint)
+            break
+    else:
+        logger.warning("Se agotó la espera por la respuesta de %s; se calcula de nuevo", endpoint)
+    datos = calcular()
+    return {'datos': datos, 'version': _version(datos)}
+
+
+def responder(request, endpoint, calcular, crear_respuesta):
+    """
+    Atiende un GET condicional: 304 si el cliente tiene la versión vigente,
+    si no `crear_respuesta(datos)` con sus validadores.
+    """
+    if activa(endpoint):
+        respuesta = revisar_version(request, clave(endpoint, request.GET), endpoint, calcular)
+        if respuesta is not None:
+            return respuesta
+    entrada = obtener(endpoint, request.GET, calcular)
+    return no_modificada(request, entrada['version']) or poner_validadores(
+        crear_respuesta(entrada['datos']), entrada['version']
+    )
+
+
+async def obtener_async(endpoint, query, calcular_async, calcular):
+    """
+    Como `obtener`, para las vistas asíncronas: los fallos se calculan con
+    `calcular_async()` y los refrescos en segundo plano con `calcular()`.
+    """
+    if not activa(endpoint):
+        datos = await calcular_async()
+        return {'datos': datos, 'version': _version(datos)}
+    clave_respuesta = clave(endpoint, query)
+    entrada = await sync_to_async(leer, thread_sensitive=False)(clave_respuesta)
+    if entrada is not None:
+        if vencida(entrada['version'], endpoint):
+            await sync_to_async(refrescar_en_segundo_plano, thread_sensitive=False)(
+                clave_respuesta, endpoint, calcular
+            )
+        return entrada
+
+    if await sync_to_async(tomar_candado, thread_sensitive=False)(clave_respuesta):
+        try:
+            datos = await calcular_async()
+            return await sync_to_async(guardar, thread_sensitive=False)(clave_respuesta, endpoint, datos)
+        finally:
+            await sync_to_async(soltar_candado, thread_sensitive=False)(clave_respuesta)
+
+    limite = time.monotonic() + settings.RESPUESTAS_ESPERA
+    while time.monotonic() < limite:
+        await asyncio.sleep(INTERVALO_ESPERA)
+        entrada, seguir = await sync_to_async(revisar_espera, thread_sensitive=False)(clave_respuesta)
+        if entrada is not None:
+            return entrada
+        if not seguir:
+            logger.info("El cálculo de %s terminó sin respuesta; se calcula de nuevo", endpoint)
+            break
+    else:
+        logger.warning("Se agotó la espera por la respuesta de %s; se calcula de nuevo", endpoint)
+    datos = await calcular_async()
+    return {'datos': datos, 'version': _version(datos)}
+
+
+async def responder_async(request, endpoint, calcular_async, calcular, crear_respuesta):
+    """
+    Como `responder`, para las vistas asíncronas.
+    """
+    if activa(endpoint):
+        respuesta = await sync_to_async(revisar_version, thread_sensitive=False)(
+            request, clave(endpoint, request.GET), endpoint, calcular
+        )
+        if respuesta is not None:
+            return respuesta
+    entrada = await obtener_async(endpoint, request.GET, calcular_async, calcular)
+    return no_modificada(request, entrada['version']) or poner_validadores(
+        crear_respuesta(entrada['datos']), entrada['version']
+    )
@@ -0,0 +1,158 @@
+"""
+Caché de consultas segmentada por mes para el dashboard de estadísticas.
+
+Cada mes cerrado se guarda como un segmento inmutable: solo su acumulador
+ya calculado, no sus consultas, para que leer los segmentos cueste según el
+número de meses y no según el volumen de la historia. Solo los meses "calientes" —el actual y los
+`ESTADISTICAS_MESES_EDITABLES` anteriores, que aún pueden recibir ediciones—
+se vuelven a pedir al backend con `fecha_inicio` (y `fecha_fin` abierta), de
+modo que el costo de cada carga depende del volumen reciente y no de toda la
+historia.
+
+Cada vez que se reescribe el índice se reescriben también los segmentos que
+lista, para que ninguno venza antes que él; si aun así falta alguno, el
+índice se descarta y se recarga toda la historia.
+
+El trabajo se divide en tres pasos (planificar, descargar, completar) para
+que la vista async pueda hacer la descarga con su propio cliente.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metricas, upstream
+from .estadisticas import AcumuladorConsultas, acumular, mes_de_fecha
+
+logger = logging.getLogger(__name__)
+
+CLAVE_INDICE = 'reportes:segmentos:v2:indice'
+# Algunos backends solo aplican el rango si reciben ambas fechas; el fin
+# abierto conserva las consultas con fecha futura, como la carga completa
+FECHA_FIN_ABIERTA = '9999-12-31'
+
+
+def _clave_segmento(mes):
+    return 'reportes:segmentos:v2:%04d-%02d' % mes
+
+
+def _restar_meses(mes, n):
+    year, month = mes
+    total = year * 12 + (month - 1) - n
+    return (total // 12, total % 12 + 1)
+
+
+class PlanSegmentos:
+    """
+    Resultado de leer el índice: segmentos cerrados disponibles y ventana a pedir.
+    """
+
+    def __init__(self, hoy, activo=True):
+        self.activo = activo
+        mes_actual = (hoy.year, hoy.month)
+        self.inicio_caliente = _restar_meses(mes_actual, settings.ESTADISTICAS_MESES_EDITABLES)
+        self.indice = None
+        self.cerrados = {}
+        # Primer mes que hay que pedir al backend; None = toda la historia
+        self.desde = None
+
+    @property
+    def params(self):
+        if self.desde is None:
+            return None
+        return {'fecha_inicio': '%04d-%02d-01' % self.desde, 'fecha_fin': FECHA_FIN_ABIERTA}
+
+
+def planificar(hoy):
+    """
+    Lee el índice y los segmentos cerrados y decide qué ventana pedir al backend.
+
+    Con `ESTADISTICAS_SEGMENTOS` desactivado el plan pide toda la historia.
+    """
+    plan = PlanSegmentos(hoy, activo=settings.ESTADISTICAS_SEGMENTOS)
+    if not plan.activo:
+        return plan
+    indice = cache.get(CLAVE_INDICE)
+    if indice is None:
+        return plan
+
+    claves = {mes: _clave_segmento(mes) for mes in indice['meses']}
+    encontrados = cache.get_many(list(claves.values()))
+    if len(encontrados) != len(claves):
+        # Algún segmento fue desalojado: se reconstruye todo desde cero
+        logger.info("Segmentos incompletos en caché, recargando toda la historia")
+        invalidar_segmentos()
+        return plan
+
+    plan.indice = indice
+    plan.cerrados = {mes: encontrados[clave] for mes, clave in claves.items()}
+    plan.desde = _restar_meses(indice['cerrado_hasta'], -1)
+    return plan
+
+
+def completar(plan, consultas):
+    """
+    Agrupa las consultas descargadas por mes, cierra los meses que ya salieron
+    de la ventana caliente y devuelve el acumulador de toda la historia.
+    """
+    with metricas.etapa('acumular', filas=len(consultas)):
+        return _completar(plan, consultas)
+
+
+def _completar(plan, consultas):
+    if not plan.activo:
+        return acumular(consultas)
+
+    por_mes = defaultdict(list)
+    for consulta in consultas:
+        mes = mes_de_fecha(consulta['fecha'])
+        # El backend puede ignorar el filtro de fechas: se descarta lo ya cerrado
+        if plan.desde is None or mes >= plan.desde:
+            por_mes[mes].append(consulta)
+
+    nuevos = {}
+    for mes, filas in por_mes.items():
+        if mes < plan.inicio_caliente:
+            nuevos[mes] = acumular(filas)
+
+    cerrado_hasta = _restar_meses(plan.inicio_caliente, 1)
+    if plan.indice is not None:
+        cerrado_hasta = max(cerrado_hasta, plan.indice['cerrado_hasta'])
+    if nuevos or plan.indice is None or plan.indice['cerrado_hasta'] != cerrado_hasta:
+        ttl = settings.ESTADISTICAS_SEGMENTOS_TTL
+        plan.cerrados.update(nuevos)
+        # Todos los segmentos, no solo los nuevos: así vencen junto con el índice
+        cache.set_many({_clave_segmento(mes): segmento for mes, segmento in plan.cerrados.items()}, ttl)
+        cache.set(CLAVE_INDICE, {
+            'meses': sorted(plan.cerrados),
+            'cerrado_hasta': cerrado_hasta,
+        }, ttl)
+        logger.info("Segmentos cerrados guardados: %d (cerrado hasta %04d-%02d)", len(nuevos), *cerrado_hasta)
+
+    acumulador = AcumuladorConsultas()
+    for mes in sorted(plan.cerrados):
+        acumulador.combinar(plan.cerrados[mes])
+    for mes in sorted(por_mes):
+        if mes >= plan.inicio_caliente:
+            acumulador.combinar(acumular(por_mes[mes]))
+    return acumulador
+
+
+def invalidar_segmentos():
+    """
+    Descarta el índice; la siguiente carga vuelve a pedir toda la historia.
+    """
+    cache.delete(CLAVE_INDICE)
+
+
+def obtener_acumulador(hoy=None, timeout=None):
+    """
+    Devuelve el acumulador de todas las consultas, usando los segmentos en caché.
+    """
+    if hoy is None:
+        hoy = datetime.now()
+    plan = planificar(hoy)
+    consultas = upstream.obtener_json(settings.API_CONSULTAS, params=plan.params, timeout=timeout)
+    return completar(plan, consultas)
@@ -1,3 +1,1296 @@
-from django.test import TestCase
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import skipUnless
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.http import HttpResponse, QueryDict
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from . import (
+    cache_pdf, capacidades, codec_json, compresion, conteos, espejo, estadisticas_columnar, metricas, respuestas,
+    trabajos, upstream, ventanas,
+)
+from .campos import (
+    ACCESORES_GENERALES,
+    FECHA_FORMATOS,
+    LectorConsultas,
+    obtener_id_de_campo,
+    parsear_fecha,
+    parsear_fecha_consulta,
+)
+from .catalogos import invalidar_catalogos, obtener_catalogos
+from .codec_json import JSONRendererRapido
+from .estadisticas import AcumuladorConsultas, calcular_estadisticas, construir_respuesta
+from .flujo_json import iterar_arreglo
+from .models import TrabajoReporte
+from .segmentos import obtener_acumulador
+from .pdf_rapido import TablaDetalleRapida
+from .views import GeneradorReporteConsultas, ProcesamientoConsultasMixin
+from .views_async import EstadisticasConsultasAsyncView, FiltrosConsultaAsyncView
+
+
+def generar_datos(n_consultas, n_atletas=40, n_profesionales=8, semilla=0, hoy=None):
+    """
+    Genera catálogos y consultas sintéticas con la forma que entrega el backend.
+    """
+    rng = random.Random(semilla)
+    hoy = hoy or date.today()
+    atletas = [
+        {'id': i, 'nombre': f'Atleta{i}', 'apPaterno': f'Paterno{i}', 'apMaterno': f'Materno{i}'}
+        for i in range(1, n_atletas + 1)
+    ]
+    profesionales = [
+        {'id': i, 'nombre': f'Prof{i}', 'apPaterno': f'Ap{i}', 'especialidad': rng.choice(['Medicina', 'Nutrición', ''])}
+        for i in range(1, n_profesionales + 1)
+    ]
+    diagnosticos = ['Esguince', 'Contractura', 'Tendinitis', 'Sin diagnóstico', '', ' Fatiga ', 'Fractura', 'Lumbalgia']
+    consultas = []
+    for i in range(1, n_consultas + 1):
+        fecha = hoy - timedelta(days=rng.randint(0, 800))
+        consulta = {
+            'id': i,
+            'fecha': fecha.strftime('%Y-%m-%d'),
+            'diagnostico': rng.choice(diagnosticos),
+            'tratamiento': 'Reposo',
+        }
+        # El backend ha expuesto ambas variantes de las llaves foráneas
+        if rng.random() < 0.8:
+            consulta['atleta'] = rng.randint(1, n_atletas + 3)
+            consulta['profesional_salud'] = rng.randint(1, n_profesionales + 1)
+        else:
+            consulta['atleta_id'] = str(rng.randint(1, n_atletas))
+            consulta['profesional_salud_id'] = str(rng.randint(1, n_profesionales))
+        if rng.random() < 0.05:
+            del consulta['diagnostico']
+        consultas.append(consulta)
+    return consultas, profesionales, atletas
+
+
+def contenido_de(response):
+    """
+    Cuerpo completo de una respuesta, sea normal o en streaming (síncrono o no).
+    """
+    if response.streaming:
+        return b''.join(response)
+    return response.content
+
+
+def estadisticas_referencia(todas_consultas, todos_profesionales, todos_atletas, hoy):
+    """
+    Implementación original de EstadisticasConsultasView, usada como referencia.
+    """
+    mes_actual = hoy.month
+    año_actual = hoy.year
+    consultas_mes_actual = [
+        c for c in todas_consultas
+        if datetime.strptime(c['fecha'], '%Y-%m-%d').month == mes_actual
+        and datetime.strptime(c['fecha'], '%Y-%m-%d').year == año_actual
+    ]
+    monthly_data_by_profesional = []
+    meses_mostrar = 12
+    for i in range(meses_mostrar):
+        mes_offset = meses_mostrar - i - 1
+        month = (mes_actual - mes_offset - 1) % 12 + 1
+        year = año_actual - (1 if mes_actual - mes_offset - 1 < 0 else 0)
+        consultas_mes = [
+            c for c in todas_consultas
+            if datetime.strptime(c['fecha'], '%Y-%m-%d').month == month
+            and datetime.strptime(c['fecha'], '%Y-%m-%d').year == year
+        ]
+        profesionales_data_mes = []
+        for profesional in todos_profesionales:
+            profesional_id = str(profesional['id'])
+            count = sum(1 for c in consultas_mes
+                        if str(c.get('profesional_salud', c.get('profesional_salud_id', ''))) == profesional_id)
+            nombre_completo = f"{profesional.get('nombre', '')} {profesional.get('apPaterno', '')}".strip()
+            profesionales_data_mes.append({
+                'profesional_id': profesional['id'],
+                'profesional_name': nombre_completo,
+                'count': count
+            })
+        monthly_data_by_profesional.append({
+            'mes': datetime(year, month, 1).strftime('%b'),
+            'mes_numero': month,
+            'ano': year,
+            'profesionales': profesionales_data_mes,
+            'total': len(consultas_mes)
+        })
+    profesionales_data = []
+    for profesional in todos_profesionales:
+        profesional_id = str(profesional['id'])
+        total_consultas_prof = sum(
+            1 for c in consultas_mes_actual
+            if str(c.get('profesional_salud', c.get('profesional_salud_id', ''))) == profesional_id
+        )
+        nombre_completo = f"{profesional.get('nombre', '')} {profesional.get('apPaterno', '')}".strip()
+        profesionales_data.append({
+            'nombre': nombre_completo,
+            'id': profesional_id,
+            'total': total_consultas_prof,
+            'especialidad': profesional.get('especialidad', 'Sin especialidad')
+        })
+    atletas_data = []
+    for atleta in todos_atletas:
+        atleta_id = str(atleta['id'])
+        total_consultas_atleta = sum(
+            1 for c in todas_consultas
+            if str(c.get('atleta', c.get('atleta_id', ''))) == atleta_id
+        )
+        nombre_completo = f"{atleta.get('nombre', '')} {atleta.get('apPaterno', '')}".strip()
+        if total_consultas_atleta > 0:
+            atletas_data.append({
+                'nombre': nombre_completo,
+                'id': atleta_id,
+                'total': total_consultas_atleta
+            })
+    top_atletas = sorted(atletas_data, key=lambda x: x['total'], reverse=True)[:10]
+    diagnosticos = {}
+    for consulta in todas_consultas:
+        diagnostico = consulta.get('diagnostico', 'Sin diagnóstico').strip()
+        if diagnostico and diagnostico != 'Sin diagnóstico':
+            diagnosticos[diagnostico] = diagnosticos.get(diagnostico, 0) + 1
+    # Única diferencia con el original: los empates se ordenan por nombre
+    top_diagnosticos = sorted(
+        [{'nombre': k, 'total': v} for k, v in diagnosticos.items()],
+        key=lambda x: (-x['total'], x['nombre'])
+    )[:5]
+    return {
+        'total_consultas': len(todas_consultas),
+        'consultas_mes_actual': len(consultas_mes_actual),
+        'profesionales_data': profesionales_data,
+        'monthly_data_by_profesional': monthly_data_by_profesional,
+        'monthly_data': [{'mes': m['mes'], 'total': m['total']} for m in monthly_data_by_profesional],
+        'top_atletas': top_atletas,
+        'top_diagnosticos': top_diagnosticos
+    }
+
+
+class FlujoJSONTests(SimpleTestCase):
+
+    def test_elementos_iguales_a_json_loads(self):
+        datos = [{'id': i, 'texto': 'ñandú € "comillas"\n', 'valores': [1, 2.5, None, True]} for i in range(50)]
+        datos += [12345, 'cadena', [], {}]
+        cuerpo = json.dumps(datos, ensure_ascii=False, indent=1).encode('utf-8')
+        for tamano in (1, 2, 7, 100, len(cuerpo)):
+            fragmentos = [cuerpo[i:i + tamano] for i in range(0, len(cuerpo), tamano)]
+            self.assertEqual(list(iterar_arreglo(fragmentos)), datos)
+        self.assertEqual(list(iterar_arreglo([b' [ ', b'] '])), [])
+
+    def test_cuerpo_invalido(self):
+        for cuerpo in (b'[1,]', b'[1 2]', b'[{"a": 1}', b'{"a": 1}'):
+            with self.assertRaises(ValueError):
+                list(iterar_arreglo([cuerpo[:3], cuerpo[3:]]))
+
+
+class CamposTests(SimpleTestCase):
+
+    def test_parsear_fecha_igual_a_strptime(self):
+        def con_strptime(texto):
+            for formato in FECHA_FORMATOS:
+                try:
+                    return datetime.strptime(texto, formato)
+                except (ValueError, TypeError):
+                    continue
+            return None
+
+        casos = [
+            '2024-01-05', '2024-1-5', '2024-02-30', '2024-13-01', '20240105', '2024-01-05 ',
+            '2024-12-31 23:59:59', '2024-12-31  3:4:5', '2024-12-31T23:59:60.1Z',
+            '2024-12-31t23:59:59.5z', '2024-12-31T23:59:59.1234567Z', '2024-01- 5', '', None, 5,
+        ]
+        for texto in casos:
+            self.assertEqual(parsear_fecha(texto), con_strptime(texto), texto)
+
+    def test_accesores_compilados_iguales_a_generales(self):
+        consultas, _, _ = generar_datos(50, semilla=11)
+        consultas += [
+            {'id': 51, 'fecha': '', 'creado_el': '2024-03-01 10:00:00', 'atleta': None, 'atleta_id': 4,
+             'profesional_salud': {'id': 2}, 'diagnostico': '', 'tratamiento': 'Reposo'},
+            {'id': 52, 'fecha_consulta': '2024-03-01T10:00:00.000Z', 'paciente': {'id': 9}, 'medico': 3},
+            dict(consultas[0], fecha='2024-03-01 10:00:00'),
+            dict(consultas[0], fecha='2024-02-30', atleta={'nombre': 'sin id'}),
+        ]
+        lector = LectorConsultas()
+        for consulta in consultas:
+            acceso = lector.accesores(consulta)
+            for campo in ACCESORES_GENERALES._fields:
+                self.assertEqual(
+                    getattr(acceso, campo)(consulta), getattr(ACCESORES_GENERALES, campo)(consulta), campo
+                )
+        self.assertGreater(lector.lentas, 0)
+        self.assertLess(lector.lentas, len(consultas))
+
+
+class CodecJSONTests(SimpleTestCase):
+
+    def test_mismos_bytes_que_el_renderer_de_drf(self):
+        consultas, profesionales, atletas = generar_datos(300, semilla=9)
+        datos = calcular_estadisticas(consultas, profesionales, atletas, hoy=datetime(2025, 1, 15))
+        datos['raros'] = [
+            'Lumbalgia crónica\u2028\u2029', 'niño "ñandú"', datetime(2025, 1, 15, 10, 30, 0, 123456),
+            date(2025, 1, 15), Decimal('1.50'), 2 ** 70, None, True, 1.5, {'ü': []},
+        ]
+        esperado = JSONRenderer().render(datos)
+        for codec in ('orjson', 'stdlib'):
+            with self.subTest(codec=codec), override_settings(JSON_CODEC=codec):
+                self.assertEqual(JSONRendererRapido().render(datos), esperado)
+                self.assertEqual(codec_json.volcar(datos), esperado)
+
+    def test_carga_cuerpos_con_bom_o_invalidos(self):
+        self.assertEqual(codec_json.cargar(b'[{"a": "\xc3\xb1"}]'), [{'a': 'ñ'}])
+        self.assertEqual(codec_json.cargar('\ufeff[1]'.encode('utf-8')), [1])
+        with self.assertRaises(ValueError):
+            codec_json.cargar(b'[1,')
+
+
+class CalcularEstadisticasTests(SimpleTestCase):
+
+    def test_coincide_con_implementacion_original(self):
+        for semilla, hoy in [(1, datetime(2025, 1, 15)), (2, datetime(2024, 12, 31)), (3, datetime(2025, 6, 1))]:
+            consultas, profesionales, atletas = generar_datos(1500, semilla=semilla, hoy=hoy.date())
+            with self.subTest(semilla=semilla):
+                self.assertEqual(
+                    calcular_estadisticas(consultas, profesionales, atletas, hoy=hoy),
+                    estadisticas_referencia(consultas, profesionales, atletas, hoy)
+                )
+
+    def test_sin_consultas(self):
+        _, profesionales, atletas = generar_datos(0)
+        hoy = datetime(2025, 3, 10)
+        self.assertEqual(
+            calcular_estadisticas([], profesionales, atletas, hoy=hoy),
+            estadisticas_referencia([], profesionales, atletas, hoy)
+        )
+
+    @skipUnless(estadisticas_columnar.disponible(), "numpy no está instalado")
+    def test_motor_numpy_da_el_mismo_resultado(self):
+        hoy = datetime(2025, 1, 15)
+        for n_consultas in (0, 1, 1500):
+            consultas, profesionales, atletas = generar_datos(n_consultas, semilla=4, hoy=hoy.date())
+            with self.subTest(n_consultas=n_consultas):
+                esperado = calcular_estadisticas(consultas, profesionales, atletas, hoy=hoy)
+                with override_settings(ESTADISTICAS_MOTOR='numpy'):
+                    self.assertEqual(calcular_estadisticas(consultas, profesionales, atletas, hoy=hoy), esperado)
+
+    @skipUnless(estadisticas_columnar.disponible(), "numpy no está instalado")
+    def test_motor_numpy_con_fecha_atipica(self):
+        # Una fecha del año 1 y 3.000 profesionales: solo se cuentan los pares presentes
+        consultas = [
+            {'id': i, 'fecha': '2025-01-10', 'atleta': i % 7, 'profesional_salud': i} for i in range(3000)
+        ]
+        consultas.append({'id': 3000, 'fecha': '0001-01-05', 'atleta': 1, 'profesional_salud': 2999})
+        columnar = estadisticas_columnar.acumular(consultas)
+        python = AcumuladorConsultas().agregar_todas(consultas)
+        self.assertEqual(columnar.por_mes_profesional, python.por_mes_profesional)
+        self.assertEqual(columnar.por_mes, {(2025, 1): 3000, (1, 1): 1})
+        self.assertEqual(columnar.por_mes, python.por_mes)
+
+
+def _filtrar_como_backend(consultas, query):
+    """
+    Aplica los filtros de la query string como lo haría un backend que los respeta.
+    """
+    inicio = query.get('fecha_inicio', ['0001-01-01'])[0]
+    fin = query.get('fecha_fin', ['9999-12-31'])[0]
+    atleta = query.get('atleta_id', [None])[0]
+    profesional = query.get('profesional_id', [None])[0]
+    filtradas = []
+    for consulta in consultas:
+        fecha = parsear_fecha_consulta(consulta)
+        if fecha is None or not (inicio <= fecha.strftime('%Y-%m-%d') <= fin):
+            continue
+        if atleta and obtener_id_de_campo(consulta, ['atleta_id', 'atleta']) != atleta:
+            continue
+        if profesional and obtener_id_de_campo(consulta, ['profesional_salud_id', 'profesional_salud']) != profesional:
+            continue
+        filtradas.append(consulta)
+    return filtradas
+
+
+class _BackendFalsoHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        backend = self.server.backend
+        ruta = self.path.split('?')[0]
+        backend.rutas_pedidas.append(self.path)
+        if backend.retardo:
+            time.sleep(backend.retardo)
+        if ruta in backend.fallar or ruta not in backend.datos:
+            codigo, cuerpo = 500, b'{}'
+        elif ruta in backend.truncar:
+            # Cuerpo cortado a la mitad: JSON incompleto o conexión cerrada antes de tiempo
+            cuerpo = json.dumps(backend.datos[ruta]).encode()
+            largo = len(cuerpo) if backend.truncar[ruta] == 'conexion' else len(cuerpo) // 2
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(largo))
+            self.end_headers()
+            self.wfile.write(cuerpo[:len(cuerpo) // 2])
+            self.close_connection = True
+            return
+        else:
+            datos = backend.datos[ruta]
+            if backend.filtra and ruta == '/Modulos/Consultas/':
+                datos = _filtrar_como_backend(datos, parse_qs(urlsplit(self.path).query))
+            codigo, cuerpo = 200, json.dumps(datos).encode()
+        etag = '"%s"' % hashlib.sha1(cuerpo).hexdigest()
+        if codigo == 200 and self.headers.get('If-None-Match') == etag:
+            codigo, cuerpo = 304, b''
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        if codigo != 500:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente cerró la conexión sin leer todo (sondas de filtros)
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class BackendFalsoMixin:
+    """
+    Levanta un backend HTTP local que sirve consultas y catálogos para las pruebas.
+    """
+    handler = _BackendFalsoHandler
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.servidor = ThreadingHTTPServer(('127.0.0.1', 0), cls.handler)
+        cls.servidor.backend = cls
+        cls.base_url = f'http://127.0.0.1:{cls.servidor.server_address[1]}'
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+        cls.ajustes = override_settings(
+            API_BASE_URL=cls.base_url,
+            API_CONSULTAS=cls.base_url + '/Modulos/Consultas/',
+            API_ATLETAS=cls.base_url + '/Catalogos/Atletas/',
+            API_PROFESIONALES=cls.base_url + '/Catalogos/Profesionales-Salud/',
+        )
+        cls.ajustes.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.ajustes.disable()
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        consultas, profesionales, atletas = generar_datos(200, semilla=7)
+        type(self).datos = {
+            '/Modulos/Consultas/': consultas,
+            '/Catalogos/Atletas/': atletas,
+            '/Catalogos/Profesionales-Salud/': profesionales,
+        }
+        type(self).retardo = 0
+        type(self).fallar = set()
+        type(self).truncar = {}
+        type(self).filtra = False
+        type(self).rutas_pedidas = []
+        cache.clear()
+        invalidar_catalogos()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(REPORTES_PDF_CACHE_DIR=directorio.name, METRICAS_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+
+class ClienteUpstreamTests(BackendFalsoMixin, SimpleTestCase):
+
+    def test_reutiliza_conexiones(self):
+        url = self.base_url + '/Catalogos/Atletas/'
+        antes = upstream.estadisticas_conexiones()
+        for _ in range(5):
+            self.assertEqual(upstream.obtener_json(url), self.datos['/Catalogos/Atletas/'])
+        despues = upstream.estadisticas_conexiones()
+        self.assertEqual(despues['peticiones'] - antes['peticiones'], 5)
+        self.assertLessEqual(despues['conexiones_nuevas'] - antes['conexiones_nuevas'], 1)
+
+    @override_settings(UPSTREAM_TIMEOUT_CONEXION=2.5, UPSTREAM_TIMEOUT_LECTURA=12)
+    def test_timeout_separa_conexion_y_lectura(self):
+        self.assertEqual(upstream.timeout_de(None), (2.5, 12))
+        self.assertEqual(upstream.timeout_de(5), (2.5, 5))
+        self.assertEqual(upstream.timeout_de((1, 30)), (1, 30))
+
+    def test_revalida_con_etag(self):
+        url = self.base_url + '/Modulos/Consultas/'
+        antes = upstream.estadisticas_revalidacion()
+        datos, huella = upstream.obtener_json_versionado(url, params={'fecha_inicio': '2024-01-01'})
+        datos_2, huella_2 = upstream.obtener_json_versionado(url, params={'fecha_inicio': '2024-01-01'})
+        self.assertIs(datos_2, datos)
+        self.assertEqual(huella_2, huella)
+
+        self.datos['/Modulos/Consultas/'] = self.datos['/Modulos/Consultas/'][:10]
+        datos_3, huella_3 = upstream.obtener_json_versionado(url, params={'fecha_inicio': '2024-01-01'})
+        self.assertEqual(len(datos_3), 10)
+        self.assertNotEqual(huella_3, huella)
+
+        despues = upstream.estadisticas_revalidacion()
+        self.assertEqual(despues['revalidadas_304'] - antes['revalidadas_304'], 1)
+        self.assertEqual(despues['modificadas'] - antes['modificadas'], 1)
+
+    def test_no_guarda_cuerpos_grandes(self):
+        url = self.base_url + '/Modulos/Consultas/'
+        params = {'fecha_inicio': '2024-02-01'}
+        with override_settings(UPSTREAM_VALIDADORES_MAX_BYTES=100):
+            antes = upstream.estadisticas_revalidacion()
+            datos, huella = upstream.obtener_json_versionado(url, params=params)
+            datos_2, huella_2 = upstream.obtener_json_versionado(url, params=params)
+            despues = upstream.estadisticas_revalidacion()
+        self.assertEqual(datos_2, datos)
+        self.assertIsNot(datos_2, datos)
+        self.assertEqual(huella_2, huella)
+        self.assertEqual(despues['revalidadas_304'], antes['revalidadas_304'])
+        self.assertEqual(despues['sin_validadores'] - antes['sin_validadores'], 2)
+
+
+class VistasTests(BackendFalsoMixin, SimpleTestCase):
+
+    def test_estadisticas_pide_en_paralelo(self):
+        type(self).retardo = 0.3
+        inicio = time.monotonic()
+        response = self.client.get('/Consultas/api/estadisticas-consultas/')
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(time.monotonic() - inicio, 0.8)
+
+    def test_falla_upstream_devuelve_503(self):
+        type(self).fallar = {'/Catalogos/Atletas/'}
+        response = self.client.get('/Consultas/api/estadisticas-consultas/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['error'], 'Error al conectar con los servicios externos')
+
+        response = self.client.post(
+            '/Consultas/generar-reporte-consultas/',
+            {'fecha_inicio': '2024-01-01', 'fecha_fin': '2024-12-31'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['error'], 'No se pudieron obtener los catálogos necesarios')
+
+    def test_genera_pdf(self):
+        response = self.client.post(
+            '/Consultas/generar-reporte-consultas/',
+            {'fecha_inicio': '2020-01-01', 'fecha_fin': '2030-12-31'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        contenido = contenido_de(response)
+        self.assertTrue(contenido.startswith(b'%PDF'))
+        self.assertEqual(int(response['Content-Length']), len(contenido))
+
+    def test_pdf_grande_se_vuelca_a_disco(self):
+        consultas, _, _ = generar_datos(1500, semilla=3)
+        self.datos['/Modulos/Consultas/'] = consultas
+        with override_settings(REPORTES_PDF_SPOOL_MAX_MB=0, REPORTES_PDF_CACHE_MAX_MB=0):
+            response = self.client.post(
+                '/Consultas/generar-reporte-consultas/',
+                {'fecha_inicio': '2020-01-01', 'fecha_fin': '2030-12-31'},
+                content_type='application/json'
+            )
+        self.assertTrue(response.streaming)
+        contenido = contenido_de(response)
+        self.assertTrue(contenido.startswith(b'%PDF'))
+        self.assertEqual(int(response['Content-Length']), len(contenido))
+
+
+    def test_exporta_csv_en_streaming(self):
+        filtros = {'fecha_inicio': '2024-01-01', 'fecha_fin': '2025-06-30', 'profesional_id': '2'}
+        response = self.client.post('/Consultas/exportar-consultas/', filtros, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        filas = list(csv.reader(io.StringIO(contenido_de(response).decode('utf-8-sig'))))
+
+        mixin = ProcesamientoConsultasMixin()
+        catalogos = {
+            'atletas': {str(a['id']): a for a in self.datos['/Catalogos/Atletas/']},
+            'profesionales': {str(p['id']): p for p in self.datos['/Catalogos/Profesionales-Salud/']},
+        }
+        esperadas = mixin._enriquecer_consultas(
+            mixin._filtrar_consultas(self.datos['/Modulos/Consultas/'], filtros, catalogos), catalogos
+        )
+        self.assertEqual(filas[0][0], 'ID')
+        self.assertEqual([fila[0] for fila in filas[1:]], [str(c['id']) for c in esperadas])
+        self.assertEqual([fila[5] for fila in filas[1:]], [c['profesional_nombre'] for c in esperadas])
+
+    def test_exporta_xlsx_por_get(self):
+        response = self.client.get(
+            '/Consultas/exportar-consultas/',
+            {'fecha_inicio': '2020-01-01', 'fecha_fin': '2030-12-31', 'formato': 'xlsx'}
+        )
+        self.assertEqual(response.status_code, 200)
+        libro = zipfile.ZipFile(io.BytesIO(contenido_de(response)))
+        hoja = libro.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertEqual(hoja.count('<row>'), 201)
+
+        response = self.client.get(
+            '/Consultas/exportar-consultas/',
+            {'fecha_inicio': '2020-01-01', 'fecha_fin': '2030-12-31', 'formato': 'ods'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_consultas_en_flujo_mismo_resultado(self):
+        filtros = {'fecha_inicio': '2024-01-01', 'fecha_fin': '2025-06-30', 'atleta_id': '4'}
+        esperado = contenido_de(
+            self.client.post('/Consultas/exportar-consultas/', filtros, content_type='application/json')
+        )
+        with override_settings(REPORTES_CONSULTAS_EN_FLUJO=True, REPORTES_PDF_CACHE_MAX_MB=0):
+            response = self.client.post('/Consultas/exportar-consultas/', filtros, content_type='application/json')
+            self.assertEqual(contenido_de(response), esperado)
+            response = self.client.post('/Consultas/generar-reporte-consultas/', filtros, content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(contenido_de(response).startswith(b'%PDF'))
+
+    def test_consultas_en_flujo_truncadas_devuelven_503(self):
+        filtros = {'fecha_inicio': '2024-01-01', 'fecha_fin': '2025-06-30'}
+        for modo in ('json', 'conexion'):
+            with self.subTest(modo=modo), override_settings(REPORTES_CONSULTAS_EN_FLUJO=True):
+                type(self).truncar = {'/Modulos/Consultas/': modo}
+                response = self.client.post(
+                    '/Consultas/generar-reporte-consultas/', filtros, content_type='application/json'
+                )
+                self.assertEqual(response.status_code, 503)
+                self.assertIn('No se pudieron obtener las consultas', response.json()['error'])
+
+    def test_detecta_filtros_del_backend(self):
+        filtros = {'fecha_inicio': '2024-01-01', 'fecha_fin': '2025-06-30', 'profesional_id': '2'}
+        esperado = contenido_de(
+            self.client.post('/Consultas/exportar-consultas/', filtros, content_type='application/json')
+        )
+        self.assertEqual(capacidades.filtros_aplicados(settings.API_CONSULTAS), frozenset())
+
+        type(self).filtra = True
+        capacidades.olvidar(settings.API_CONSULTAS)
+        response = self.client.post('/Consultas/exportar-consultas/', filtros, content_type='application/json')
+        self.assertEqual(contenido_de(response), esperado)
+        self.assertEqual(capacidades.filtros_aplicados(settings.API_CONSULTAS), frozenset(capacidades.SONDAS))
+
+        # Lo detectado queda en caché: otra petición no vuelve a sondear
+        def sondas():
+            return [ruta for ruta in self.rutas_pedidas if ruta.startswith('/Modulos/Consultas/?') and '&' not in ruta]
+        antes = len(sondas())
+        self.assertEqual(antes, 2 * len(capacidades.SONDAS))
+        response = self.client.post('/Consultas/exportar-consultas/', filtros, content_type='application/json')
+        self.assertEqual(contenido_de(response), esperado)
+        self.assertEqual(len(sondas()), antes)
+
+    def test_sonda_fallida_no_se_repite_en_cada_reporte(self):
+        type(self).fallar = {'/Modulos/Consultas/'}
+        url = settings.API_CONSULTAS
+        self.assertEqual(capacidades.filtros_aplicados(url), frozenset())
+        self.assertEqual(len(self.rutas_pedidas), len(capacidades.SONDAS))
+        self.assertEqual(capacidades.filtros_aplicados(url), frozenset())
+        self.assertEqual(len(self.rutas_pedidas), len(capacidades.SONDAS))
+
+        # Vencido el TTL de fallo se vuelve a sondear
+        capacidades.olvidar(url)
+        type(self).fallar = set()
+        type(self).filtra = True
+        self.assertEqual(capacidades.filtros_aplicados(url), frozenset(capacidades.SONDAS))
+        self.assertEqual(len(self.rutas_pedidas), 2 * len(capacidades.SONDAS))
+
+    def test_backend_que_no_filtra_se_verifica(self):
+        # Detección desactualizada: el backend dejó de aplicar los filtros
+        cache.set(capacidades._clave(settings.API_CONSULTAS), frozenset(capacidades.SONDAS))
+        filtros = {'fecha_inicio': '2024-01-01', 'fecha_fin': '2025-06-30', 'atleta_id': '3'}
+        response = self.client.post('/Consultas/exportar-consultas/', filtros, content_type='application/json')
+        filas = list(csv.reader(io.StringIO(contenido_de(response).decode('utf-8-sig'))))
+        esperadas = ProcesamientoConsultasMixin()._filtrar_consultas(self.datos['/Modulos/Consultas/'], filtros, {})
+        self.assertEqual([fila[0] for fila in filas[1:]], [str(c['id']) for c in esperadas])
+        self.assertIsNone(cache.get(capacidades._clave(settings.API_CONSULTAS)))
+
+    def test_estadisticas_por_ventana(self):
+        hoy = date.today()
+        desde, hasta = hoy - timedelta(days=100), hoy - timedelta(days=10)
+        query = {'desde': desde.isoformat(), 'hasta': hasta.isoformat(), 'granularidad': 'semana', 'profesional_id': '2'}
+        response = self.client.get('/Consultas/api/estadisticas-consultas/', query)
+        self.assertEqual(response.status_code, 200)
+        datos = response.json()
+
+        esperadas = [
+            c for c in self.datos['/Modulos/Consultas/']
+            if desde.isoformat() <= c['fecha'] <= hasta.isoformat()
+            and str(c.get('profesional_salud', c.get('profesional_salud_id'))) == '2'
+        ]
+        self.assertEqual(datos['total_consultas'], len(esperadas))
+        self.assertEqual(sum(c['total'] for c in datos['data']), len(esperadas))
+        self.assertEqual([p['id'] for p in datos['profesionales_data']], ['2'])
+        lunes = desde - timedelta(days=desde.weekday())
+        self.assertEqual(datos['data'][0]['inicio'], lunes.isoformat())
+        self.assertEqual(len(datos['data']), (hasta - lunes).days // 7 + 1)
+        pedidas = [r for r in self.rutas_pedidas if r.startswith('/Modulos/Consultas/')]
+        self.assertEqual(len(pedidas), 1)
+        self.assertIn(f'fecha_inicio={desde.isoformat()}', pedidas[0])
+
+        # Misma ventana: sale de la caché sin volver a pedir consultas
+        self.assertEqual(self.client.get('/Consultas/api/estadisticas-consultas/', query).json(), datos)
+        self.assertEqual(len([r for r in self.rutas_pedidas if r.startswith('/Modulos/Consultas/')]), 1)
+
+    def test_ventana_invalida_devuelve_400(self):
+        for query in ({'granularidad': 'hora'}, {'desde': '2025-02-30'}, {'desde': '2025-03-01', 'hasta': '2025-01-01'}):
+            with self.subTest(query=query):
+                response = self.client.get('/Consultas/api/estadisticas-consultas/', query)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+        self.assertEqual(self.rutas_pedidas, [])
+
+    def test_ventana_extrema_se_rechaza_sin_generar_cubetas(self):
+        for granularidad in ventanas.GRANULARIDADES:
+            for hasta in ('9999-12-30', '9999-12-31'):
+                with self.subTest(granularidad=granularidad, hasta=hasta):
+                    inicio = time.monotonic()
+                    response = self.client.get('/Consultas/api/estadisticas-consultas/', {
+                        'desde': '0001-01-01', 'hasta': hasta, 'granularidad': granularidad
+                    })
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('cubetas', response.json()['error'])
+                    self.assertLess(time.monotonic() - inicio, 0.5)
+
+        # Ventana corta al final del calendario: la última cubeta no desborda
+        for granularidad in ventanas.GRANULARIDADES:
+            ventana = ventanas.Ventana(date(9999, 10, 1), date(9999, 12, 31), granularidad)
+            with self.subTest(granularidad=granularidad):
+                self.assertEqual(
+                    len(ventana.cubetas()), ventanas.contar_cubetas(ventana.desde, ventana.hasta, granularidad)
+                )
+
+
+@override_settings(METRICAS_DIR='')
+class MotorPDFRapidoTests(SimpleTestCase):
+
+    def _enriquecidas(self, n_filas, n_profesionales=8):
+        consultas, profesionales, atletas = generar_datos(n_filas, n_profesionales=n_profesionales, semilla=5)
+        catalogos = {
+            'atletas': {str(a['id']): a for a in atletas},
+            'profesionales': {str(p['id']): p for p in profesionales},
+        }
+        return ProcesamientoConsultasMixin()._enriquecer_consultas(consultas, catalogos)
+
+    def _pdf(self, n_filas, n_profesionales=8, **filtros):
+        filtros = dict({'fecha_inicio': '2020-01-01', 'fecha_fin': '2030-12-31'}, **filtros)
+        consultas = self._enriquecidas(n_filas, n_profesionales)
+        with ProcesamientoConsultasMixin()._generar_pdf(consultas, filtros) as archivo:
+            return archivo.read()
+
+    def test_resumen_con_muchos_profesionales_se_parte_entre_paginas(self):
+        # Antes todos iban en una sola celda más alta que la página (LayoutError)
+        for motor in ('platypus', 'rapido'):
+            with self.subTest(motor=motor):
+                self.assertEqual(self._pdf(400, n_profesionales=120, motor_pdf=motor)[:4], b'%PDF')
+
+    def test_parte_en_paginas_con_encabezado(self):
+        tabla = TablaDetalleRapida.desde_consultas(self._enriquecidas(300))
+        partes = []
+        while tabla.height > 700:
+            primera, tabla = tabla.split(tabla.width, 700)
+            partes.append(primera)
+        partes.append(tabla)
+        self.assertGreater(len(partes), 3)
+        self.assertTrue(all(parte.height <= 700 for parte in partes))
+        self.assertEqual(sum(parte.fin - parte.inicio for parte in partes), 300)
+        self.assertTrue(all(parte.height > TablaDetalleRapida.ALTO_ENCABEZADO for parte in partes))
+
+        contenido = self._pdf(300, motor_pdf='rapido')
+        paginas = len(re.findall(rb'/Type\s*/Page\b(?!s)', contenido))
+        self.assertGreaterEqual(paginas, len(partes))
+
+    def test_elige_motor_por_cantidad_de_filas(self):
+        mixin = ProcesamientoConsultasMixin()
+        with override_settings(REPORTES_PDF_FILAS_MOTOR_RAPIDO=100):
+            self.assertEqual(mixin._motor_pdf({}, 99), 'platypus')
+            self.assertEqual(mixin._motor_pdf({}, 100), 'rapido')
+            self.assertEqual(mixin._motor_pdf({'motor_pdf': 'platypus'}, 5000), 'platypus')
+            self.assertEqual(self._pdf(150)[:4], b'%PDF')
+
+
+class CachePDFTests(BackendFalsoMixin, SimpleTestCase):
+
+    def _reporte(self, **filtros):
+        filtros = dict({'fecha_inicio': '2020-01-01', 'fecha_fin': '2030-12-31'}, **filtros)
+        response = self.client.post('/Consultas/generar-reporte-consultas/', filtros, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return contenido_de(response)
+
+    def test_reutiliza_pdf_mientras_no_cambien_los_datos(self):
+        antes = cache_pdf.estadisticas()
+        primero = self._reporte(atleta_id='todos')
+        self.assertEqual(self._reporte(atleta_id=''), primero)
+        despues = cache_pdf.estadisticas()
+        self.assertEqual(despues['aciertos'] - antes['aciertos'], 1)
+        self.assertEqual(despues['guardados'] - antes['guardados'], 1)
+
+        # Cambiar un ajuste que altera el documento no reutiliza el PDF anterior
+        with override_settings(REPORTES_PDF_COMPRIMIR=False):
+            self.assertNotEqual(self._reporte(), primero)
+        with override_settings(REPORTES_PDF_FILAS_MOTOR_RAPIDO=1):
+            self.assertNotEqual(self._reporte(), primero)
+        self.assertEqual(cache_pdf.estadisticas()['guardados'] - antes['guardados'], 3)
+
+        self.datos['/Modulos/Consultas/'] = self.datos['/Modulos/Consultas/'][:20]
+        self._reporte()
+        self.assertEqual(cache_pdf.estadisticas()['guardados'] - antes['guardados'], 4)
+
+    def _en_cache(self, clave_pdf):
+        archivo = cache_pdf.abrir(clave_pdf)
+        if archivo is None:
+            return False
+        archivo.close()
+        return True
+
+    def test_desaloja_los_menos_usados(self):
+        bloque = b'x' * (400 * 1024)
+        with override_settings(REPORTES_PDF_CACHE_MAX_MB=1):
+            for nombre in ('a', 'b'):
+                cache_pdf.guardar(nombre, io.BytesIO(bloque))
+                time.sleep(0.01)
+            self.assertTrue(self._en_cache('a'))
+            time.sleep(0.01)
+            cache_pdf.guardar('c', io.BytesIO(bloque))
+            self.assertFalse(self._en_cache('b'))
+            self.assertTrue(self._en_cache('a'))
+            self.assertTrue(self._en_cache('c'))
+
+
+class VistasAsyncTests(BackendFalsoMixin, SimpleTestCase):
+
+    async def test_estadisticas_async_igual_a_sync(self):
+        esperado = calcular_estadisticas(
+            self.datos['/Modulos/Consultas/'],
+            self.datos['/Catalogos/Profesionales-Salud/'],
+            self.datos['/Catalogos/Atletas/']
+        )
+        request = RequestFactory().get('/Consultas/api/estadisticas-consultas/')
+        response = await EstadisticasConsultasAsyncView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), esperado)
+
+    async def test_filtros_async_503(self):
+        type(self).fallar = {'/Catalogos/Profesionales-Salud/'}
+        request = RequestFactory().get('/Consultas/api/filtros-consulta/')
+        response = await FiltrosConsultaAsyncView.as_view()(request)
+        self.assertEqual(response.status_code, 503)
+
+
+class CacheCatalogosTests(BackendFalsoMixin, SimpleTestCase):
+
+    def _pedidas(self, ruta):
+        return sum(1 for p in self.rutas_pedidas if p.startswith(ruta))
+
+    def test_reutiliza_catalogos_hasta_invalidar(self):
+        primero = obtener_catalogos()
+        self.assertEqual(primero['atletas']['1'], self.datos['/Catalogos/Atletas/'][0])
+        self.assertIs(obtener_catalogos(), primero)
+        self.assertEqual(self._pedidas('/Catalogos/Atletas/'), 1)
+
+        invalidar_catalogos()
+        obtener_catalogos()
+        self.assertEqual(self._pedidas('/Catalogos/Atletas/'), 2)
+
+    def test_sirve_copia_vencida_y_refresca_en_segundo_plano(self):
+        with override_settings(CATALOGOS_CACHE_TTL=0):
+            obtener_catalogos()
+            time.sleep(0.01)
+            obtener_catalogos()
+            for _ in range(50):
+                if self._pedidas('/Catalogos/Atletas/') == 2:
+                    break
+                time.sleep(0.02)
+        self.assertEqual(self._pedidas('/Catalogos/Atletas/'), 2)
+
+    def test_comando_rechaza_cache_local(self):
+        obtener_catalogos()
+        with self.assertRaises(CommandError):
+            call_command('invalidar_catalogos')
+        obtener_catalogos()
+        self.assertEqual(self._pedidas('/Catalogos/Atletas/'), 1)
+
+
+class CacheRespuestasTests(BackendFalsoMixin, SimpleTestCase):
+
+    def _pedidas(self, ruta):
+        return sum(1 for p in self.rutas_pedidas if p.startswith(ruta))
+
+    def test_reutiliza_la_respuesta_y_refresca_la_vencida(self):
+        url = '/Consultas/api/estadisticas-consultas/'
+        primera = self.client.get(url).json()
+        self.assertEqual(self.client.get(url).json(), primera)
+        self.assertEqual(self._pedidas('/Modulos/Consultas/'), 1)
+
+        # Vencida: se sirve la copia anterior y se recalcula en segundo plano
+        clave = respuestas.clave('estadisticas', QueryDict())
+        entrada = cache.get(clave)
+        entrada['version']['generado'] -= settings.RESPUESTAS_ESTADISTICAS_TTL + 1
+        cache.set_many({clave: entrada, clave + ':version': entrada['version']})
+        nueva = {'id': 999, 'fecha': date.today().isoformat(), 'atleta': 1, 'profesional_salud': 1}
+        self.datos['/Modulos/Consultas/'] = self.datos['/Modulos/Consultas/'] + [nueva]
+        self.assertEqual(self.client.get(url).json(), primera)
+        for _ in range(50):
+            if cache.get(clave)['datos']['total_consultas'] == 201:
+                break
+            time.sleep(0.02)
+        self.assertEqual(self.client.get(url).json()['total_consultas'], 201)
+
+    def test_fallos_concurrentes_calculan_una_vez(self):
+        llamadas = []
+
+        def calcular():
+            llamadas.append(1)
+            time.sleep(0.2)
+            return {'n': len(llamadas)}
+
+        resultados = []
+        hilos = [
+            threading.Thread(target=lambda: resultados.append(respuestas.obtener('filtros', QueryDict(), calcular)))
+            for _ in range(5)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(len(llamadas), 1)
+        self.assertEqual([r['datos'] for r in resultados], [{'n': 1}] * 5)
+
+    def test_si_falla_quien_calcula_los_demas_no_agotan_la_espera(self):
+        def en_hilo(calcular):
+            return respuestas.obtener('filtros', QueryDict(), calcular)
+
+        def en_hilo_async(calcular):
+            async def calcular_async():
+                return calcular()
+            return asyncio.run(respuestas.obtener_async('filtros', QueryDict(), calcular_async, calcular))
+
+        for obtener in (en_hilo, en_hilo_async):
+            with self.subTest(obtener=obtener.__name__):
+                cache.clear()
+                llamadas = []
+
+                def calcular():
+                    llamadas.append(1)
+                    if len(llamadas) == 1:
+                        time.sleep(0.2)
+                        raise RuntimeError('upstream caído')
+                    return {'n': len(llamadas)}
+
+                resultados, errores = [], []
+
+                def pedir():
+                    try:
+                        resultados.append(obtener(calcular))
+                    except RuntimeError as e:
+                        errores.append(e)
+
+                hilos = [threading.Thread(target=pedir) for _ in range(5)]
+                inicio = time.monotonic()
+                hilos[0].start()
+                time.sleep(0.05)
+                for hilo in hilos[1:]:
+                    hilo.start()
+                for hilo in hilos:
+                    hilo.join()
+                self.assertLess(time.monotonic() - inicio, settings.RESPUESTAS_ESPERA / 2)
+                self.assertEqual(len(errores), 1)
+                self.assertEqual(len(resultados), 4)
+
+    def test_responde_304_si_no_cambio(self):
+        for url in ('/Consultas/api/estadisticas-consultas/', '/Consultas/api/filtros-consulta/'):
+            with self.subTest(url=url):
+                primera = self.client.get(url)
+                etag, modificado = primera['ETag'], primera['Last-Modified']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=modificado).status_code, 304)
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"otro"').status_code, 200)
+
+                # Recalcular los mismos datos conserva el ETag
+                cache.clear()
+                self.assertEqual(self.client.get(url)['ETag'], etag)
+
+        with override_settings(RESPUESTAS_ESTADISTICAS_TTL=0):
+            url = '/Consultas/api/estadisticas-consultas/'
+            etag = self.client.get(url)['ETag']
+            self.datos['/Modulos/Consultas/'] = self.datos['/Modulos/Consultas/'][:10]
+            cache.clear()
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CompresionTests(BackendFalsoMixin, SimpleTestCase):
+
+    def test_elige_codificacion_segun_accept_encoding(self):
+        self.assertEqual(compresion.elegir_codificacion(''), None)
+        self.assertEqual(compresion.elegir_codificacion('gzip, deflate'), 'gzip')
+        self.assertEqual(compresion.elegir_codificacion('gzip;q=0, identity'), None)
+        self.assertEqual(compresion.elegir_codificacion('br;q=0.5, gzip;q=0.8'), 'gzip')
+        esperada = 'br' if compresion.brotli is not None else 'gzip'
+        self.assertEqual(compresion.elegir_codificacion('gzip, deflate, br'), esperada)
+        self.assertEqual(compresion.elegir_codificacion('*'), esperada)
+
+    def test_comprime_json_con_gzip(self):
+        url = '/Consultas/api/estadisticas-consultas/'
+        plano = self.client.get(url)
+        self.assertFalse(plano.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plano['Vary'])
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertLess(len(response.content), len(plano.content))
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(zlib.decompress(response.content, 16 + zlib.MAX_WBITS), plano.content)
+
+        # El ETag pasa a débil y sigue validando el GET condicional
+        self.assertEqual(response['ETag'], 'W/' + plano['ETag'])
+        condicional = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(condicional.status_code, 304)
+
+    @skipUnless(compresion.brotli is not None, "brotli no está instalado")
+    def test_comprime_json_con_brotli(self):
+        url = '/Consultas/api/filtros-consulta/'
+        plano = self.client.get(url)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compresion.brotli.decompress(response.content), plano.content)
+
+    def test_no_comprime_html_por_defecto(self):
+        # La API navegable lleva el token CSRF: comprimirla la expondría a BREACH
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        html = HttpResponse('<p>consulta</p>' * 1000, content_type='text/html; charset=utf-8')
+        response = compresion.CompresionMiddleware(lambda request: html)(request)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        api = HttpResponse(b'{"a": 1}' * 1000, content_type='application/json')
+        response = compresion.CompresionMiddleware(lambda request: api)(request)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_no_comprime_respuestas_chicas(self):
+        with override_settings(COMPRESION_MINIMO=10 ** 7):
+            response = self.client.get('/Consultas/api/filtros-consulta/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_comprime_exportacion_en_flujo(self):
+        filtros = {'fecha_inicio': '2020-01-01', 'fecha_fin': '2030-12-31'}
+        plano = contenido_de(
+            self.client.post('/Consultas/exportar-consultas/', filtros, content_type='application/json')
+        )
+        response = self.client.post(
+            '/Consultas/exportar-consultas/', filtros, content_type='application/json', HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(zlib.decompress(contenido_de(response), 16 + zlib.MAX_WBITS), plano)
+
+        # El XLSX ya viene comprimido
+        filtros['formato'] = 'xlsx'
+        response = self.client.post(
+            '/Consultas/exportar-consultas/', filtros, content_type='application/json', HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertFalse(response.has_header('Content-Encoding'))
+        contenido_de(response)
+
+
+class MetricasTests(BackendFalsoMixin, SimpleTestCase):
+
+    def test_server_timing_por_etapa(self):
+        response = self.client.get('/Consultas/api/estadisticas-consultas/')
+        tiempos = response['Server-Timing']
+        self.assertIn('upstream;desc="/Modulos/Consultas/"', tiempos)
+        for nombre in ('acumular', 'construir', 'total'):
+            self.assertRegex(tiempos, nombre + r';dur=\d+\.\d')
+
+        response = self.client.post(
+            '/Consultas/generar-reporte-consultas/',
+            {'fecha_inicio': '2020-01-01', 'fecha_fin': '2030-12-31'},
+            content_type='application/json'
+        )
+        contenido_de(response)
+        for nombre in ('datos', 'filtrar', 'enriquecer', 'pdf_build', 'pdf'):
+            self.assertIn(nombre + ';dur=', response['Server-Timing'])
+
+    def test_exporta_histogramas(self):
+        self.client.get('/Consultas/api/filtros-consulta/')
+        texto = self.client.get('/Consultas/metricas/').content.decode()
+        self.assertIn('# TYPE reportes_etapa_segundos histogram', texto)
+        self.assertIn('reportes_etapa_filas_bucket{etapa="opciones",le="+Inf"}', texto)
+        self.assertIn('reportes_upstream_segundos_count{ruta="/Catalogos/Atletas/",estado="200"}', texto)
+        self.assertIn('reportes_peticion_segundos_count{vista="filtros-consulta",metodo="GET",estado="200"}', texto)
+
+    def test_exporta_contadores_de_conexiones_revalidacion_y_cache_pdf(self):
+        url = '/Consultas/api/estadisticas-consultas/'
+        self.client.get(url)
+        cache.clear()
+        self.client.get(url)
+        texto = self.client.get('/Consultas/metricas/').content.decode()
+        self.assertIn('# TYPE reportes_upstream_revalidacion_total counter', texto)
+        revalidadas = upstream.estadisticas_revalidacion()['revalidadas_304']
+        self.assertGreater(revalidadas, 0)
+        self.assertIn(f'reportes_upstream_revalidacion_total{{resultado="revalidadas_304"}} {revalidadas}\n', texto)
+        nuevas = upstream.estadisticas_conexiones()['conexiones_nuevas']
+        self.assertIn(f'reportes_upstream_conexiones_total{{conexion="nueva"}} {nuevas}\n', texto)
+        self.assertIn('reportes_cache_pdf_total{evento="aciertos"}', texto)
+
+    def test_suma_los_archivos_de_otros_workers(self):
+        self.client.get('/Consultas/api/filtros-consulta/')
+        serie = 'reportes_etapa_segundos_count{etapa="opciones"}'
+        propio = int(re.search(re.escape(serie) + r' (\d+)', metricas.exportar()).group(1))
+        metricas.volcar()
+        archivo = metricas._archivo()
+        archivo.with_name('1.json').write_bytes(archivo.read_bytes())
+        self.assertIn(f'{serie} {propio * 2}\n', metricas.exportar())
+
+    def test_archivo_por_proceso_y_limpieza_al_arrancar(self):
+        self.client.get('/Consultas/api/filtros-consulta/')
+        metricas.volcar()
+        archivo = metricas._archivo()
+        # Un pid reutilizado por otro worker no pisa este archivo
+        self.assertRegex(archivo.name, r'^%d-\d+\.json$' % os.getpid())
+        self.assertTrue(archivo.exists())
+        call_command('limpiar_metricas', stdout=io.StringIO())
+        self.assertEqual(list(archivo.parent.glob('*.json')), [])
+
+
+class SegmentosTests(BackendFalsoMixin, SimpleTestCase):
+
+    def _esperado(self, hoy):
+        return calcular_estadisticas(
+            self.datos['/Modulos/Consultas/'],
+            self.datos['/Catalogos/Profesionales-Salud/'],
+            self.datos['/Catalogos/Atletas/'],
+            hoy=hoy
+        )
+
+    def _calcular(self, hoy):
+        return construir_respuesta(
+            obtener_acumulador(hoy),
+            self.datos['/Catalogos/Profesionales-Salud/'],
+            self.datos['/Catalogos/Atletas/'],
+            hoy
+        )
+
+    def test_solo_pide_meses_recientes_una_vez_cerrada_la_historia(self):
+        hoy = datetime.now()
+        self.assertEqual(self._calcular(hoy), self._esperado(hoy))
+        self.assertEqual(self.rutas_pedidas, ['/Modulos/Consultas/'])
+
+        self.assertEqual(self._calcular(hoy), self._esperado(hoy))
+        inicio = '%04d-%02d-01' % ((hoy.year, hoy.month - 1) if hoy.month > 1 else (hoy.year - 1, 12))
+        self.assertEqual(
+            self.rutas_pedidas[-1], f'/Modulos/Consultas/?fecha_inicio={inicio}&fecha_fin=9999-12-31'
+        )
+
+    def test_cambio_de_mes_cierra_el_mes_saliente(self):
+        self._calcular(datetime(2025, 5, 20))
+        hoy = datetime(2025, 7, 3)
+        self.assertEqual(self._calcular(hoy), self._esperado(hoy))
+        self.assertTrue(self.rutas_pedidas[-1].endswith('fecha_inicio=2025-04-01&fecha_fin=9999-12-31'))
+
+    def test_segmento_desalojado_recarga_la_historia(self):
+        hoy = datetime(2025, 7, 3)
+        self._calcular(hoy)
+        cache.delete('reportes:segmentos:v2:2025-01')
+        self.assertEqual(self._calcular(hoy), self._esperado(hoy))
+        self.assertEqual(self.rutas_pedidas[-1], '/Modulos/Consultas/')
+        self.assertIsNotNone(cache.get('reportes:segmentos:v2:2025-01'))
+
+        # El índice reconstruido vuelve a servir solo los meses recientes
+        self.assertEqual(self._calcular(hoy), self._esperado(hoy))
+        self.assertTrue(self.rutas_pedidas[-1].endswith('fecha_inicio=2025-06-01&fecha_fin=9999-12-31'))
+
+    @skipUnless(estadisticas_columnar.disponible(), "numpy no está instalado")
+    @override_settings(ESTADISTICAS_MOTOR='numpy')
+    def test_segmentos_con_motor_numpy(self):
+        hoy = datetime(2025, 7, 3)
+        self.assertEqual(self._calcular(hoy), self._esperado(hoy))
+
+
+class EspejoTests(BackendFalsoMixin, TestCase):
+
+    def test_sincroniza_incremental_desde_la_marca_de_agua(self):
+        resultado = espejo.sincronizar()
+        self.assertEqual(resultado['consultas'], 200)
+        self.assertEqual(self.rutas_pedidas[-1], '/Modulos/Consultas/')
+
+        consultas = self.datos['/Modulos/Consultas/']
+        nueva = dict(consultas[0], id=201, fecha=resultado['marca_agua'].isoformat())
+        consultas.append(nueva)
+        resultado = espejo.sincronizar_consultas()
+        desde = resultado['marca_agua'] - timedelta(days=3)
+        self.assertEqual(self.rutas_pedidas[-1], f'/Modulos/Consultas/?fecha_inicio={desde.isoformat()}')
+        self.assertEqual(espejo.acumulador().total, 201)
+
+    def test_fecha_futura_no_adelanta_la_marca_de_agua(self):
+        consultas = self.datos['/Modulos/Consultas/']
+        consultas.append(dict(consultas[0], id=201, fecha='2099-01-01'))
+        resultado = espejo.sincronizar()
+        self.assertLessEqual(resultado['marca_agua'], date.today())
+
+        consultas.append(dict(consultas[0], id=202, fecha=date.today().isoformat()))
+        espejo.sincronizar_consultas()
+        self.assertEqual(espejo.acumulador().total, 202)
+
+    def test_conteos_incrementales_iguales_a_reconstruir(self):
+        espejo.sincronizar()
+        self.assertEqual(conteos.verificar(), [])
+
+        consultas = self.datos['/Modulos/Consultas/']
+        reciente = max(consultas, key=lambda c: c['fecha'])
+        reciente['diagnostico'] = 'Diagnóstico nuevo'
+        reciente['profesional_salud_id'] = '99'
+        reciente.pop('profesional_salud', None)
+        consultas.append(dict(reciente, id=201, atleta_id='77'))
+        espejo.sincronizar_consultas()
+
+        self.assertEqual(conteos.verificar(), [])
+        self.assertEqual(conteos.leer().diagnosticos['Diagnóstico nuevo'], 2)
+        self.assertEqual(espejo.acumulador().total, 201)
+
+    def test_estadisticas_y_filtros_iguales_a_la_api(self):
+        espejo.sincronizar()
+        hoy = datetime.now()
+        esperado = calcular_estadisticas(
+            self.datos['/Modulos/Consultas/'],
+            self.datos['/Catalogos/Profesionales-Salud/'],
+            self.datos['/Catalogos/Atletas/'],
+            hoy=hoy
+        )
+        catalogos = espejo.catalogos()
+        obtenido = construir_respuesta(
+            espejo.acumulador(), catalogos['profesionales'].values(), catalogos['atletas'].values(), hoy
+        )
+        self.assertEqual(obtenido['monthly_data'], esperado['monthly_data'])
+        self.assertEqual(obtenido['monthly_data_by_profesional'], esperado['monthly_data_by_profesional'])
+        self.assertEqual(obtenido['top_diagnosticos'], esperado['top_diagnosticos'])
+        self.assertEqual(obtenido['total_consultas'], esperado['total_consultas'])
+
+        filtros = {'fecha_inicio': '2024-01-01', 'fecha_fin': '2025-06-30', 'atleta_id': '3'}
+        self.assertEqual(
+            espejo.consultas_filtradas(filtros),
+            ProcesamientoConsultasMixin()._filtrar_consultas(self.datos['/Modulos/Consultas/'], filtros, catalogos)
+        )
+
+    def test_vistas_leen_del_espejo(self):
+        espejo.sincronizar()
+        type(self).fallar = {'/Modulos/Consultas/', '/Catalogos/Atletas/', '/Catalogos/Profesionales-Salud/'}
+        with override_settings(REPORTES_FUENTE_DATOS='espejo'):
+            response = self.client.get('/Consultas/api/estadisticas-consultas/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['total_consultas'], 200)
+            response = self.client.post(
+                '/Consultas/generar-reporte-consultas/',
+                {'fecha_inicio': '2020-01-01', 'fecha_fin': '2030-12-31'},
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(contenido_de(response).startswith(b'%PDF'))
+
+
+    def test_exportacion_lee_del_espejo(self):
+        espejo.sincronizar()
+        type(self).fallar = {'/Modulos/Consultas/', '/Catalogos/Atletas/', '/Catalogos/Profesionales-Salud/'}
+        filtros = {'fecha_inicio': '2024-01-01', 'fecha_fin': '2025-06-30', 'atleta_id': '3'}
+        with override_settings(REPORTES_FUENTE_DATOS='espejo'):
+            response = self.client.post('/Consultas/exportar-consultas/', filtros, content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            filas = list(csv.reader(io.StringIO(contenido_de(response).decode('utf-8-sig'))))
+        self.assertEqual(
+            [fila[0] for fila in filas[1:]],
+            [str(c['id']) for c in espejo.consultas_filtradas(filtros)]
+        )
+
+class TrabajosReporteTests(BackendFalsoMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(REPORTES_TRABAJOS_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def test_encola_procesa_y_descarga(self):
+        response = self.client.post(
+            '/Consultas/generar-reporte-consultas/',
+            {'fecha_inicio': '2020-01-01', 'fecha_fin': '2030-12-31', 'modo': 'trabajo'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 202)
+        trabajo = response.json()
+        self.assertEqual(trabajo['estado'], 'pendiente')
+        self.assertEqual(self.rutas_pedidas, [])
+
+        descarga = '/Consultas/reportes/trabajos/%s/descargar/' % trabajo['trabajo_id']
+        self.assertEqual(self.client.get(descarga).status_code, 409)
+
+        procesado = trabajos.procesar_siguiente(GeneradorReporteConsultas().generar)
+        self.assertEqual(str(procesado.pk), trabajo['trabajo_id'])
+        self.assertIsNone(trabajos.procesar_siguiente(GeneradorReporteConsultas().generar))
+
+        estado = self.client.get(trabajo['url_estado']).json()
+        self.assertEqual((estado['estado'], estado['progreso']), ('terminado', 100))
+        response = self.client.get(descarga)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(contenido_de(response).startswith(b'%PDF'))
+        self.assertIn('reporte_consultas_2020-01-01_2030-12-31.pdf', response['Content-Disposition'])
+
+    def test_reintenta_fallas_de_red(self):
+        type(self).fallar = {'/Modulos/Consultas/'}
+        trabajo = trabajos.encolar({'fecha_inicio': '2024-01-01', 'fecha_fin': '2024-12-31'})
+        generar = GeneradorReporteConsultas().generar
+        trabajos.procesar_siguiente(generar)
+        # El reintento espera: no se vuelve a tomar enseguida
+        self.assertIsNone(trabajos.procesar_siguiente(generar))
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.intentos), ('pendiente', 1))
+
+        with override_settings(REPORTES_TRABAJOS_ESPERA=0):
+            TrabajoReporte.objects.filter(pk=trabajo.pk).update(disponible_desde=None)
+            for _ in range(2):
+                trabajos.procesar_siguiente(generar)
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.intentos), ('error', 3))
+
+    def test_trabajo_abandonado_sin_intentos_pasa_a_error(self):
+        trabajo = trabajos.encolar({'fecha_inicio': '2024-01-01', 'fecha_fin': '2024-12-31'})
+        hace_rato = timezone.now() - timedelta(seconds=settings.REPORTES_TRABAJOS_TIMEOUT + 1)
+        TrabajoReporte.objects.filter(pk=trabajo.pk).update(
+            estado=TrabajoReporte.PROCESANDO, iniciado_el=hace_rato, intentos=2
+        )
+        # Le queda un intento: se recupera
+        self.assertEqual(trabajos.tomar_siguiente().pk, trabajo.pk)
+
+        TrabajoReporte.objects.filter(pk=trabajo.pk).update(iniciado_el=hace_rato)
+        self.assertIsNone(trabajos.tomar_siguiente())
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.intentos), ('error', 3))
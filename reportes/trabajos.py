@@ -0,0 +1,181 @@
+"""
+Cola de reportes PDF respaldada por la base de datos.
+
+La vista encola el trabajo y responde de inmediato; un proceso aparte
+(`python manage.py procesar_reportes`) toma los trabajos pendientes, genera
+el PDF y lo deja en `REPORTES_TRABAJOS_DIR` para el endpoint de descarga.
+"""
+import logging
+import os
+import shutil
+from datetime import timedelta
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import TrabajoReporte
+
+logger = logging.getLogger(__name__)
+
+
+def _directorio():
+    directorio = Path(settings.REPORTES_TRABAJOS_DIR)
+    directorio.mkdir(parents=True, exist_ok=True)
+    return directorio
+
+
+def encolar(filtros):
+    """
+    Registra un trabajo pendiente con los filtros del reporte.
+    """
+    trabajo = TrabajoReporte.objects.create(filtros=filtros)
+    logger.info("Reporte encolado %s con filtros: %s", trabajo.pk, filtros)
+    return trabajo
+
+
+def descripcion(trabajo, request=None):
+    """
+    Cuerpo JSON con el estado del trabajo y las URLs para consultarlo.
+    """
+    url_estado = reverse('estado-trabajo-reporte', args=[trabajo.pk])
+    url_descarga = reverse('descargar-trabajo-reporte', args=[trabajo.pk])
+    if request is not None:
+        url_estado = request.build_absolute_uri(url_estado)
+        url_descarga = request.build_absolute_uri(url_descarga)
+    return {
+        'trabajo_id': str(trabajo.pk),
+        'estado': trabajo.estado,
+        'progreso': trabajo.progreso,
+        'mensaje': trabajo.mensaje,
+        'creado_el': trabajo.creado_el.isoformat(),
+        'terminado_el': trabajo.terminado_el.isoformat() if trabajo.terminado_el else None,
+        'url_estado': url_estado,
+        'url_descarga': url_descarga if trabajo.estado == TrabajoReporte.TERMINADO else None,
+    }
+
+
+def tomar_siguiente():
+    """
+    Reserva el trabajo pendiente más antiguo para este worker, salvo los que
+    esperan su próximo reintento.
+
+    También recupera los que quedaron en proceso más de
+    `REPORTES_TRABAJOS_TIMEOUT` segundos (su worker murió a medias) si les
+    quedan intentos; los que ya agotaron `REPORTES_TRABAJOS_INTENTOS` (por
+    ejemplo, porque tiran abajo al worker cada vez) pasan a error.
+    """
+    ahora = timezone.now()
+    abandonado = ahora - timedelta(seconds=settings.REPORTES_TRABAJOS_TIMEOUT)
+    agotados = TrabajoReporte.objects.filter(
+        estado=TrabajoReporte.PROCESANDO,
+        iniciado_el__lt=abandonado,
+        intentos__gte=settings.REPORTES_TRABAJOS_INTENTOS,
+    ).update(
+        estado=TrabajoReporte.ERROR,
+        mensaje='El trabajo quedó abandonado en cada uno de sus intentos',
+    )
+    if agotados:
+        logger.error("%d trabajos de reporte abandonados sin intentos restantes pasaron a error", agotados)
+
+    with transaction.atomic():
+        trabajo = (
+            TrabajoReporte.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(estado=TrabajoReporte.PENDIENTE)
+                & (Q(disponible_desde__isnull=True) | Q(disponible_desde__lte=ahora))
+                | Q(
+                    estado=TrabajoReporte.PROCESANDO,
+                    iniciado_el__lt=abandonado,
+                    intentos__lt=settings.REPORTES_TRABAJOS_INTENTOS,
+                )
+            )
+            .order_by('creado_el')
+            .first()
+        )
+        if trabajo is None:
+            return None
+        trabajo.estado = TrabajoReporte.PROCESANDO
+        trabajo.progreso = 0
+        trabajo.intentos += 1
+        trabajo.iniciado_el = timezone.now()
+        trabajo.save(update_fields=['estado', 'progreso', 'intentos', 'iniciado_el'])
+    return trabajo
+
+
+def _avance(trabajo):
+    def avance(progreso):
+        TrabajoReporte.objects.filter(pk=trabajo.pk).update(progreso=progreso)
+    return avance
+
+
+def ejecutar(trabajo, generar):
+    """
+    Genera el PDF de un trabajo reservado con `generar(filtros, avance)`,
+    que devuelve el documento como archivo abierto.
+
+    Las fallas de red se reintentan hasta `REPORTES_TRABAJOS_INTENTOS` veces,
+    tras una espera que parte de `REPORTES_TRABAJOS_ESPERA` segundos y se
+    duplica en cada intento; cualquier otra falla deja el trabajo en error.
+    """
+    try:
+        ruta = _directorio() / f"{trabajo.pk}.pdf"
+        temporal = ruta.with_suffix('.tmp')
+        with generar(trabajo.filtros, _avance(trabajo)) as pdf_archivo, open(temporal, 'wb') as destino:
+            shutil.copyfileobj(pdf_archivo, destino)
+        os.replace(temporal, ruta)
+    except Exception as e:
+        reintentar = (
+            isinstance(e, requests.exceptions.RequestException)
+            and trabajo.intentos < settings.REPORTES_TRABAJOS_INTENTOS
+        )
+        logger.error("Error al generar el reporte %s: %s", trabajo.pk, str(e), exc_info=not reintentar)
+        trabajo.estado = TrabajoReporte.PENDIENTE if reintentar else TrabajoReporte.ERROR
+        trabajo.mensaje = str(e)
+        if reintentar:
+            espera = settings.REPORTES_TRABAJOS_ESPERA * 2 ** (trabajo.intentos - 1)
+            trabajo.disponible_desde = timezone.now() + timedelta(seconds=espera)
+        trabajo.save(update_fields=['estado', 'mensaje', 'disponible_desde'])
+        return trabajo
+
+    trabajo.estado = TrabajoReporte.TERMINADO
+    trabajo.progreso = 100
+    trabajo.mensaje = ''
+    trabajo.archivo = str(ruta)
+    trabajo.terminado_el = timezone.now()
+    trabajo.save(update_fields=['estado', 'progreso', 'mensaje', 'archivo', 'terminado_el'])
+    logger.info("Reporte %s generado en %s", trabajo.pk, ruta)
+    return trabajo
+
+
+def procesar_siguiente(generar):
+    """
+    Toma y ejecuta un trabajo; devuelve None si no había pendientes.
+    """
+    trabajo = tomar_siguiente()
+    if trabajo is None:
+        return None
+    return ejecutar(trabajo, generar)
+
+
+def limpiar():
+    """
+    Elimina los trabajos terminados o fallidos (y sus PDFs) más antiguos que
+    `REPORTES_TRABAJOS_RETENCION` segundos.
+    """
+    limite = timezone.now() - timedelta(seconds=settings.REPORTES_TRABAJOS_RETENCION)
+    vencidos = TrabajoReporte.objects.filter(
+        estado__in=[TrabajoReporte.TERMINADO, TrabajoReporte.ERROR],
+        creado_el__lt=limite
+    )
+    for archivo in vencidos.exclude(archivo='').values_list('archivo', flat=True):
+        try:
+            os.remove(archivo)
+        except FileNotFoundError:
+            pass
+    return vencidos.delete()[0]
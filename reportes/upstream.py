@@ -0,0 +1,389 @@
+"""
+Cliente HTTP compartido para consumir el backend principal.
+
+Mantiene una sesión de `requests` por proceso con pool de conexiones
+keep-alive y política de reintentos configurables desde settings, y lleva la
+cuenta de cuántas peticiones reutilizaron una conexión ya abierta.
+
+También guarda los validadores (`ETag`/`Last-Modified`) de cada respuesta
+junto con su cuerpo ya parseado, y revalida con peticiones condicionales: ante
+un 304 devuelve el cuerpo guardado sin descargarlo ni parsearlo de nuevo. Solo
+se guardan cuerpos de hasta `UPSTREAM_VALIDADORES_MAX_BYTES`: uno parseado
+ocupa varias veces su tamaño en memoria, en cada worker. Los cuerpos guardados
+se comparten entre llamadas, así que no deben modificarse.
+
+`abrir_json_en_flujo` es la alternativa para cuerpos grandes: no guarda nada
+y entrega los elementos del arreglo a medida que se descargan.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from . import codec_json, metricas
+from .flujo_json import iterar_arreglo
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_sesion = None
+_sesion_pid = None
+_executor = None
+_executor_pid = None
+_contadores = {
+    'peticiones': 0,
+    'conexiones_nuevas': 0,
+    'sin_validadores': 0,
+    'revalidadas_304': 0,
+    'modificadas': 0,
+}
+# (url, params) -> {'etag', 'last_modified', 'datos', 'huella'}, en orden LRU
+_validadores = OrderedDict()
+
+
+def _incrementar(contador):
+    with _lock:
+        _contadores[contador] += 1
+
+
+class _ContadorPoolMixin:
+    """
+    Cuenta peticiones y conexiones nuevas en los pools de urllib3.
+    """
+
+    def _new_conn(self):
+        _incrementar('conexiones_nuevas')
+        logger.debug("Nueva conexión a %s:%s", self.host, self.port)
+        return super()._new_conn()
+
+    def urlopen(self, *args, **kwargs):
+        _incrementar('peticiones')
+        return super().urlopen(*args, **kwargs)
+
+
+class _HTTPConnectionPoolContado(_ContadorPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _HTTPSConnectionPoolContado(_ContadorPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class _AdaptadorContado(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _HTTPConnectionPoolContado,
+            'https': _HTTPSConnectionPoolContado,
+        }
+
+
+def _crear_sesion():
+    reintentos = Retry(
+        total=settings.UPSTREAM_REINTENTOS,
+        backoff_factor=settings.UPSTREAM_BACKOFF,
+        status_forcelist=settings.UPSTREAM_REINTENTOS_ESTADOS,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False,
+    )
+    adaptador = _AdaptadorContado(
+        pool_connections=settings.UPSTREAM_POOL_CONNECTIONS,
+        pool_maxsize=settings.UPSTREAM_POOL_MAXSIZE,
+        max_retries=reintentos,
+    )
+    sesion = requests.Session()
+    sesion.mount('http://', adaptador)
+    sesion.mount('https://', adaptador)
+    return sesion
+
+
+def obtener_sesion():
+    """
+    Devuelve la sesión compartida del proceso, creándola si hace falta.
+
+    Se recrea cuando cambia el PID para no compartir sockets entre workers
+    de gunicorn creados por fork.
+    """
+    global _sesion, _sesion_pid
+    pid = os.getpid()
+    if _sesion is None or _sesion_pid != pid:
+        with _lock:
+            if _sesion is None or _sesion_pid != pid:
+                _sesion = _crear_sesion()
+                _sesion_pid = pid
+    return _sesion
+
+
+def timeout_por_defecto():
+    return (settings.UPSTREAM_TIMEOUT_CONEXION, settings.UPSTREAM_TIMEOUT_LECTURA)
+
+
+def timeout_de(timeout):
+    """
+    (conexión, lectura) para una petición: sin timeout se usan los de settings;
+    un número reemplaza solo el de lectura.
+    """
+    if timeout is None:
+        return timeout_por_defecto()
+    if isinstance(timeout, (int, float)):
+        return (settings.UPSTREAM_TIMEOUT_CONEXION, timeout)
+    return timeout
+
+
+def get(url, params=None, timeout=None, headers=None):
+    """
+    Hace un GET al backend usando la sesión compartida.
+    """
+    inicio = time.perf_counter()
+    try:
+        response = obtener_sesion().get(url, params=params, timeout=timeout_de(timeout), headers=headers)
+    except requests.exceptions.RequestException:
+        metricas.registrar_upstream(url, 'error', time.perf_counter() - inicio)
+        raise
+    metricas.registrar_upstream(url, response.status_code, time.perf_counter() - inicio, len(response.content))
+    return response
+
+
+def _clave_validadores(url, params):
+    return (url, tuple(sorted((params or {}).items())))
+
+
+def preparar_condicional(url, params=None):
+    """
+    Devuelve (clave, entrada guardada, cabeceras condicionales) para una petición.
+    """
+    clave = _clave_validadores(url, params)
+    if not settings.UPSTREAM_REVALIDACION:
+        return clave, None, {}
+    with _lock:
+        entrada = _validadores.get(clave)
+        if entrada is None:
+            _contadores['sin_validadores'] += 1
+            return clave, None, {}
+        _validadores.move_to_end(clave)
+    cabeceras = {}
+    if entrada['etag']:
+        cabeceras['If-None-Match'] = entrada['etag']
+    if entrada['last_modified']:
+        cabeceras['If-Modified-Since'] = entrada['last_modified']
+    return clave, entrada, cabeceras
+
+
+def reutilizar_no_modificada(entrada):
+    """
+    Registra un 304 y devuelve (datos, huella) de la entrada guardada.
+    """
+    _incrementar('revalidadas_304')
+    return entrada['datos'], entrada['huella']
+
+
+def registrar_respuesta(clave, entrada_previa, cabeceras, contenido, datos):
+    """
+    Guarda los validadores de una respuesta 200 y devuelve su huella.
+
+    La huella identifica la versión del cuerpo: el ETag si el backend lo
+    envía, o un hash del contenido en caso contrario.
+    """
+    if entrada_previa is not None:
+        _incrementar('modificadas')
+    etag = cabeceras.get('ETag')
+    last_modified = cabeceras.get('Last-Modified')
+    huella = etag or hashlib.sha1(contenido).hexdigest()
+    if len(contenido) > settings.UPSTREAM_VALIDADORES_MAX_BYTES:
+        # Sin el cuerpo un 304 no sirve: la próxima vez se pide sin condiciones
+        with _lock:
+            _validadores.pop(clave, None)
+    elif settings.UPSTREAM_REVALIDACION and (etag or last_modified):
+        with _lock:
+            _validadores[clave] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'datos': datos,
+                'huella': huella,
+            }
+            _validadores.move_to_end(clave)
+            while len(_validadores) > settings.UPSTREAM_VALIDADORES_MAX:
+                _validadores.popitem(last=False)
+    return huella
+
+
+def obtener_json_versionado(url, params=None, timeout=None):
+    """
+    Como `obtener_json`, pero devuelve (datos, huella de la versión del cuerpo).
+    """
+    clave, entrada, cabeceras = preparar_condicional(url, params)
+    response = get(url, params=params, timeout=timeout, headers=cabeceras)
+    if response.status_code == 304 and entrada is not None:
+        return reutilizar_no_modificada(entrada)
+    response.raise_for_status()
+    try:
+        datos = codec_json.cargar(response.content)
+    except json.JSONDecodeError as e:
+        # Igual que `response.json()`: el error sigue siendo un RequestException
+        raise requests.exceptions.JSONDecodeError(e.msg, e.doc, e.pos)
+    return datos, registrar_respuesta(clave, entrada, response.headers, response.content, datos)
+
+
+def obtener_json(url, params=None, timeout=None):
+    """
+    Hace un GET al backend, valida el estado HTTP y devuelve el cuerpo parseado.
+    """
+    return obtener_json_versionado(url, params=params, timeout=timeout)[0]
+
+
+class RespuestaJSONEnFlujo:
+    """
+    Arreglo JSON de una respuesta que se recorre mientras se descarga.
+
+    Se puede iterar una sola vez; la conexión vuelve al pool al terminar el
+    recorrido o al llamar a `close()`. `huella` es el ETag de la respuesta,
+    o None si el backend no lo envía (el cuerpo no se conoce de antemano).
+
+    Un cuerpo malformado o truncado se lanza como RequestException, igual
+    que un corte de la conexión durante el recorrido.
+    """
+
+    TAMANO_FRAGMENTO = 64 * 1024
+
+    def __init__(self, response):
+        self.response = response
+        self.huella = response.headers.get('ETag')
+
+    def __iter__(self):
+        try:
+            yield from iterar_arreglo(self.response.iter_content(self.TAMANO_FRAGMENTO))
+        except ValueError as e:
+            raise requests.exceptions.InvalidJSONError(str(e), response=self.response) from e
+        finally:
+            self.close()
+
+    def close(self):
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def abrir_json_en_flujo(url, params=None, timeout=None):
+    """
+    Hace un GET al backend y devuelve su arreglo JSON como `RespuestaJSONEnFlujo`.
+
+    El estado HTTP se valida antes de devolver; los errores de red durante
+    el recorrido se lanzan al iterar.
+    """
+    inicio = time.perf_counter()
+    try:
+        response = obtener_sesion().get(url, params=params, timeout=timeout_de(timeout), stream=True)
+    except requests.exceptions.RequestException:
+        metricas.registrar_upstream(url, 'error', time.perf_counter() - inicio)
+        raise
+    # Hasta los encabezados: el cuerpo se descarga mientras se recorre
+    tamano = response.headers.get('Content-Length')
+    metricas.registrar_upstream(
+        url, response.status_code, time.perf_counter() - inicio, int(tamano) if tamano and tamano.isdigit() else None
+    )
+    try:
+        response.raise_for_status()
+    except requests.exceptions.HTTPError:
+        response.close()
+        raise
+    return RespuestaJSONEnFlujo(response)
+
+
+def _obtener_executor():
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.UPSTREAM_MAX_WORKERS,
+                    thread_name_prefix='upstream'
+                )
+                _executor_pid = pid
+    return _executor
+
+
+def _enviar(funcion, *args, **kwargs):
+    # Con el contexto de quien envía: los tiempos llegan a su Server-Timing
+    return _obtener_executor().submit(contextvars.copy_context().run, funcion, *args, **kwargs)
+
+
+def enviar(url, params=None, timeout=None):
+    """
+    Lanza `obtener_json` en el pool acotado de hilos y devuelve el Future.
+
+    `future.result()` devuelve el cuerpo parseado o relanza la misma
+    excepción de `requests` que lanzaría la llamada directa.
+    """
+    return _enviar(obtener_json, url, params=params, timeout=timeout)
+
+
+def enviar_versionado(url, params=None, timeout=None):
+    """
+    Como `enviar`, pero el Future devuelve (datos, huella) de `obtener_json_versionado`.
+    """
+    return _enviar(obtener_json_versionado, url, params=params, timeout=timeout)
+
+
+def enviar_funcion(funcion, *args, **kwargs):
+    """
+    Lanza en el mismo pool de hilos otra función que consulta al backend.
+    """
+    return _enviar(funcion, *args, **kwargs)
+
+
+def estadisticas_conexiones():
+    """
+    Devuelve los contadores de peticiones y reutilización de conexiones del proceso.
+
+    `/Consultas/metricas/` los expone sumados entre workers.
+    """
+    with _lock:
+        peticiones = _contadores['peticiones']
+        nuevas = _contadores['conexiones_nuevas']
+    return {
+        'peticiones': peticiones,
+        'conexiones_nuevas': nuevas,
+        'conexiones_reutilizadas': max(peticiones - nuevas, 0),
+    }
+
+
+def estadisticas_revalidacion():
+    """
+    Devuelve los contadores de revalidación condicional del proceso.
+
+    `sin_validadores` son fallos (no había nada guardado), `revalidadas_304`
+    son aciertos que reutilizaron el cuerpo guardado y `modificadas` son
+    peticiones condicionales a las que el backend respondió con un cuerpo nuevo.
+    `/Consultas/metricas/` los expone sumados entre workers.
+    """
+    with _lock:
+        sin_validadores = _contadores['sin_validadores']
+        revalidadas = _contadores['revalidadas_304']
+        modificadas = _contadores['modificadas']
+        guardadas = len(_validadores)
+    total = sin_validadores + revalidadas + modificadas
+    return {
+        'peticiones': total,
+        'sin_validadores': sin_validadores,
+        'revalidadas_304': revalidadas,
+        'modificadas': modificadas,
+        'tasa_acierto': revalidadas / total if total else 0.0,
+        'tasa_fallo': (sin_validadores + modificadas) / total if total else 0.0,
+        'entradas_guardadas': guardadas,
+    }
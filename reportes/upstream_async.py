@@ -0,0 +1,104 @@
+"""
+Cliente HTTP asíncrono para consumir el backend principal desde las vistas async.
+
+Usa un `httpx.AsyncClient` por event loop, con los mismos límites de pool,
+timeouts y política de reintentos que el cliente síncrono de `upstream`.
+"""
+import asyncio
+import logging
+import time
+import weakref
+
+import httpx
+import requests
+from django.conf import settings
+
+from . import codec_json, metricas, upstream
+
+logger = logging.getLogger(__name__)
+
+# Un cliente por event loop: un AsyncClient no puede usarse desde otro loop
+_clientes = weakref.WeakKeyDictionary()
+
+# Errores que las vistas async tratan como falla del servicio externo (503).
+# Incluye los de `requests` porque la caché de catálogos usa el cliente síncrono.
+ErrorUpstream = (httpx.HTTPError, requests.exceptions.RequestException)
+
+
+def _crear_cliente():
+    limites = httpx.Limits(
+        max_connections=settings.UPSTREAM_POOL_MAXSIZE * settings.UPSTREAM_POOL_CONNECTIONS,
+        max_keepalive_connections=settings.UPSTREAM_POOL_MAXSIZE,
+    )
+    timeout = httpx.Timeout(
+        settings.UPSTREAM_TIMEOUT_LECTURA,
+        connect=settings.UPSTREAM_TIMEOUT_CONEXION
+    )
+    transporte = httpx.AsyncHTTPTransport(limits=limites, retries=settings.UPSTREAM_REINTENTOS)
+    return httpx.AsyncClient(transport=transporte, timeout=timeout)
+
+
+def obtener_cliente():
+    """
+    Devuelve el cliente asíncrono del event loop actual, creándolo si hace falta.
+    """
+    loop = asyncio.get_running_loop()
+    cliente = _clientes.get(loop)
+    if cliente is None:
+        cliente = _crear_cliente()
+        _clientes[loop] = cliente
+    return cliente
+
+
+async def get(url, params=None, timeout=None, headers=None):
+    """
+    Hace un GET al backend, reintentando con backoff los estados configurados.
+    """
+    cliente = obtener_cliente()
+    kwargs = {'params': params, 'headers': headers}
+    if timeout is not None:
+        # Como en el cliente síncrono: el número es solo el timeout de lectura
+        conexion, lectura = upstream.timeout_de(timeout)
+        kwargs['timeout'] = httpx.Timeout(lectura, connect=conexion)
+    intento = 0
+    inicio = time.perf_counter()
+    while True:
+        try:
+            response = await cliente.get(url, **kwargs)
+        except httpx.HTTPError:
+            metricas.registrar_upstream(url, 'error', time.perf_counter() - inicio)
+            raise
+        if response.status_code not in settings.UPSTREAM_REINTENTOS_ESTADOS or intento >= settings.UPSTREAM_REINTENTOS:
+            metricas.registrar_upstream(
+                url, response.status_code, time.perf_counter() - inicio, len(response.content)
+            )
+            return response
+        espera = settings.UPSTREAM_BACKOFF * (2 ** intento)
+        logger.warning("Reintentando %s tras estado %s (espera %.2fs)", url, response.status_code, espera)
+        await asyncio.sleep(espera)
+        intento += 1
+
+
+async def obtener_json_versionado(url, params=None, timeout=None):
+    """
+    Como `obtener_json`, pero devuelve (datos, huella de la versión del cuerpo).
+
+    Comparte con el cliente síncrono los validadores y cuerpos guardados.
+    """
+    clave, entrada, cabeceras = upstream.preparar_condicional(url, params)
+    response = await get(url, params=params, timeout=timeout, headers=cabeceras)
+    if response.status_code == 304 and entrada is not None:
+        return upstream.reutilizar_no_modificada(entrada)
+    response.raise_for_status()
+    try:
+        datos = codec_json.cargar(response.content)
+    except ValueError as e:
+        raise httpx.DecodingError(str(e), request=response.request)
+    return datos, upstream.registrar_respuesta(clave, entrada, response.headers, response.content, datos)
+
+
+async def obtener_json(url, params=None, timeout=None):
+    """
+    Hace un GET al backend, valida el estado HTTP y devuelve el cuerpo parseado.
+    """
+    return (await obtener_json_versionado(url, params=params, timeout=timeout))[0]
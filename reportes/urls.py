@@ -1,8 +1,28 @@
+from django.conf import settings
 from django.urls import path
 from .views import *
+from .views_async import (
+    EstadisticasConsultasAsyncView,
+    FiltrosConsultaAsyncView,
+    GenerarReporteConsultasPDFAsyncView,
+)
+
+if settings.REPORTES_VISTAS_ASYNC:
+    # Modo ASGI: las mismas rutas atendidas por las variantes asíncronas
+    GenerarReporteConsultasPDFView = GenerarReporteConsultasPDFAsyncView
+    FiltrosConsultaView = FiltrosConsultaAsyncView
+    EstadisticasConsultasView = EstadisticasConsultasAsyncView
 
 urlpatterns = [
     path('generar-reporte-consultas/', GenerarReporteConsultasPDFView.as_view(), name='generar-reporte-consultas'),
+    path('exportar-consultas/', ExportarConsultasView.as_view(), name='exportar-consultas'),
     path('api/filtros-consulta/', FiltrosConsultaView.as_view(), name='filtros-consulta'),
     path('api/estadisticas-consultas/', EstadisticasConsultasView.as_view(), name='estadisticas_consultas'),
-]
\ No newline at end of file
+    path('metricas/', MetricasView.as_view(), name='metricas'),
+    path('reportes/trabajos/<uuid:trabajo_id>/', EstadoTrabajoReporteView.as_view(), name='estado-trabajo-reporte'),
+    path(
+        'reportes/trabajos/<uuid:trabajo_id>/descargar/',
+        DescargarTrabajoReporteView.as_view(),
+        name='descargar-trabajo-reporte'
+    ),
+]
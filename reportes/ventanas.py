@@ -0,0 +1,333 @@
+"""
+Estadísticas de consultas por ventana de tiempo, granularidad y alcance.
+
+`EstadisticasConsultasView` acepta en la query string `desde`, `hasta`
+(YYYY-MM-DD), `granularidad` (dia, semana, mes, trimestre) y opcionalmente
+`profesional_id` y/o `atleta_id`. Solo se piden al backend las consultas de
+la ventana (los mismos filtros van como parámetros, y se vuelven a aplicar
+localmente por si el backend los ignora) y se cuentan por cubeta.
+
+El acumulador ya contado se guarda en caché por (ventana, granularidad,
+alcance). Una ventana que termina antes de los meses editables ya no cambia y
+se guarda por `ESTADISTICAS_SEGMENTOS_TTL`; las demás por
+`ESTADISTICAS_VENTANA_TTL`.
+"""
+import logging
+from collections import Counter
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import espejo, metricas, upstream
+from .campos import parsear_fecha
+from .estadisticas import (
+    MESES_MOSTRAR, AcumuladorConsultas, clave_atleta, clave_profesional, datos_profesionales, info_profesionales,
+    top_atletas, top_diagnosticos,
+)
+
+logger = logging.getLogger(__name__)
+
+GRANULARIDADES = ('dia', 'semana', 'mes', 'trimestre')
+PARAMETROS = ('desde', 'hasta', 'granularidad', 'profesional_id', 'atleta_id')
+
+
+def _sumar_meses(mes, n):
+    year, month = mes
+    total = year * 12 + (month - 1) + n
+    return (total // 12, total % 12 + 1)
+
+
+def solicitada(query):
+    """
+    True si la petición pide una ventana; sin parámetros se sirve el dashboard de siempre.
+    """
+    return any(parametro in query for parametro in PARAMETROS)
+
+
+@lru_cache(maxsize=8192)
+def dia_de_fecha(fecha):
+    """
+    Devuelve el día de una fecha de consulta, o None si no se puede interpretar.
+    """
+    parsed = parsear_fecha(fecha)
+    return parsed.date() if parsed is not None else None
+
+
+def inicio_cubeta(dia, granularidad):
+    """
+    Primer día de la cubeta que contiene `dia` (las semanas empiezan en lunes).
+    """
+    if granularidad == 'dia':
+        return dia
+    if granularidad == 'semana':
+        return dia - timedelta(days=dia.weekday())
+    if granularidad == 'mes':
+        return dia.replace(day=1)
+    return date(dia.year, (dia.month - 1) // 3 * 3 + 1, 1)
+
+
+def siguiente_cubeta(inicio, granularidad):
+    if granularidad == 'dia':
+        return inicio + timedelta(days=1)
+    if granularidad == 'semana':
+        return inicio + timedelta(days=7)
+    year, month = _sumar_meses((inicio.year, inicio.month), 1 if granularidad == 'mes' else 3)
+    return date(year, month, 1)
+
+
+def contar_cubetas(desde, hasta, granularidad):
+    """
+    Cantidad de cubetas entre `desde` y `hasta` (inclusive), calculada sin generarlas.
+    """
+    if granularidad == 'dia':
+        return (hasta - desde).days + 1
+    if granularidad == 'semana':
+        return (inicio_cubeta(hasta, 'semana') - inicio_cubeta(desde, 'semana')).days // 7 + 1
+    meses = (hasta.year - desde.year) * 12 + hasta.month - desde.month
+    if granularidad == 'mes':
+        return meses + 1
+    return (hasta.year * 4 + (hasta.month - 1) // 3) - (desde.year * 4 + (desde.month - 1) // 3) + 1
+
+
+def etiqueta_cubeta(inicio, granularidad):
+    if granularidad == 'dia':
+        return inicio.isoformat()
+    if granularidad == 'semana':
+        year, semana, _ = inicio.isocalendar()
+        return '%04d-S%02d' % (year, semana)
+    if granularidad == 'mes':
+        return inicio.strftime('%Y-%m')
+    return '%04d-T%d' % (inicio.year, (inicio.month - 1) // 3 + 1)
+
+
+class Ventana:
+    """
+    Ventana de tiempo, granularidad y alcance pedidos al endpoint de estadísticas.
+    """
+
+    def __init__(self, desde, hasta, granularidad='mes', profesional_id=None, atleta_id=None):
+        self.desde = desde
+        self.hasta = hasta
+        self.granularidad = granularidad
+        self.profesional_id = profesional_id
+        self.atleta_id = atleta_id
+
+    @property
+    def filtros(self):
+        """
+        Filtros con el formato de los reportes (parámetros del backend y del espejo).
+        """
+        filtros = {'fecha_inicio': self.desde.isoformat(), 'fecha_fin': self.hasta.isoformat()}
+        if self.atleta_id is not None:
+            filtros['atleta_id'] = self.atleta_id
+        if self.profesional_id is not None:
+            filtros['profesional_id'] = self.profesional_id
+        return filtros
+
+    @property
+    def clave(self):
+        return 'reportes:ventana:%s:%s:%s:%s:%s' % (
+            self.desde.isoformat(), self.hasta.isoformat(), self.granularidad,
+            self.profesional_id or '', self.atleta_id or '',
+        )
+
+    def cubetas(self):
+        """
+        Inicios de las cubetas que cubren la ventana, en orden.
+        """
+        inicios = []
+        inicio = inicio_cubeta(self.desde, self.granularidad)
+        while inicio <= self.hasta:
+            inicios.append(inicio)
+            try:
+                inicio = siguiente_cubeta(inicio, self.granularidad)
+            except (OverflowError, ValueError):
+                # La última cubeta llega al 31/12/9999
+                break
+        return inicios
+
+    def cerrada(self, hoy):
+        """
+        True si la ventana termina antes de los meses que aún pueden editarse.
+        """
+        year, month = _sumar_meses((hoy.year, hoy.month), -settings.ESTADISTICAS_MESES_EDITABLES)
+        return self.hasta < date(year, month, 1)
+
+
+def _leer_dia(query, parametro, por_defecto):
+    valor = query.get(parametro)
+    if valor in (None, ''):
+        return por_defecto
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"El parámetro '{parametro}' debe tener el formato YYYY-MM-DD")
+
+
+def _leer_id(query, parametro):
+    valor = query.get(parametro)
+    if valor in (None, 'todos', ''):
+        return None
+    return str(valor)
+
+
+def leer_ventana(query, hoy):
+    """
+    Arma la ventana desde la query string; lanza ValueError si no es válida.
+
+    Sin `hasta` la ventana termina hoy; sin `desde` empieza el primer día de
+    los `MESES_MOSTRAR` meses que muestra el dashboard.
+    """
+    hasta = _leer_dia(query, 'hasta', hoy.date())
+    year, month = _sumar_meses((hasta.year, hasta.month), 1 - MESES_MOSTRAR)
+    desde = _leer_dia(query, 'desde', date(year, month, 1))
+    if desde > hasta:
+        raise ValueError("'desde' no puede ser posterior a 'hasta'")
+
+    granularidad = query.get('granularidad') or 'mes'
+    if granularidad not in GRANULARIDADES:
+        raise ValueError(f"'granularidad' debe ser una de: {', '.join(GRANULARIDADES)}")
+
+    ventana = Ventana(
+        desde, hasta, granularidad,
+        profesional_id=_leer_id(query, 'profesional_id'),
+        atleta_id=_leer_id(query, 'atleta_id'),
+    )
+    # Se cuentan sin generarlas: una ventana enorme se rechaza sin costo
+    if contar_cubetas(desde, hasta, granularidad) > settings.ESTADISTICAS_VENTANA_MAX_CUBETAS:
+        raise ValueError(
+            f"La ventana tiene más de {settings.ESTADISTICAS_VENTANA_MAX_CUBETAS} cubetas; "
+            "use una granularidad mayor o una ventana más corta"
+        )
+    return ventana
+
+
+class AcumuladorVentana(AcumuladorConsultas):
+    """
+    Contadores por cubeta de las consultas que caen en una ventana.
+
+    Comparte con `AcumuladorConsultas` el total y los conteos por atleta y
+    diagnóstico; los meses se reemplazan por las cubetas de la ventana.
+    """
+
+    def __init__(self, ventana):
+        super().__init__()
+        self.ventana = ventana
+        self.por_cubeta = Counter()
+        self.por_cubeta_profesional = Counter()
+        self.por_profesional = Counter()
+
+    def agregar(self, consulta):
+        """
+        Cuenta la consulta si cae en la ventana y en el alcance pedido.
+        """
+        ventana = self.ventana
+        dia = dia_de_fecha(consulta.get('fecha'))
+        if dia is None or not (ventana.desde <= dia <= ventana.hasta):
+            return
+        profesional = clave_profesional(consulta)
+        atleta = clave_atleta(consulta)
+        if ventana.profesional_id is not None and profesional != ventana.profesional_id:
+            return
+        if ventana.atleta_id is not None and atleta != ventana.atleta_id:
+            return
+
+        cubeta = inicio_cubeta(dia, ventana.granularidad)
+        self.por_cubeta[cubeta] += 1
+        self.por_cubeta_profesional[cubeta, profesional] += 1
+        self.por_profesional[profesional] += 1
+        self._contar(consulta, atleta)
+
+    def combinar(self, otro):
+        super().combinar(otro)
+        self.por_cubeta.update(otro.por_cubeta)
+        self.por_cubeta_profesional.update(otro.por_cubeta_profesional)
+        self.por_profesional.update(otro.por_profesional)
+        return self
+
+
+def leer_cache(ventana):
+    return cache.get(ventana.clave)
+
+
+def guardar_cache(acumulador, hoy):
+    ventana = acumulador.ventana
+    if ventana.cerrada(hoy):
+        ttl = settings.ESTADISTICAS_SEGMENTOS_TTL
+    else:
+        ttl = settings.ESTADISTICAS_VENTANA_TTL
+    cache.set(ventana.clave, acumulador, ttl)
+
+
+def obtener_acumulador(ventana, hoy=None, timeout=None):
+    """
+    Devuelve el acumulador de la ventana, desde la caché o pidiendo solo sus consultas.
+
+    En modo espejo la ventana se resuelve en SQL y no se guarda en caché.
+    """
+    if hoy is None:
+        hoy = datetime.now()
+    if espejo.usar_espejo():
+        with metricas.etapa('acumular'):
+            return AcumuladorVentana(ventana).agregar_todas(espejo.iterar_consultas_filtradas(ventana.filtros))
+
+    acumulador = leer_cache(ventana)
+    if acumulador is not None:
+        return acumulador
+    consultas = upstream.obtener_json(settings.API_CONSULTAS, params=ventana.filtros, timeout=timeout)
+    return contar(ventana, consultas, hoy)
+
+
+def contar(ventana, consultas, hoy):
+    """
+    Cuenta las consultas descargadas de la ventana y guarda el acumulador en caché.
+    """
+    with metricas.etapa('acumular', filas=len(consultas)):
+        acumulador = AcumuladorVentana(ventana).agregar_todas(consultas)
+    guardar_cache(acumulador, hoy)
+    return acumulador
+
+
+def construir_respuesta(acumulador, profesionales, atletas):
+    """
+    Arma el JSON de una ventana con la misma forma que el dashboard, por cubetas.
+    """
+    ventana = acumulador.ventana
+    profesionales_info = info_profesionales(profesionales, ventana.profesional_id)
+
+    por_cubeta_profesional = acumulador.por_cubeta_profesional
+    data_by_profesional = []
+    for inicio in ventana.cubetas():
+        data_by_profesional.append({
+            'inicio': inicio.isoformat(),
+            'etiqueta': etiqueta_cubeta(inicio, ventana.granularidad),
+            'profesionales': [
+                {
+                    'profesional_id': profesional['id'],
+                    'profesional_name': nombre_completo,
+                    'count': por_cubeta_profesional.get((inicio, profesional_id), 0)
+                }
+                for profesional, profesional_id, nombre_completo in profesionales_info
+            ],
+            'total': acumulador.por_cubeta.get(inicio, 0)
+        })
+
+    profesionales_data = datos_profesionales(
+        profesionales_info, lambda profesional_id: acumulador.por_profesional.get(profesional_id, 0)
+    )
+
+    return {
+        'desde': ventana.desde.isoformat(),
+        'hasta': ventana.hasta.isoformat(),
+        'granularidad': ventana.granularidad,
+        'profesional_id': ventana.profesional_id,
+        'atleta_id': ventana.atleta_id,
+        'total_consultas': acumulador.total,
+        'profesionales_data': profesionales_data,
+        'data_by_profesional': data_by_profesional,
+        'data': [{'inicio': c['inicio'], 'etiqueta': c['etiqueta'], 'total': c['total']} for c in data_by_profesional],
+        'top_atletas': top_atletas(acumulador.por_atleta, atletas),
+        'top_diagnosticos': top_diagnosticos(acumulador.diagnosticos)
+    }
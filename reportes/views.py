@@ -1,11 +1,13 @@
 import requests
+from asgiref.sync import sync_to_async
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from datetime import datetime
 from django.conf import settings
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 import io
+import itertools
 from io import BytesIO
 import tempfile
 import json
@@ -16,148 +18,201 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.pdfgen import canvas
 import logging
+import time
 from datetime import datetime, timedelta
 
+from . import cache_pdf, capacidades, espejo, exportacion, metricas, respuestas, trabajos, upstream, ventanas
+from .campos import (
+    ACCESORES_GENERALES,
+    FECHA_CAMPOS,
+    LectorConsultas,
+    obtener_id_de_campo,
+    parsear_fecha,
+)
+from .catalogos import SolicitudCatalogos
+from .estadisticas import construir_respuesta
+from .models import TrabajoReporte
+from .pdf_rapido import TablaDetalleRapida
+from .segmentos import obtener_acumulador
+
 logger = logging.getLogger(__name__)
 
+
+def opciones_atletas(todos_atletas):
+    """
+    Arma la lista de atletas para el selector de filtros, sin repetidos.
+    """
+    atletas_dict = {}
+    for a in todos_atletas:
+        if a["id"] not in atletas_dict:
+            atletas_dict[a["id"]] = {
+                "id": a["id"], 
+                "nombre": f"{a.get('nombre', '')} {a.get('apPaterno', '')} {a.get('apMaterno', '')}"
+            }
+    return list(atletas_dict.values())
+
+
+def opciones_profesionales(todos_profesionales):
+    """
+    Arma la lista de profesionales para el selector de filtros, sin repetidos.
+    """
+    profesionales_dict = {}
+    for p in todos_profesionales:
+        if p["id"] not in profesionales_dict:
+            profesionales_dict[p["id"]] = {
+                "id": p["id"], 
+                "nombre": f"{p.get('nombre', '')} {p.get('apPaterno', '')} {p.get('apMaterno', '')} - {p.get('especialidad', '')}"
+            }
+    return list(profesionales_dict.values())
+
+
+def opciones_filtros(todos_atletas, todos_profesionales):
+    """
+    Arma el cuerpo de respuesta de FiltrosConsultaView.
+    """
+    with metricas.etapa('opciones', filas=len(todos_atletas) + len(todos_profesionales)):
+        return {
+            'atletas': opciones_atletas(todos_atletas),
+            'profesionales': opciones_profesionales(todos_profesionales)
+        }
+
+
+async def _leer_por_bloques(archivo, tamano=64 * 1024):
+    try:
+        while True:
+            bloque = await sync_to_async(archivo.read, thread_sensitive=False)(tamano)
+            if not bloque:
+                break
+            yield bloque
+    finally:
+        archivo.close()
+
+
+def respuesta_archivo_pdf(archivo, filename):
+    """
+    Respuesta de descarga que envía el PDF leyendo el archivo por bloques.
+
+    Bajo ASGI se usa un iterador asíncrono, porque Django lee completo a
+    memoria un FileResponse síncrono antes de enviarlo.
+    """
+    if settings.SERVIDOR != 'asgi':
+        return FileResponse(archivo, as_attachment=True, filename=filename, content_type='application/pdf')
+
+    archivo.seek(0, io.SEEK_END)
+    tamano = archivo.tell()
+    archivo.seek(0)
+    response = StreamingHttpResponse(_leer_por_bloques(archivo), content_type='application/pdf')
+    response['Content-Length'] = str(tamano)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+async def _iterar_en_hilo(iterador):
+    fin = object()
+    siguiente = sync_to_async(next)
+    try:
+        while True:
+            bloque = await siguiente(iterador, fin)
+            if bloque is fin:
+                break
+            yield bloque
+    finally:
+        if hasattr(iterador, 'close'):
+            await sync_to_async(iterador.close)()
+
+
+def respuesta_en_bloques(bloques, content_type, filename):
+    """
+    Respuesta de descarga que se envía a medida que el generador produce bloques.
+
+    Bajo ASGI el generador se avanza en el hilo síncrono con un iterador
+    asíncrono, por la misma razón que en `respuesta_archivo_pdf`.
+    """
+    if settings.SERVIDOR == 'asgi':
+        bloques = _iterar_en_hilo(iter(bloques))
+    response = StreamingHttpResponse(bloques, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def estadisticas_dashboard():
+    """
+    Calcula las estadísticas del dashboard (últimos 12 meses).
+    """
+    # URLs de los servicios - USANDO CONFIGURACIÓN DE SETTINGS
+    API_CONSULTAS = settings.API_CONSULTAS
+
+    hoy = datetime.now()
+    if espejo.usar_espejo():
+        # 1-3. Conteos materializados y catálogos del espejo local
+        with metricas.etapa('acumular'):
+            acumulador = espejo.acumulador()
+        catalogos = espejo.catalogos()
+    else:
+        # 1. Solicitar los catálogos (desde caché si están vigentes)
+        solicitud_catalogos = SolicitudCatalogos()
+
+        # 2. Acumular las consultas: segmentos cerrados desde caché y
+        #    solo los meses recientes pedidos al backend
+        logger.info(f"Consultando consultas en: {API_CONSULTAS}")
+        acumulador = obtener_acumulador(hoy)
+
+        # 3. Esperar los catálogos (cualquier falla se propaga igual que antes)
+        catalogos = solicitud_catalogos.resultado()
+    todos_profesionales = catalogos['profesionales'].values()
+    todos_atletas = catalogos['atletas'].values()
+
+    # 4. Armar las estadísticas a partir de los contadores
+    with metricas.etapa('construir'):
+        estadisticas = construir_respuesta(
+            acumulador,
+            todos_profesionales,
+            todos_atletas,
+            hoy
+        )
+
+    logger.info(f"Total consultas procesadas: {acumulador.total}")
+    logger.info(f"Profesionales encontrados: {len(todos_profesionales)}")
+    logger.info(f"Atletas encontrados: {len(todos_atletas)}")
+    return estadisticas
+
+
+def estadisticas_ventana(ventana):
+    """
+    Estadísticas de una ventana, granularidad y alcance (ver `ventanas`).
+    """
+    solicitud_catalogos = None if espejo.usar_espejo() else SolicitudCatalogos()
+    acumulador = ventanas.obtener_acumulador(ventana)
+    catalogos = espejo.catalogos() if solicitud_catalogos is None else solicitud_catalogos.resultado()
+    logger.info(f"Consultas en la ventana {ventana.clave}: {acumulador.total}")
+    with metricas.etapa('construir'):
+        return ventanas.construir_respuesta(
+            acumulador,
+            catalogos['profesionales'].values(),
+            catalogos['atletas'].values()
+        )
+
+
+def estadisticas_consultas(ventana=None):
+    if ventana is not None:
+        return estadisticas_ventana(ventana)
+    return estadisticas_dashboard()
+
+
 class EstadisticasConsultasView(APIView):
     def get(self, request):
         try:
-            # URLs de los servicios - USANDO CONFIGURACIÓN DE SETTINGS
-            API_CONSULTAS = settings.API_CONSULTAS
-            API_PROFESIONALES = settings.API_PROFESIONALES
-            API_ATLETAS = settings.API_ATLETAS
-            
-            # 1. Obtener todas las consultas
-            logger.info(f"Consultando consultas en: {API_CONSULTAS}")
-            consultas_response = requests.get(API_CONSULTAS, timeout=10)
-            consultas_response.raise_for_status()
-            todas_consultas = consultas_response.json()
-            
-            # 2. Filtrar consultas del mes actual
-            mes_actual = datetime.now().month
-            año_actual = datetime.now().year
-            
-            # 3. Calcular estadísticas básicas
-            consultas_mes_actual = [
-                c for c in todas_consultas 
-                if datetime.strptime(c['fecha'], '%Y-%m-%d').month == mes_actual
-                and datetime.strptime(c['fecha'], '%Y-%m-%d').year == año_actual
-            ]
-            
-            total_consultas = len(consultas_mes_actual)
-            
-            # 4. Obtener todos los profesionales
-            profesionales_response = requests.get(API_PROFESIONALES, timeout=10)
-            profesionales_response.raise_for_status()
-            todos_profesionales = profesionales_response.json()
-            
-            # 5. Obtener todos los atletas
-            atletas_response = requests.get(API_ATLETAS, timeout=10)
-            atletas_response.raise_for_status()
-            todos_atletas = atletas_response.json()
-            
-            # 6. Datos mensuales por profesional (últimos 12 meses)
-            monthly_data_by_profesional = []
-            meses_mostrar = 12
-            
-            for i in range(meses_mostrar):
-                mes_offset = meses_mostrar - i - 1
-                month = (mes_actual - mes_offset - 1) % 12 + 1
-                year = año_actual - (1 if mes_actual - mes_offset - 1 < 0 else 0)
-                
-                consultas_mes = [
-                    c for c in todas_consultas 
-                    if datetime.strptime(c['fecha'], '%Y-%m-%d').month == month
-                    and datetime.strptime(c['fecha'], '%Y-%m-%d').year == year
-                ]
-                
-                profesionales_data_mes = []
-                for profesional in todos_profesionales:
-                    profesional_id = str(profesional['id'])
-                    count = sum(1 for c in consultas_mes 
-                              if str(c.get('profesional_salud', c.get('profesional_salud_id', ''))) == profesional_id)
-                    
-                    nombre_completo = f"{profesional.get('nombre', '')} {profesional.get('apPaterno', '')}".strip()
-                    
-                    profesionales_data_mes.append({
-                        'profesional_id': profesional['id'],
-                        'profesional_name': nombre_completo,
-                        'count': count
-                    })
-                
-                monthly_data_by_profesional.append({
-                    'mes': datetime(year, month, 1).strftime('%b'),
-                    'mes_numero': month,
-                    'ano': year,
-                    'profesionales': profesionales_data_mes,
-                    'total': len(consultas_mes)
-                })
-            
-            # 7. Datos totales por profesional
-            profesionales_data = []
-            for profesional in todos_profesionales:
-                profesional_id = str(profesional['id'])
-                total_consultas_prof = sum(
-                    1 for c in consultas_mes_actual 
-                    if str(c.get('profesional_salud', c.get('profesional_salud_id', ''))) == profesional_id
-                )
-                
-                nombre_completo = f"{profesional.get('nombre', '')} {profesional.get('apPaterno', '')}".strip()
-                
-                profesionales_data.append({
-                    'nombre': nombre_completo,
-                    'id': profesional_id,
-                    'total': total_consultas_prof,
-                    'especialidad': profesional.get('especialidad', 'Sin especialidad')
-                })
-            
-            # 8. Datos por atleta (top 10 con más consultas)
-            atletas_data = []
-            for atleta in todos_atletas:
-                atleta_id = str(atleta['id'])
-                total_consultas_atleta = sum(
-                    1 for c in todas_consultas 
-                    if str(c.get('atleta', c.get('atleta_id', ''))) == atleta_id
-                )
-                
-                nombre_completo = f"{atleta.get('nombre', '')} {atleta.get('apPaterno', '')}".strip()
-                
-                if total_consultas_atleta > 0:
-                    atletas_data.append({
-                        'nombre': nombre_completo,
-                        'id': atleta_id,
-                        'total': total_consultas_atleta
-                    })
-            
-            top_atletas = sorted(atletas_data, key=lambda x: x['total'], reverse=True)[:10]
-            
-            # 9. Distribución por diagnóstico común
-            diagnosticos = {}
-            for consulta in todas_consultas:
-                diagnostico = consulta.get('diagnostico', 'Sin diagnóstico').strip()
-                if diagnostico and diagnostico != 'Sin diagnóstico':
-                    diagnosticos[diagnostico] = diagnosticos.get(diagnostico, 0) + 1
-            
-            top_diagnosticos = sorted(
-                [{'nombre': k, 'total': v} for k, v in diagnosticos.items()], 
-                key=lambda x: x['total'], 
-                reverse=True
-            )[:5]
-            
-            logger.info(f"Total consultas procesadas: {len(todas_consultas)}")
-            logger.info(f"Profesionales encontrados: {len(todos_profesionales)}")
-            logger.info(f"Atletas encontrados: {len(todos_atletas)}")
-            
-            return Response({
-                'total_consultas': len(todas_consultas),
-                'consultas_mes_actual': len(consultas_mes_actual),
-                'profesionales_data': profesionales_data,
-                'monthly_data_by_profesional': monthly_data_by_profesional,
-                'monthly_data': [{'mes': m['mes'], 'total': m['total']} for m in monthly_data_by_profesional],
-                'top_atletas': top_atletas,
-                'top_diagnosticos': top_diagnosticos
-            })
+            ventana = None
+            if ventanas.solicitada(request.query_params):
+                try:
+                    ventana = ventanas.leer_ventana(request.query_params, datetime.now())
+                except ValueError as e:
+                    return Response({'error': str(e)}, status=400)
+
+            # Respuesta compartida entre workers, con ETag y 304 (ver `respuestas`)
+            return respuestas.responder(
+                request, 'estadisticas', lambda: estadisticas_consultas(ventana), Response
+            )
             
         except requests.exceptions.RequestException as e:
             logger.error(f"Error de conexión: {str(e)}")
@@ -174,172 +229,145 @@ class EstadisticasConsultasView(APIView):
             }, status=500)
 
 
-class GenerarReporteConsultasPDFView(APIView):
+class ProcesamientoConsultasMixin:
     """
-    Vista que genera reportes PDF de consultas médicas con filtros aplicables.
+    Filtrado, enriquecimiento y generación del PDF de consultas, compartidos
+    entre las variantes síncrona y asíncrona del reporte.
     """
 
-    # Configuración de endpoints - USANDO SETTINGS
-    @property
-    def CONSULTAS_API_URL(self):
-        return settings.API_CONSULTAS
-    
-    @property
-    def CATALOGOS_API_BASE_URL(self):
-        # Extraer la base de la URL de API_ATLETAS
-        return settings.API_BASE_URL + '/Catalogos/'
-    
-    TIMEOUT = 10  # segundos
+    # Timeout de lectura; None usa UPSTREAM_TIMEOUT_CONEXION / UPSTREAM_TIMEOUT_LECTURA
+    TIMEOUT = None
 
-    def post(self, request):
+    def _parametros_consultas(self, datos):
         """
-        Genera un reporte PDF de consultas médicas con filtros aplicables.
+        Arma los parámetros de consulta que se envían al servicio de consultas.
         """
-        try:
-            logger.info("Iniciando generación de reporte PDF con filtros: %s", request.data)
+        params = {
+            'fecha_inicio': datos.get('fecha_inicio'),
+            'fecha_fin': datos.get('fecha_fin')
+        }
+        
+        if datos.get('atleta_id') not in [None, "todos", ""]:
+            params['atleta_id'] = datos.get('atleta_id')
             
-            # 1. Validación de parámetros requeridos
-            if not all(k in request.data for k in ['fecha_inicio', 'fecha_fin']):
-                error_msg = "Las fechas de inicio y fin son requeridas"
-                logger.error(error_msg)
-                return Response(
-                    {'error': error_msg}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        if datos.get('profesional_id') not in [None, "todos", ""]:
+            params['profesional_id'] = datos.get('profesional_id')
+        
+        return params
 
-            # 2. Obtener todas las consultas del servicio externo
-            try:
-                params = {
-                    'fecha_inicio': request.data.get('fecha_inicio'),
-                    'fecha_fin': request.data.get('fecha_fin')
-                }
-                
-                if request.data.get('atleta_id'):
-                    params['atleta_id'] = request.data.get('atleta_id')
-                    
-                if request.data.get('profesional_id'):
-                    params['profesional_id'] = request.data.get('profesional_id')
-                
-                logger.info("Solicitando consultas con parámetros: %s", params)
-                response = requests.get(
-                    self.CONSULTAS_API_URL,
-                    params=params,
-                    timeout=self.TIMEOUT
-                )
-                response.raise_for_status()
-                todas_consultas = response.json()
-                logger.info("Total de consultas obtenidas del servicio: %d", len(todas_consultas))
-            except requests.exceptions.RequestException as e:
-                logger.error("Error al obtener consultas: %s", str(e))
-                return Response(
-                    {'error': 'No se pudieron obtener las consultas del servicio: ' + str(e)},
-                    status=status.HTTP_503_SERVICE_UNAVAILABLE
-                )
+    def _es_modo_trabajo(self, datos):
+        return datos.get('modo') == 'trabajo'
 
-            # 3. Obtener catálogos necesarios
-            catalogos = self._obtener_catalogos()
-            if isinstance(catalogos, Response):
-                return catalogos
+    def _filtros_trabajo(self, datos):
+        """
+        Filtros del reporte sin el parámetro de modo, listos para guardarse en JSON.
+        """
+        return {clave: datos.get(clave) for clave in datos if clave != 'modo'}
 
-            # 4. Filtrar consultas según parámetros
-            consultas_filtradas = self._filtrar_consultas(
-                todas_consultas, 
-                request.data,
-                catalogos
-            )
-            logger.info("Consultas después de filtrar: %d", len(consultas_filtradas))
+    def _obtener_datos_espejo(self, filtros):
+        """
+        Consultas ya filtradas en SQL y catálogos, leídos del espejo local.
+        """
+        consultas = espejo.consultas_filtradas(filtros)
+        logger.info("Total de consultas obtenidas del espejo: %d", len(consultas))
+        return consultas, espejo.catalogos(), (espejo.huella(),)
 
-            # 5. Enriquecer consultas con datos completos
-            consultas_enriquecidas = self._enriquecer_consultas(
-                consultas_filtradas,
-                catalogos
-            )
+    def _construir_reporte(self, todas_consultas, filtros, catalogos, ya_filtradas=False, huellas=None):
+        """
+        Filtra y enriquece las consultas y genera el PDF del reporte.
+
+        Con `huellas` (versiones de las consultas y catálogos de origen) el
+        PDF se busca primero en la caché en disco y se guarda al generarlo.
+        """
+        if huellas is None:
+            return self._generar_reporte(todas_consultas, filtros, catalogos, ya_filtradas)
 
-            # 6. Generar PDF
-            pdf_buffer = self._generar_pdf(
+        clave_pdf = cache_pdf.clave(filtros, *huellas)
+        with metricas.etapa('cache_pdf'):
+            archivo = cache_pdf.abrir(clave_pdf)
+        if archivo is not None:
+            logger.info("Reporte PDF servido desde la caché (%s)", clave_pdf[:12])
+            return archivo
+
+        pdf_archivo = self._generar_reporte(todas_consultas, filtros, catalogos, ya_filtradas)
+        cache_pdf.guardar(clave_pdf, pdf_archivo)
+        return pdf_archivo
+
+    def _generar_reporte(self, todas_consultas, filtros, catalogos, ya_filtradas):
+        # Filtrar y enriquecer en una sola pasada: solo las consultas que
+        # pasan los filtros llegan a guardarse (ya enriquecidas)
+        if ya_filtradas:
+            consultas_filtradas = todas_consultas
+        else:
+            consultas_filtradas = self._iterar_por_filtrar(todas_consultas, filtros)
+        # Se mide por separado el tiempo dentro del filtrado (con las
+        # consultas en flujo incluye la descarga); el resto es enriquecer
+        filtradas = metricas.IteradorMedido(consultas_filtradas, 'filtrar')
+        inicio = time.perf_counter()
+        consultas_enriquecidas = list(self._iterar_enriquecidas(filtradas, catalogos))
+        filtradas.cerrar()
+        metricas.registrar_etapa(
+            'enriquecer', time.perf_counter() - inicio - filtradas.segundos, len(consultas_enriquecidas)
+        )
+        logger.info("Consultas después de filtrar: %d", len(consultas_enriquecidas))
+
+        # Generar PDF
+        with metricas.etapa('pdf', filas=len(consultas_enriquecidas)):
+            return self._generar_pdf(
                 consultas_enriquecidas,
-                request.data
+                filtros
             )
 
-            # 7. Preparar respuesta
-            fecha_inicio = request.data['fecha_inicio']
-            fecha_fin = request.data['fecha_fin']
-            response = HttpResponse(
-                pdf_buffer.getvalue(), 
-                content_type='application/pdf'
-            )
-            filename = f"reporte_consultas_{fecha_inicio}_{fecha_fin}.pdf"
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            response['Access-Control-Allow-Origin'] = '*'
-            response['Access-Control-Allow-Methods'] = 'POST, OPTIONS'
-            response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
-            
-            logger.info("Reporte PDF generado exitosamente")
-            return response
-            
-        except Exception as e:
-            logger.error("Error inesperado al generar reporte: %s", str(e), exc_info=True)
-            return Response(
-                {
-                    'error': 'Error interno al generar el reporte',
-                    'detalles': str(e)
-                }, 
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-            
-    def options(self, request):
+    def _respuesta_pdf(self, pdf_archivo, filtros):
         """
-        Maneja las solicitudes OPTIONS para CORS preflight
+        Arma la respuesta HTTP de descarga del PDF con las cabeceras CORS.
         """
-        response = HttpResponse()
+        fecha_inicio = filtros['fecha_inicio']
+        fecha_fin = filtros['fecha_fin']
+        filename = f"reporte_consultas_{fecha_inicio}_{fecha_fin}.pdf"
+        response = respuesta_archivo_pdf(pdf_archivo, filename)
         response['Access-Control-Allow-Origin'] = '*'
         response['Access-Control-Allow-Methods'] = 'POST, OPTIONS'
         response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
         return response
 
-    def _obtener_catalogos(self):
+    def _filtrar_consultas(self, consultas, filtros, catalogos):
         """
-        Obtiene todos los catálogos necesarios desde los servicios externos.
+        Filtra las consultas según los parámetros recibidos.
         """
-        catalogos = {
-            'atletas': {},
-            'profesionales': {}
-        }
-        
-        try:
-            # Obtener atletas - USANDO SETTINGS
-            response = requests.get(
-                settings.API_ATLETAS,
-                timeout=self.TIMEOUT
-            )
-            response.raise_for_status()
-            for atleta in response.json():
-                catalogos['atletas'][str(atleta['id'])] = atleta
-            
-            # Obtener profesionales - USANDO SETTINGS
-            response = requests.get(
-                settings.API_PROFESIONALES,
-                timeout=self.TIMEOUT
-            )
-            response.raise_for_status()
-            for profesional in response.json():
-                catalogos['profesionales'][str(profesional['id'])] = profesional
-                
-            return catalogos
-            
-        except requests.exceptions.RequestException as e:
-            logger.error("Error al obtener catálogos: %s", str(e))
-            return Response(
-                {
-                    'error': 'No se pudieron obtener los catálogos necesarios',
-                    'detalles': str(e)
-                },
-                status=status.HTTP_503_SERVICE_UNAVAILABLE
-            )
+        return list(self._iterar_filtradas(consultas, filtros))
 
-    def _filtrar_consultas(self, consultas, filtros, catalogos):
+    def _iterar_por_filtrar(self, consultas, filtros):
         """
-        Filtra las consultas según los parámetros recibidos.
+        Filtra las consultas recibidas del backend, salvo que el backend ya
+        aplique todos los filtros enviados: entonces solo se revisa una muestra.
+        """
+        params = self._parametros_consultas(filtros)
+        if capacidades.cubre(settings.API_CONSULTAS, params):
+            return self._verificar_filtrado(consultas, filtros)
+        return self._iterar_filtradas(consultas, filtros)
+
+    def _verificar_filtrado(self, consultas, filtros):
+        """
+        Revisa las primeras consultas filtradas por el backend; si alguna no
+        cumple los filtros, olvida lo detectado y filtra aquí todo el lote.
+        """
+        consultas = iter(consultas)
+        muestra = list(itertools.islice(consultas, capacidades.MUESTRA_VERIFICACION))
+        validas = list(self._iterar_filtradas(muestra, filtros))
+        if len(validas) == len(muestra):
+            yield from muestra
+            yield from consultas
+            return
+
+        logger.warning("El backend devolvió consultas fuera de los filtros; se filtrarán localmente")
+        capacidades.olvidar(settings.API_CONSULTAS)
+        yield from validas
+        yield from self._iterar_filtradas(consultas, filtros)
+
+    def _iterar_filtradas(self, consultas, filtros):
+        """
+        Recorre las consultas y entrega, una a una, las que cumplen los filtros.
         """
         try:
             fecha_inicio = datetime.strptime(filtros['fecha_inicio'], '%Y-%m-%d')
@@ -348,117 +376,104 @@ class GenerarReporteConsultasPDFView(APIView):
             )
         except ValueError as e:
             logger.error("Error al parsear fechas: %s", str(e))
-            return consultas
-        
-        consultas_filtradas = []
-        
+            yield from consultas
+            return
+
+        atleta_filtro = None
+        if 'atleta_id' in filtros and filtros['atleta_id'] not in [None, "todos", ""]:
+            atleta_filtro = str(filtros['atleta_id'])
+        profesional_filtro = None
+        if 'profesional_id' in filtros and filtros['profesional_id'] not in [None, "todos", ""]:
+            profesional_filtro = str(filtros['profesional_id'])
+
+        # Accesores especializados según el esquema de la primera consulta
+        lector = LectorConsultas()
         for consulta in consultas:
             try:
+                acceso = lector.accesores(consulta)
+
                 # 1. Filtrar por fecha
-                fecha_consulta = None
-                fecha_campos = ['fecha', 'creado_el', 'fecha_consulta', 'created_at']
-                
-                for campo in fecha_campos:
-                    if campo in consulta and consulta[campo]:
-                        try:
-                            for formato in ['%Y-%m-%dT%H:%M:%S.%fZ', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d']:
-                                try:
-                                    fecha_consulta = datetime.strptime(consulta[campo], formato)
-                                    break
-                                except ValueError:
-                                    continue
-                            if fecha_consulta:
-                                break
-                        except Exception:
-                            continue
+                fecha_consulta = acceso.fecha(consulta)
                 
                 if not fecha_consulta:
                     logger.warning("No se pudo determinar la fecha para consulta %s", consulta.get('id', 'desconocido'))
-                    consultas_filtradas.append(consulta)
+                    yield consulta
                     continue
                 
                 if not (fecha_inicio <= fecha_consulta <= fecha_fin):
                     continue
                 
                 # 2. Filtrar por atleta
-                if 'atleta_id' in filtros and filtros['atleta_id'] not in [None, "todos", ""]:
-                    atleta_id_consulta = self._obtener_id_de_campo(consulta, ['atleta_id', 'atleta', 'id_atleta', 'paciente_id', 'paciente'])
+                if atleta_filtro is not None:
+                    atleta_id_consulta = acceso.atleta_id(consulta)
                     
-                    if not atleta_id_consulta or str(atleta_id_consulta) != str(filtros['atleta_id']):
+                    if not atleta_id_consulta or atleta_id_consulta != atleta_filtro:
                         continue
                 
                 # 3. Filtrar por profesional
-                if 'profesional_id' in filtros and filtros['profesional_id'] not in [None, "todos", ""]:
-                    profesional_id_consulta = self._obtener_id_de_campo(consulta, ['profesional_salud_id', 'profesional_salud', 'profesional_id', 'profesional', 'id_profesional', 'medico_id', 'medico'])
+                if profesional_filtro is not None:
+                    profesional_id_consulta = acceso.profesional_id(consulta)
                     
-                    if not profesional_id_consulta or str(profesional_id_consulta) != str(filtros['profesional_id']):
+                    if not profesional_id_consulta or profesional_id_consulta != profesional_filtro:
                         continue
                 
-                consultas_filtradas.append(consulta)
-                
             except Exception as e:
                 logger.warning("Error al procesar consulta %s: %s", consulta.get('id', 'desconocido'), str(e))
-                consultas_filtradas.append(consulta)
-                continue
-                
-        return consultas_filtradas
+
+            yield consulta
 
     def _enriquecer_consultas(self, consultas, catalogos):
         """
         Enriquece las consultas con información de catálogos.
         """
-        consultas_enriquecidas = []
-        
+        return list(self._iterar_enriquecidas(consultas, catalogos))
+
+    def _iterar_enriquecidas(self, consultas, catalogos):
+        """
+        Versión perezosa de `_enriquecer_consultas`: una consulta enriquecida a la vez.
+        """
+        lector = LectorConsultas()
         for consulta in consultas:
-            diagnostico = "No especificado"
-            for campo in ['diagnostico', 'diagnóstico', 'diagnostic']:
-                if campo in consulta and consulta[campo]:
-                    diagnostico = consulta[campo]
-                    break
-            
-            tratamiento = "No especificado"
-            for campo in ['tratamiento', 'treatment']:
-                if campo in consulta and consulta[campo]:
-                    tratamiento = consulta[campo]
-                    break
-                    
-            consulta_enriquecida = {
-                'id': consulta.get('id', 'N/A'),
-                'fecha': self._formatear_fecha(self._obtener_fecha_consulta(consulta)),
-                'diagnostico': diagnostico,
-                'tratamiento': tratamiento
-            }
-            
-            # Agregar información del atleta
-            atleta_id = self._obtener_id_de_campo(consulta, ['atleta_id', 'atleta', 'id_atleta', 'paciente_id', 'paciente'])
-            if atleta_id and str(atleta_id) in catalogos['atletas']:
-                atleta = catalogos['atletas'][str(atleta_id)]
-                consulta_enriquecida['atleta_id'] = atleta_id
-                consulta_enriquecida['atleta_nombre'] = f"{atleta.get('nombre', '')} {atleta.get('apPaterno', '')} {atleta.get('apMaterno', '')}".strip()
-            else:
-                consulta_enriquecida['atleta_id'] = atleta_id
-                consulta_enriquecida['atleta_nombre'] = 'Atleta desconocido'
-                
-            # Agregar información del profesional
-            profesional_id = self._obtener_id_de_campo(consulta, ['profesional_salud_id', 'profesional_salud', 'profesional_id', 'profesional', 'id_profesional', 'medico_id', 'medico'])
-            if profesional_id and str(profesional_id) in catalogos['profesionales']:
-                profesional = catalogos['profesionales'][str(profesional_id)]
-                consulta_enriquecida['profesional_id'] = profesional_id
-                consulta_enriquecida['profesional_nombre'] = f"{profesional.get('nombre', '')} {profesional.get('apPaterno', '')} {profesional.get('apMaterno', '')}".strip()
-            else:
-                consulta_enriquecida['profesional_id'] = profesional_id
-                consulta_enriquecida['profesional_nombre'] = 'Profesional desconocido'
+            yield self._enriquecer_consulta(consulta, catalogos, lector.accesores(consulta))
+
+    def _enriquecer_consulta(self, consulta, catalogos, acceso=ACCESORES_GENERALES):
+        diagnostico = acceso.diagnostico(consulta)
+        tratamiento = acceso.tratamiento(consulta)
                 
-            consultas_enriquecidas.append(consulta_enriquecida)
+        consulta_enriquecida = {
+            'id': consulta.get('id', 'N/A'),
+            'fecha': self._formatear_fecha(acceso.fecha_texto(consulta)),
+            'diagnostico': diagnostico,
+            'tratamiento': tratamiento
+        }
+        
+        # Agregar información del atleta
+        atleta_id = acceso.atleta_id(consulta)
+        if atleta_id and str(atleta_id) in catalogos['atletas']:
+            atleta = catalogos['atletas'][str(atleta_id)]
+            consulta_enriquecida['atleta_id'] = atleta_id
+            consulta_enriquecida['atleta_nombre'] = f"{atleta.get('nombre', '')} {atleta.get('apPaterno', '')} {atleta.get('apMaterno', '')}".strip()
+        else:
+            consulta_enriquecida['atleta_id'] = atleta_id
+            consulta_enriquecida['atleta_nombre'] = 'Atleta desconocido'
+            
+        # Agregar información del profesional
+        profesional_id = acceso.profesional_id(consulta)
+        if profesional_id and str(profesional_id) in catalogos['profesionales']:
+            profesional = catalogos['profesionales'][str(profesional_id)]
+            consulta_enriquecida['profesional_id'] = profesional_id
+            consulta_enriquecida['profesional_nombre'] = f"{profesional.get('nombre', '')} {profesional.get('apPaterno', '')} {profesional.get('apMaterno', '')}".strip()
+        else:
+            consulta_enriquecida['profesional_id'] = profesional_id
+            consulta_enriquecida['profesional_nombre'] = 'Profesional desconocido'
             
-        return consultas_enriquecidas
+        return consulta_enriquecida
     
     def _obtener_fecha_consulta(self, consulta):
         """
         Obtiene la fecha de consulta de diferentes campos posibles.
         """
-        fecha_campos = ['fecha', 'creado_el', 'fecha_consulta', 'created_at']
-        for campo in fecha_campos:
+        for campo in FECHA_CAMPOS:
             if campo in consulta and consulta[campo]:
                 return consulta[campo]
         return ""
@@ -467,14 +482,7 @@ class GenerarReporteConsultasPDFView(APIView):
         """
         Obtiene el ID de un campo que puede estar en diferentes formatos.
         """
-        for campo in posibles_campos:
-            if campo in objeto:
-                valor = objeto[campo]
-                if isinstance(valor, dict) and 'id' in valor:
-                    return str(valor['id'])
-                elif valor is not None:
-                    return str(valor)
-        return None
+        return obtener_id_de_campo(objeto, posibles_campos)
 
     def _formatear_fecha(self, fecha_str):
         """
@@ -483,22 +491,30 @@ class GenerarReporteConsultasPDFView(APIView):
         if not fecha_str:
             return "Fecha no disponible"
             
-        try:
-            for formato in ['%Y-%m-%dT%H:%M:%S.%fZ', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d']:
-                try:
-                    fecha = datetime.strptime(fecha_str, formato)
-                    return fecha.strftime('%d/%m/%Y %H:%M')
-                except ValueError:
-                    continue
-            return fecha_str
-        except Exception:
+        fecha = parsear_fecha(fecha_str)
+        if fecha is None:
             return fecha_str
+        return fecha.strftime('%d/%m/%Y %H:%M')
+
+    def _motor_pdf(self, filtros, total_filas):
+        """
+        Motor de la tabla de detalle: el pedido en `motor_pdf` ('platypus' o
+        'rapido') o, si no se indica, el rápido a partir de
+        `REPORTES_PDF_FILAS_MOTOR_RAPIDO` filas.
+        """
+        motor = filtros.get('motor_pdf')
+        if motor in ('platypus', 'rapido'):
+            return motor
+        return 'rapido' if total_filas >= settings.REPORTES_PDF_FILAS_MOTOR_RAPIDO else 'platypus'
 
     def _generar_pdf(self, consultas, filtros):
         """
         Genera un PDF con la información de las consultas.
+
+        El documento se escribe en un archivo temporal que pasa a disco al
+        superar `REPORTES_PDF_SPOOL_MAX_MB`; se devuelve abierto y al inicio.
         """
-        buffer = io.BytesIO()
+        buffer = tempfile.SpooledTemporaryFile(max_size=settings.REPORTES_PDF_SPOOL_MAX_MB * 1024 * 1024)
         
         doc = SimpleDocTemplate(
             buffer,
@@ -506,7 +522,8 @@ class GenerarReporteConsultasPDFView(APIView):
             rightMargin=30,
             leftMargin=30,
             topMargin=30,
-            bottomMargin=30
+            bottomMargin=30,
+            pageCompression=1 if settings.REPORTES_PDF_COMPRIMIR else 0
         )
         
         styles = getSampleStyleSheet()
@@ -572,36 +589,45 @@ class GenerarReporteConsultasPDFView(APIView):
             else:
                 profesionales[profesional] = 1
         
-        stats_data = [
-            ["Total de Consultas", "Consultas por Profesional"],
-            [
-                str(total),
-                "\n".join([f"{k}: {v}" for k, v in profesionales.items()])
-            ]
-        ]
+        # Una fila por profesional (no una sola celda con todos): con muchos
+        # profesionales la tabla se parte entre páginas en lugar de no caber
+        lineas_profesionales = [f"{k}: {v}" for k, v in profesionales.items()] or [""]
+        stats_data = [["Total de Consultas", "Consultas por Profesional"]]
+        for i, linea in enumerate(lineas_profesionales):
+            stats_data.append([str(total) if i == 0 else "", linea])
         
         stats_table = Table(
             stats_data, 
-            colWidths=[2.5*inch, 4.5*inch]
+            colWidths=[2.5*inch, 4.5*inch],
+            repeatRows=1
         )
         stats_table.setStyle(TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3B82F6')),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
             ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('ALIGN', (0, 1), (-1, 1), 'LEFT'),
+            ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
             ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
             ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
             ('FONTSIZE', (0, 0), (-1, 0), 10),
             ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('TOPPADDING', (0, 1), (-1, -1), 1),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 1),
             ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#EFF6FF')),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#BFDBFE')),
+            # Sin líneas entre profesionales: se ve como la celda única de antes
+            ('BOX', (0, 0), (-1, -1), 1, colors.HexColor('#BFDBFE')),
+            ('LINEBELOW', (0, 0), (-1, 0), 1, colors.HexColor('#BFDBFE')),
+            ('LINEAFTER', (0, 0), (0, -1), 1, colors.HexColor('#BFDBFE')),
         ]))
         
         elements.append(stats_table)
         elements.append(Spacer(1, 0.25*inch))
         
         # Detalle de consultas
-        if consultas:
+        if consultas and self._motor_pdf(filtros, len(consultas)) == 'rapido':
+            elements.append(Paragraph("Detalle de Consultas:", subtitle_style))
+            elements.append(Spacer(1, 0.1*inch))
+            elements.append(TablaDetalleRapida.desde_consultas(consultas))
+        elif consultas:
             elements.append(Paragraph("Detalle de Consultas:", subtitle_style))
             elements.append(Spacer(1, 0.1*inch))
             
@@ -657,50 +683,405 @@ class GenerarReporteConsultasPDFView(APIView):
             small_style
         ))
         
-        doc.build(elements)
+        with metricas.etapa('pdf_build'):
+            doc.build(elements)
         buffer.seek(0)
         return buffer
 
 
-class FiltrosConsultaView(APIView):
+class GenerarReporteConsultasPDFView(ProcesamientoConsultasMixin, APIView):
     """
-    Vista que proporciona opciones para filtrar consultas.
+    Vista que genera reportes PDF de consultas médicas con filtros aplicables.
     """
+
+    # Configuración de endpoints - USANDO SETTINGS
+    @property
+    def CONSULTAS_API_URL(self):
+        return settings.API_CONSULTAS
     
-    def get(self, request):
+    @property
+    def CATALOGOS_API_BASE_URL(self):
+        # Extraer la base de la URL de API_ATLETAS
+        return settings.API_BASE_URL + '/Catalogos/'
+
+    def post(self, request):
+        """
+        Genera un reporte PDF de consultas médicas con filtros aplicables.
+        """
         try:
-            # Obtener datos de atletas - USANDO SETTINGS
-            atletas_response = requests.get(settings.API_ATLETAS, timeout=5)
-            atletas_response.raise_for_status()
+            logger.info("Iniciando generación de reporte PDF con filtros: %s", request.data)
             
-            atletas_dict = {}
-            for a in atletas_response.json():
-                if a["id"] not in atletas_dict:
-                    atletas_dict[a["id"]] = {
-                        "id": a["id"], 
-                        "nombre": f"{a.get('nombre', '')} {a.get('apPaterno', '')} {a.get('apMaterno', '')}"
-                    }
+            # 1. Validación de parámetros requeridos
+            if not all(k in request.data for k in ['fecha_inicio', 'fecha_fin']):
+                error_msg = "Las fechas de inicio y fin son requeridas"
+                logger.error(error_msg)
+                return Response(
+                    {'error': error_msg}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # En modo trabajo el PDF se genera en segundo plano
+            if self._es_modo_trabajo(request.data):
+                trabajo = trabajos.encolar(self._filtros_trabajo(request.data))
+                response = Response(
+                    trabajos.descripcion(trabajo, request),
+                    status=status.HTTP_202_ACCEPTED
+                )
+                response['Access-Control-Allow-Origin'] = '*'
+                return response
+
+            # 2-3. Obtener consultas y catálogos
+            with metricas.etapa('datos'):
+                datos_reporte = self._obtener_datos_reporte(request.data)
+            if isinstance(datos_reporte, Response):
+                return datos_reporte
+            todas_consultas, catalogos, huellas, ya_filtradas = datos_reporte
+
+            # 4-6. Filtrar, enriquecer y generar el PDF (o tomarlo de la caché)
+            try:
+                pdf_buffer = self._construir_reporte(
+                    todas_consultas,
+                    request.data,
+                    catalogos,
+                    ya_filtradas=ya_filtradas,
+                    huellas=huellas
+                )
+            except requests.exceptions.RequestException as e:
+                # Con las consultas en flujo el cuerpo se descarga mientras se filtra
+                logger.error("Error al obtener consultas: %s", str(e))
+                return Response(
+                    {'error': 'No se pudieron obtener las consultas del servicio: ' + str(e)},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+            finally:
+                if isinstance(todas_consultas, upstream.RespuestaJSONEnFlujo):
+                    todas_consultas.close()
+
+            # 7. Preparar respuesta
+            response = self._respuesta_pdf(pdf_buffer, request.data)
             
-            atletas = list(atletas_dict.values())
+            logger.info("Reporte PDF generado exitosamente")
+            return response
             
-            # Obtener datos de profesionales - USANDO SETTINGS
-            profesionales_response = requests.get(settings.API_PROFESIONALES, timeout=5)
-            profesionales_response.raise_for_status()
+        except Exception as e:
+            logger.error("Error inesperado al generar reporte: %s", str(e), exc_info=True)
+            return Response(
+                {
+                    'error': 'Error interno al generar el reporte',
+                    'detalles': str(e)
+                }, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
             
-            profesionales_dict = {}
-            for p in profesionales_response.json():
-                if p["id"] not in profesionales_dict:
-                    profesionales_dict[p["id"]] = {
-                        "id": p["id"], 
-                        "nombre": f"{p.get('nombre', '')} {p.get('apPaterno', '')} {p.get('apMaterno', '')} - {p.get('especialidad', '')}"
-                    }
+    def options(self, request):
+        """
+        Maneja las solicitudes OPTIONS para CORS preflight
+        """
+        response = HttpResponse()
+        response['Access-Control-Allow-Origin'] = '*'
+        response['Access-Control-Allow-Methods'] = 'POST, OPTIONS'
+        response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+        return response
+
+    def _obtener_datos_reporte(self, datos):
+        """
+        Obtiene las consultas y los catálogos del reporte.
+
+        Devuelve (consultas, catalogos, huellas, ya_filtradas) o la Response
+        503 si el servicio externo falla. `huellas` identifica la versión de
+        los datos de origen. Con el espejo local los filtros ya se aplicaron
+        en SQL y `ya_filtradas` es True.
+        """
+        if espejo.usar_espejo():
+            return self._obtener_datos_espejo(datos) + (True,)
+        if settings.REPORTES_CONSULTAS_EN_FLUJO:
+            return self._obtener_datos_en_flujo(datos)
+
+        # Obtener consultas y catálogos del servicio externo en paralelo
+        try:
+            params = self._parametros_consultas(datos)
             
-            profesionales = list(profesionales_dict.values())
+            logger.info("Solicitando consultas con parámetros: %s", params)
+            futuro_consultas = upstream.enviar_versionado(
+                self.CONSULTAS_API_URL,
+                params=params,
+                timeout=self.TIMEOUT
+            )
+            solicitud_catalogos = self._solicitar_catalogos()
+            todas_consultas, huella_consultas = futuro_consultas.result()
+            logger.info("Total de consultas obtenidas del servicio: %d", len(todas_consultas))
+        except requests.exceptions.RequestException as e:
+            logger.error("Error al obtener consultas: %s", str(e))
+            return Response(
+                {'error': 'No se pudieron obtener las consultas del servicio: ' + str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        catalogos = self._obtener_catalogos(solicitud_catalogos, versionado=True)
+        if isinstance(catalogos, Response):
+            return catalogos
+        catalogos, huella_catalogos = catalogos
+        return todas_consultas, catalogos, (huella_consultas, huella_catalogos), False
+
+    def _obtener_datos_en_flujo(self, datos):
+        """
+        Como `_obtener_datos_reporte`, pero las consultas llegan como un
+        `RespuestaJSONEnFlujo` que se parsea mientras se filtra.
+
+        Sin ETag del backend no hay huella previa y el PDF no usa la caché.
+        """
+        solicitud_catalogos = self._solicitar_catalogos()
+        try:
+            params = self._parametros_consultas(datos)
+            logger.info("Solicitando consultas en flujo con parámetros: %s", params)
+            consultas = upstream.abrir_json_en_flujo(self.CONSULTAS_API_URL, params=params, timeout=self.TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            logger.error("Error al obtener consultas: %s", str(e))
+            return Response(
+                {'error': 'No se pudieron obtener las consultas del servicio: ' + str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        catalogos = self._obtener_catalogos(solicitud_catalogos, versionado=True)
+        if isinstance(catalogos, Response):
+            consultas.close()
+            return catalogos
+        catalogos, huella_catalogos = catalogos
+        huellas = (consultas.huella, huella_catalogos) if consultas.huella else None
+        return consultas, catalogos, huellas, False
+
+    def _solicitar_catalogos(self):
+        """
+        Pide los catálogos al caché; si no están, lanza su descarga en paralelo.
+        """
+        return SolicitudCatalogos(timeout=self.TIMEOUT)
+
+    def _obtener_catalogos(self, solicitud=None, versionado=False):
+        """
+        Obtiene todos los catálogos necesarios, indexados por id.
+
+        Con `versionado=True` devuelve (catálogos, huella del contenido).
+        """
+        if solicitud is None:
+            solicitud = self._solicitar_catalogos()
+        
+        try:
+            if versionado:
+                return solicitud.resultado_versionado()
+            return solicitud.resultado()
             
-            response = Response({
-                'atletas': atletas,
-                'profesionales': profesionales
-            })
+        except requests.exceptions.RequestException as e:
+            logger.error("Error al obtener catálogos: %s", str(e))
+            return Response(
+                {
+                    'error': 'No se pudieron obtener los catálogos necesarios',
+                    'detalles': str(e)
+                },
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+
+class ExportarConsultasView(GenerarReporteConsultasPDFView):
+    """
+    Exporta las consultas filtradas y enriquecidas del reporte a CSV o XLSX.
+
+    Recorre filtrar → enriquecer fila por fila y envía el archivo mientras se
+    genera, sin armarlo completo en memoria. Acepta los mismos filtros que el
+    reporte PDF más `formato` ("csv" por defecto o "xlsx"), por POST o en la
+    query string de un GET para poder usarse como enlace de descarga.
+    """
+
+    def get(self, request):
+        return self._exportar(request.query_params)
+
+    def post(self, request):
+        return self._exportar(request.data)
+
+    def options(self, request):
+        response = super().options(request)
+        response['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+        return response
+
+    def _exportar(self, datos):
+        try:
+            logger.info("Iniciando exportación de consultas con filtros: %s", datos)
+
+            if not all(k in datos for k in ['fecha_inicio', 'fecha_fin']):
+                return Response(
+                    {'error': "Las fechas de inicio y fin son requeridas"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            formato = str(datos.get('formato') or 'csv').lower()
+            if formato not in exportacion.FORMATOS:
+                return Response(
+                    {'error': f"Formato no soportado: {formato}. Use {', '.join(exportacion.FORMATOS)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            with metricas.etapa('datos'):
+                datos_reporte = self._obtener_datos_reporte(datos)
+            if isinstance(datos_reporte, Response):
+                return datos_reporte
+            consultas, catalogos, _, ya_filtradas = datos_reporte
+
+            if not ya_filtradas:
+                consultas = self._iterar_por_filtrar(consultas, datos)
+            filas = self._iterar_enriquecidas(consultas, catalogos)
+
+            content_type, generar = exportacion.FORMATOS[formato]
+            filename = f"consultas_{datos['fecha_inicio']}_{datos['fecha_fin']}.{formato}"
+            response = respuesta_en_bloques(generar(filas), content_type, filename)
+            response['Access-Control-Allow-Origin'] = '*'
+            response['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+            response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+            return response
+
+        except Exception as e:
+            logger.error("Error inesperado al exportar consultas: %s", str(e), exc_info=True)
+            return Response(
+                {
+                    'error': 'Error interno al exportar las consultas',
+                    'detalles': str(e)
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    def _obtener_datos_espejo(self, filtros):
+        """
+        Con el espejo las filas se leen del cursor por lotes mientras se envían.
+        """
+        return espejo.iterar_consultas_filtradas(filtros), espejo.catalogos(), (espejo.huella(),)
+
+
+class GeneradorReporteConsultas(ProcesamientoConsultasMixin):
+    """
+    Genera el PDF de un trabajo encolado, fuera de la petición HTTP.
+    """
+
+    TIMEOUT = 60  # segundos de lectura; el worker no está limitado por gunicorn
+
+    def generar(self, filtros, avance):
+        """
+        Descarga los datos y construye el PDF, reportando el progreso (0-100).
+
+        A diferencia de la vista, las fallas del servicio se propagan como
+        excepciones para que la cola decida si reintentar.
+        """
+        avance(10)
+        if espejo.usar_espejo():
+            todas_consultas, catalogos, huellas = self._obtener_datos_espejo(filtros)
+            ya_filtradas = True
+        elif settings.REPORTES_CONSULTAS_EN_FLUJO:
+            solicitud_catalogos = SolicitudCatalogos(timeout=self.TIMEOUT)
+            todas_consultas = upstream.abrir_json_en_flujo(
+                settings.API_CONSULTAS,
+                params=self._parametros_consultas(filtros),
+                timeout=self.TIMEOUT
+            )
+            try:
+                catalogos, huella_catalogos = solicitud_catalogos.resultado_versionado()
+            except Exception:
+                todas_consultas.close()
+                raise
+            huellas = (todas_consultas.huella, huella_catalogos) if todas_consultas.huella else None
+            ya_filtradas = False
+        else:
+            futuro_consultas = upstream.enviar_versionado(
+                settings.API_CONSULTAS,
+                params=self._parametros_consultas(filtros),
+                timeout=self.TIMEOUT
+            )
+            solicitud_catalogos = SolicitudCatalogos(timeout=self.TIMEOUT)
+            todas_consultas, huella_consultas = futuro_consultas.result()
+            catalogos, huella_catalogos = solicitud_catalogos.resultado_versionado()
+            huellas = (huella_consultas, huella_catalogos)
+            ya_filtradas = False
+        avance(40)
+
+        try:
+            pdf_buffer = self._construir_reporte(
+                todas_consultas, filtros, catalogos, ya_filtradas=ya_filtradas, huellas=huellas
+            )
+        finally:
+            if isinstance(todas_consultas, upstream.RespuestaJSONEnFlujo):
+                todas_consultas.close()
+        avance(90)
+        return pdf_buffer
+
+
+class EstadoTrabajoReporteView(APIView):
+    """
+    Estado y progreso de un reporte PDF encolado.
+    """
+
+    def get(self, request, trabajo_id):
+        try:
+            trabajo = TrabajoReporte.objects.get(pk=trabajo_id)
+        except TrabajoReporte.DoesNotExist:
+            return Response({'error': 'Trabajo no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+        response = Response(trabajos.descripcion(trabajo, request))
+        response['Access-Control-Allow-Origin'] = '*'
+        return response
+
+
+class DescargarTrabajoReporteView(APIView):
+    """
+    Descarga el PDF de un reporte encolado una vez terminado.
+    """
+
+    def get(self, request, trabajo_id):
+        try:
+            trabajo = TrabajoReporte.objects.get(pk=trabajo_id)
+        except TrabajoReporte.DoesNotExist:
+            return Response({'error': 'Trabajo no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+        if trabajo.estado != TrabajoReporte.TERMINADO:
+            return Response(
+                {'error': 'El reporte aún no está listo', 'estado': trabajo.estado},
+                status=status.HTTP_409_CONFLICT
+            )
+        try:
+            archivo = open(trabajo.archivo, 'rb')
+        except FileNotFoundError:
+            return Response(
+                {'error': 'El archivo del reporte ya no está disponible'},
+                status=status.HTTP_410_GONE
+            )
+
+        response = respuesta_archivo_pdf(archivo, trabajo.nombre_archivo)
+        response['Access-Control-Allow-Origin'] = '*'
+        return response
+
+
+def filtros_consulta(timeout=None):
+    """
+    Opciones de los selectores de filtros, del espejo o de los catálogos en caché.
+    """
+    with metricas.etapa('catalogos'):
+        if espejo.usar_espejo():
+            catalogos = espejo.catalogos()
+        else:
+            catalogos = SolicitudCatalogos(timeout=timeout).resultado()
+    return opciones_filtros(
+        catalogos['atletas'].values(),
+        catalogos['profesionales'].values()
+    )
+
+
+class FiltrosConsultaView(APIView):
+    """
+    Vista que proporciona opciones para filtrar consultas.
+    """
+    
+    TIMEOUT = 5  # segundos de lectura; la conexión usa UPSTREAM_TIMEOUT_CONEXION
+    
+    def get(self, request):
+        try:
+            response = respuestas.responder(
+                request, 'filtros', lambda: filtros_consulta(self.TIMEOUT), Response
+            )
             
             response['Access-Control-Allow-Origin'] = '*'
             response['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
@@ -728,4 +1109,13 @@ class FiltrosConsultaView(APIView):
         response['Access-Control-Allow-Origin'] = '*'
         response['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
         response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
-        return response
\ No newline at end of file
+        return response
+
+
+class MetricasView(APIView):
+    """
+    Métricas de todos los workers en el formato de texto de Prometheus.
+    """
+
+    def get(self, request):
+        return HttpResponse(metricas.exportar(), content_type=metricas.CONTENT_TYPE)
@@ -0,0 +1,298 @@
+"""
+Variantes asíncronas de las vistas de reportes.
+
+Pensadas para servirse con un servidor ASGI: mientras esperan al backend
+principal no ocupan un worker, de modo que un solo proceso atiende muchas
+peticiones concurrentes del dashboard y de los filtros.
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from . import codec_json, espejo, metricas, respuestas, segmentos, trabajos, upstream, upstream_async, ventanas
+from .catalogos import obtener_catalogos, obtener_catalogos_versionados
+from .estadisticas import construir_respuesta
+from .views import ProcesamientoConsultasMixin, estadisticas_consultas, filtros_consulta, opciones_filtros
+
+logger = logging.getLogger(__name__)
+
+
+def _json(datos, status=200):
+    # Mismos bytes que el renderer JSON de DRF (ver codec_json)
+    return HttpResponse(codec_json.volcar(datos), status=status, content_type='application/json')
+
+
+def _leer_datos(request):
+    """
+    Obtiene los datos del cuerpo de la petición, sea JSON o formulario.
+    """
+    if request.content_type == 'application/json':
+        try:
+            return codec_json.cargar(request.body or b'{}')
+        except ValueError:
+            return {}
+    return request.POST
+
+
+async def _obtener_catalogos(timeout=None):
+    if espejo.usar_espejo():
+        return await sync_to_async(espejo.catalogos)()
+    # La caché de catálogos es síncrona; en un acierto no hay espera de red
+    return await sync_to_async(obtener_catalogos, thread_sensitive=False)(timeout)
+
+
+async def _obtener_catalogos_versionados(timeout=None):
+    if espejo.usar_espejo():
+        return await sync_to_async(lambda: (espejo.catalogos(), espejo.huella()))()
+    return await sync_to_async(obtener_catalogos_versionados, thread_sensitive=False)(timeout)
+
+
+class CorsMixin:
+    metodos_cors = 'GET, OPTIONS'
+
+    def _cors(self, response):
+        response['Access-Control-Allow-Origin'] = '*'
+        response['Access-Control-Allow-Methods'] = self.metodos_cors
+        response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+        return response
+
+    async def options(self, request, *args, **kwargs):
+        """
+        Maneja las solicitudes OPTIONS para CORS preflight
+        """
+        return self._cors(HttpResponse())
+
+
+class EstadisticasConsultasAsyncView(View):
+    """
+    Variante asíncrona de EstadisticasConsultasView.
+    """
+
+    async def get(self, request):
+        try:
+            ventana = None
+            if ventanas.solicitada(request.GET):
+                try:
+                    ventana = ventanas.leer_ventana(request.GET, datetime.now())
+                except ValueError as e:
+                    return _json({'error': str(e)}, status=400)
+
+            # Los refrescos en segundo plano usan el cálculo síncrono en un hilo
+            return await respuestas.responder_async(
+                request, 'estadisticas',
+                lambda: self._calcular(ventana),
+                lambda: estadisticas_consultas(ventana),
+                _json,
+            )
+
+        except upstream_async.ErrorUpstream as e:
+            logger.error(f"Error de conexión: {str(e)}")
+            return _json({
+                'error': 'Error al conectar con los servicios externos',
+                'detalles': str(e)
+            }, status=503)
+
+        except Exception as e:
+            logger.exception("Error interno del servidor")
+            return _json({
+                'error': 'Error interno del servidor',
+                'detalles': str(e)
+            }, status=500)
+
+    async def _calcular(self, ventana):
+        if ventana is not None:
+            return await self._estadisticas_ventana(ventana)
+
+        hoy = datetime.now()
+        if espejo.usar_espejo():
+            with metricas.etapa('acumular'):
+                acumulador = await sync_to_async(espejo.acumulador)()
+            catalogos = await _obtener_catalogos()
+        else:
+            logger.info(f"Consultando consultas en: {settings.API_CONSULTAS}")
+            plan = await sync_to_async(segmentos.planificar, thread_sensitive=False)(hoy)
+            todas_consultas, catalogos = await asyncio.gather(
+                upstream_async.obtener_json(settings.API_CONSULTAS, params=plan.params),
+                _obtener_catalogos(),
+            )
+
+            # El cálculo es CPU puro: se hace fuera del event loop
+            acumulador = await sync_to_async(segmentos.completar, thread_sensitive=False)(plan, todas_consultas)
+        with metricas.etapa('construir'):
+            estadisticas = construir_respuesta(
+                acumulador,
+                catalogos['profesionales'].values(),
+                catalogos['atletas'].values(),
+                hoy
+            )
+
+        logger.info(f"Total consultas procesadas: {acumulador.total}")
+        return estadisticas
+
+    async def _estadisticas_ventana(self, ventana):
+        hoy = datetime.now()
+        if espejo.usar_espejo():
+            acumulador = await sync_to_async(ventanas.obtener_acumulador)(ventana, hoy)
+            catalogos = await _obtener_catalogos()
+        else:
+            acumulador = await sync_to_async(ventanas.leer_cache, thread_sensitive=False)(ventana)
+            if acumulador is None:
+                consultas, catalogos = await asyncio.gather(
+                    upstream_async.obtener_json(settings.API_CONSULTAS, params=ventana.filtros),
+                    _obtener_catalogos(),
+                )
+                acumulador = await sync_to_async(ventanas.contar, thread_sensitive=False)(ventana, consultas, hoy)
+            else:
+                catalogos = await _obtener_catalogos()
+        logger.info(f"Consultas en la ventana {ventana.clave}: {acumulador.total}")
+        with metricas.etapa('construir'):
+            return ventanas.construir_respuesta(
+                acumulador,
+                catalogos['profesionales'].values(),
+                catalogos['atletas'].values()
+            )
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class GenerarReporteConsultasPDFAsyncView(CorsMixin, ProcesamientoConsultasMixin, View):
+    """
+    Variante asíncrona de GenerarReporteConsultasPDFView.
+    """
+
+    metodos_cors = 'POST, OPTIONS'
+
+    async def post(self, request):
+        try:
+            datos = _leer_datos(request)
+            logger.info("Iniciando generación de reporte PDF con filtros: %s", datos)
+
+            if not all(k in datos for k in ['fecha_inicio', 'fecha_fin']):
+                error_msg = "Las fechas de inicio y fin son requeridas"
+                logger.error(error_msg)
+                return _json({'error': error_msg}, status=400)
+
+            if self._es_modo_trabajo(datos):
+                trabajo = await sync_to_async(trabajos.encolar)(self._filtros_trabajo(datos))
+                return self._cors(_json(trabajos.descripcion(trabajo, request), status=202))
+
+            if espejo.usar_espejo():
+                # El espejo resuelve los filtros en SQL; el ORM es síncrono
+                with metricas.etapa('datos'):
+                    consultas, catalogos, huellas = await sync_to_async(self._obtener_datos_espejo)(datos)
+                pdf_buffer = await sync_to_async(self._construir_reporte, thread_sensitive=False)(
+                    consultas, datos, catalogos, ya_filtradas=True, huellas=huellas
+                )
+                return self._respuesta_pdf(pdf_buffer, datos)
+
+            params = self._parametros_consultas(datos)
+            logger.info("Solicitando consultas con parámetros: %s", params)
+            en_flujo = settings.REPORTES_CONSULTAS_EN_FLUJO
+            if en_flujo:
+                # Con el cliente síncrono: el cuerpo se parsea en el mismo hilo
+                # que filtra y arma el PDF
+                pedir_consultas = sync_to_async(upstream.abrir_json_en_flujo, thread_sensitive=False)(
+                    settings.API_CONSULTAS, params=params, timeout=self.TIMEOUT
+                )
+            else:
+                pedir_consultas = upstream_async.obtener_json_versionado(
+                    settings.API_CONSULTAS, params=params, timeout=self.TIMEOUT
+                )
+            with metricas.etapa('datos'):
+                consultas, catalogos = await asyncio.gather(
+                    pedir_consultas,
+                    _obtener_catalogos_versionados(self.TIMEOUT),
+                    return_exceptions=True
+                )
+            if en_flujo and isinstance(catalogos, BaseException) and not isinstance(consultas, BaseException):
+                consultas.close()
+
+            # Mismo orden de errores que la vista síncrona: primero consultas
+            if isinstance(consultas, upstream_async.ErrorUpstream):
+                logger.error("Error al obtener consultas: %s", str(consultas))
+                return _json(
+                    {'error': 'No se pudieron obtener las consultas del servicio: ' + str(consultas)},
+                    status=503
+                )
+            for resultado in (consultas, catalogos):
+                if isinstance(resultado, BaseException) and not isinstance(resultado, upstream_async.ErrorUpstream):
+                    raise resultado
+            if isinstance(catalogos, upstream_async.ErrorUpstream):
+                logger.error("Error al obtener catálogos: %s", str(catalogos))
+                return _json({
+                    'error': 'No se pudieron obtener los catálogos necesarios',
+                    'detalles': str(catalogos)
+                }, status=503)
+
+            catalogos, huella_catalogos = catalogos
+            if en_flujo:
+                huellas = (consultas.huella, huella_catalogos) if consultas.huella else None
+            else:
+                consultas, huella_consultas = consultas
+                huellas = (huella_consultas, huella_catalogos)
+                logger.info("Total de consultas obtenidas del servicio: %d", len(consultas))
+
+            try:
+                pdf_buffer = await sync_to_async(self._construir_reporte, thread_sensitive=False)(
+                    consultas, datos, catalogos, huellas=huellas
+                )
+            except upstream_async.ErrorUpstream as e:
+                # Con las consultas en flujo el cuerpo se descarga mientras se filtra
+                logger.error("Error al obtener consultas: %s", str(e))
+                return _json(
+                    {'error': 'No se pudieron obtener las consultas del servicio: ' + str(e)},
+                    status=503
+                )
+            finally:
+                if en_flujo:
+                    consultas.close()
+            logger.info("Reporte PDF generado exitosamente")
+            return self._respuesta_pdf(pdf_buffer, datos)
+
+        except Exception as e:
+            logger.error("Error inesperado al generar reporte: %s", str(e), exc_info=True)
+            return _json({
+                'error': 'Error interno al generar el reporte',
+                'detalles': str(e)
+            }, status=500)
+
+
+class FiltrosConsultaAsyncView(CorsMixin, View):
+    """
+    Variante asíncrona de FiltrosConsultaView.
+    """
+
+    TIMEOUT = 5  # segundos de lectura; la conexión usa UPSTREAM_TIMEOUT_CONEXION
+
+    async def _calcular(self):
+        with metricas.etapa('catalogos'):
+            catalogos = await _obtener_catalogos(self.TIMEOUT)
+        return opciones_filtros(
+            catalogos['atletas'].values(),
+            catalogos['profesionales'].values()
+        )
+
+    async def get(self, request):
+        try:
+            return self._cors(await respuestas.responder_async(
+                request, 'filtros', self._calcular, lambda: filtros_consulta(self.TIMEOUT), _json
+            ))
+
+        except upstream_async.ErrorUpstream as e:
+            return _json({
+                'error': 'Error al conectar con el servicio de datos',
+                'detalles': str(e)
+            }, status=503)
+
+        except Exception as e:
+            return _json({
+                'error': 'Error interno del servidor',
+                'detalles': str(e)
+            }, status=500)